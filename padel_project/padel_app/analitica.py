@@ -0,0 +1,185 @@
+# analitica.py - Ingresos, llenado y ocupación de canchas
+#
+# actualizar_resumenes() agrega en la base por semana/club/profesor/tipo y
+# guarda el resultado en ResumenSemanal*; sólo recalcula las semanas que
+# signals.py marcó en SemanaPendienteAnalitica. reporte() lee esas tablas
+# (unas pocas filas por semana) y arma los cortes con pandas.
+from datetime import timedelta
+
+import pandas as pd
+from django.db import transaction
+from django.db.models import Count, IntegerField, Max, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncWeek
+
+from .canchas import APERTURA, CIERRE, DURACION_POR_DEFECTO
+from .models import (Clase, Club, Emparejamiento, EnEspera, ResumenSemanalClases, ResumenSemanalEspera,
+                     SemanaPendienteAnalitica)
+
+JUGADORES_POR_CLASE = 4
+MINUTOS_POR_DIA = (CIERRE.hour - APERTURA.hour) * 60
+
+def lunes(fecha):
+    return fecha - timedelta(days=fecha.weekday())
+
+def marcar_semanas(fechas):
+    SemanaPendienteAnalitica.objects.bulk_create(
+        [SemanaPendienteAnalitica(semana=semana) for semana in {lunes(f) for f in fechas if f}],
+        ignore_conflicts=True
+    )
+
+def _resumen_clases(desde, hasta):
+    jugadores = (Emparejamiento.jugadores.through.objects
+                 .filter(emparejamiento__id_clase=OuterRef('pk'))
+                 .values('emparejamiento__id_clase')
+                 .annotate(total=Count('customuser', distinct=True))
+                 .values('total'))
+    return (Clase.objects.filter(fecha__gte=desde, fecha__lt=hasta, cancelada_en__isnull=True)
+            .annotate(cant_jugadores=Coalesce(Subquery(jugadores, output_field=IntegerField()), 0))
+            .values('id_club', 'id_profesor', 'entrenamiento__tipo_entreno', semana=TruncWeek('fecha'))
+            .annotate(
+                clases=Count('id'),
+                clases_confirmadas=Count('id', filter=Q(confirmado=True)),
+                jugadores=Sum('cant_jugadores'),
+                minutos_cancha=Sum(Coalesce('entrenamiento__duracion_minutos', DURACION_POR_DEFECTO)),
+                ingresos_ar=Coalesce(Sum('valor_ar', filter=Q(confirmado=True)), 0, output_field=Clase.valor_ar.field),
+            )
+            .order_by())
+
+def _resumen_espera(desde, hasta):
+    return (EnEspera.objects.filter(fecha__gte=desde, fecha__lt=hasta)
+            .values('id_club', semana=TruncWeek('fecha'))
+            .annotate(solicitudes=Count('id'), asignadas=Count('id', filter=Q(id_clase__isnull=False)))
+            .order_by())
+
+def _recalcular(semanas, solo_pendientes=True):
+    """
+    Reemplaza las filas de cada semana en una transacción por semana. La
+    fila de SemanaPendienteAnalitica de la semana hace de lock: dos recálculos
+    simultáneos (dos visitas a /reportes/) se ordenan y el segundo, si la
+    semana ya no está pendiente, no hace nada. Devuelve las semanas recalculadas.
+    """
+    recalculadas = 0
+    for semana in sorted(semanas):
+        hasta = semana + timedelta(days=7)
+        with transaction.atomic():
+            if not solo_pendientes:
+                SemanaPendienteAnalitica.objects.bulk_create([SemanaPendienteAnalitica(semana=semana)],
+                                                             ignore_conflicts=True)
+            if not SemanaPendienteAnalitica.objects.select_for_update().filter(semana=semana).exists():
+                continue
+            ResumenSemanalClases.objects.filter(semana=semana).delete()
+            ResumenSemanalEspera.objects.filter(semana=semana).delete()
+            ResumenSemanalClases.objects.bulk_create([
+                ResumenSemanalClases(
+                    semana=semana, id_club_id=fila['id_club'], id_profesor_id=fila['id_profesor'],
+                    tipo_entreno=fila['entrenamiento__tipo_entreno'] or '', clases=fila['clases'],
+                    clases_confirmadas=fila['clases_confirmadas'], jugadores=fila['jugadores'] or 0,
+                    minutos_cancha=fila['minutos_cancha'] or 0, ingresos_ar=fila['ingresos_ar'],
+                )
+                for fila in _resumen_clases(semana, hasta)
+            ])
+            ResumenSemanalEspera.objects.bulk_create([
+                ResumenSemanalEspera(semana=semana, id_club_id=fila['id_club'],
+                                     solicitudes=fila['solicitudes'], asignadas=fila['asignadas'])
+                for fila in _resumen_espera(semana, hasta)
+            ])
+            SemanaPendienteAnalitica.objects.filter(semana=semana).delete()
+        recalculadas += 1
+    return recalculadas
+
+def actualizar_resumenes(completo=False, desde=None):
+    """
+    Recalcula las semanas pendientes. Con completo=True (o desde=fecha)
+    reconstruye todo el rango: necesario después de cargas masivas con
+    bulk_create/update, que no disparan señales.
+    """
+    if completo or desde:
+        fechas = Clase.objects.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+        fechas_espera = EnEspera.objects.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+        extremos = [f for f in (*fechas.values(), *fechas_espera.values()) if f]
+        if not extremos:
+            return 0
+        inicio = lunes(desde or min(extremos))
+        semanas = set()
+        while inicio <= max(extremos):
+            semanas.add(inicio)
+            inicio += timedelta(days=7)
+        semanas |= set(SemanaPendienteAnalitica.objects.values_list('semana', flat=True))
+        return _recalcular(semanas, solo_pendientes=False)
+    return _recalcular(set(SemanaPendienteAnalitica.objects.values_list('semana', flat=True)))
+
+METRICAS = ['clases', 'clases_confirmadas', 'jugadores', 'minutos_cancha', 'ingresos_ar']
+
+def _dataframe_clases(desde, hasta):
+    filas = (ResumenSemanalClases.objects.filter(semana__gte=lunes(desde), semana__lte=hasta)
+             .values('semana', 'id_club', 'id_club__nombre_club', 'id_profesor', 'id_profesor__nombre',
+                     'id_profesor__apellido', 'tipo_entreno', *METRICAS))
+    df = pd.DataFrame.from_records(filas, columns=['semana', 'id_club', 'id_club__nombre_club', 'id_profesor',
+                                                   'id_profesor__nombre', 'id_profesor__apellido',
+                                                   'tipo_entreno', *METRICAS])
+    # Tipos explícitos: sin filas pandas dejaría todo como object
+    df = df.astype({**{campo: 'int64' for campo in METRICAS}, 'ingresos_ar': 'float64'})
+    df['club'] = df['id_club__nombre_club'].fillna('Sin club')
+    df['profesor'] = df['id_profesor__nombre'].fillna('') + ' ' + df['id_profesor__apellido'].fillna('')
+    df['tipo_entreno'] = df['tipo_entreno'].replace('', 'Sin entrenamiento')
+    return df
+
+def _dataframe_espera(desde, hasta):
+    filas = (ResumenSemanalEspera.objects.filter(semana__gte=lunes(desde), semana__lte=hasta)
+             .values('semana', 'id_club', 'solicitudes', 'asignadas'))
+    return (pd.DataFrame.from_records(filas, columns=['semana', 'id_club', 'solicitudes', 'asignadas'])
+            .astype({'solicitudes': 'int64', 'asignadas': 'int64'}))
+
+def _cociente(numerador, denominador):
+    return (numerador / denominador.where(denominador > 0)).astype('float64').fillna(0).round(3)
+
+def _agrupar(df, claves):
+    grupo = df.groupby(claves, dropna=False)[METRICAS].sum().reset_index()
+    grupo['llenado'] = _cociente(grupo['jugadores'], grupo['clases'] * JUGADORES_POR_CLASE)
+    grupo['ingreso_por_clase'] = _cociente(grupo['ingresos_ar'], grupo['clases_confirmadas']).round(2)
+    return grupo
+
+def reporte(desde, hasta):
+    """
+    Cortes por profesor, club, tipo de entrenamiento y semana entre dos
+    fechas. Lee sólo las tablas resumen: el costo depende de la cantidad de
+    semanas y clubes, no del historial de clases.
+    """
+    clases = _dataframe_clases(desde, hasta)
+    espera = _dataframe_espera(desde, hasta)
+    semanas = max(1, ((lunes(hasta) - lunes(desde)).days // 7) + 1)
+
+    por_club = _agrupar(clases, ['id_club', 'club'])
+    canchas = pd.DataFrame.from_records(
+        Club.objects.values('id', 'canchas_techo', 'canchas_sin_techo'),
+        columns=['id', 'canchas_techo', 'canchas_sin_techo']
+    )
+    canchas['minutos_disponibles'] = ((canchas['canchas_techo'] + canchas['canchas_sin_techo'])
+                                      * MINUTOS_POR_DIA * 7 * semanas)
+    por_club = por_club.merge(canchas[['id', 'minutos_disponibles']], how='left', left_on='id_club', right_on='id')
+    por_club['ocupacion'] = _cociente(por_club['minutos_cancha'], por_club['minutos_disponibles'].fillna(0))
+    espera_club = espera.groupby('id_club', as_index=False)[['solicitudes', 'asignadas']].sum()
+    por_club = por_club.merge(espera_club, how='left', on='id_club')
+    por_club[['solicitudes', 'asignadas']] = por_club[['solicitudes', 'asignadas']].fillna(0).astype(int)
+    por_club['conversion'] = _cociente(por_club['asignadas'], por_club['solicitudes'])
+
+    por_semana = _agrupar(clases, ['semana'])
+    espera_semana = espera.groupby('semana', as_index=False)[['solicitudes', 'asignadas']].sum()
+    por_semana = por_semana.merge(espera_semana, how='outer', on='semana').fillna(0)
+    por_semana['conversion'] = _cociente(por_semana['asignadas'], por_semana['solicitudes'])
+
+    totales = {campo: clases[campo].sum().item() for campo in METRICAS}
+    total_espera = {campo: int(espera[campo].sum()) for campo in ('solicitudes', 'asignadas')}
+    orden = ['ingresos_ar', 'clases']
+    return {
+        'totales': {
+            **totales,
+            **total_espera,
+            'llenado': round(totales['jugadores'] / (totales['clases'] * JUGADORES_POR_CLASE), 3) if totales['clases'] else 0,
+            'conversion': round(total_espera['asignadas'] / total_espera['solicitudes'], 3) if total_espera['solicitudes'] else 0,
+        },
+        'por_profesor': _agrupar(clases, ['id_profesor', 'profesor']).sort_values(orden, ascending=False).to_dict('records'),
+        'por_club': por_club.sort_values(orden, ascending=False).to_dict('records'),
+        'por_tipo': _agrupar(clases, ['tipo_entreno']).sort_values(orden, ascending=False).to_dict('records'),
+        'por_semana': por_semana.sort_values('semana', ascending=False).to_dict('records'),
+    }
@@ -0,0 +1,259 @@
+# api.py - Serialización compacta y GET condicional para la API JSON
+#
+# Cada recurso declara sus campos públicos como {nombre: ruta ORM}; las filas
+# salen de values_list() con los joins resueltos en la misma consulta, sin
+# instanciar modelos. ?campos=a,b limita las columnas del SELECT.
+#
+# Ninguno de estos modelos guarda fecha de modificación y varios caminos los
+# tocan con UPDATE masivos, así que el ETag es el hash del cuerpo: no ahorra
+# la consulta pero sí la transferencia, y nunca devuelve un 304 desactualizado.
+# Por lo mismo no se manda Last-Modified: fecha_creacion o fecha_envio no
+# cambian cuando cambian intentos o el estado de una fila.
+import hashlib
+import json
+from collections import Counter, defaultdict
+from datetime import date, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from . import analitica, dashboard, demanda, eventos
+from .models import Club, Emparejamiento, EnEspera
+from .paginacion import codificar_cursor, decodificar_cursor, filtro_keyset
+
+MAXIMO_LOTE_ESPERA = 100
+
+class ErrorApi(Exception):
+    def __init__(self, mensaje, status=400, detalle=None):
+        self.mensaje = mensaje
+        self.status = status
+        self.detalle = detalle
+        super().__init__(mensaje)
+
+    def respuesta(self):
+        cuerpo = {'error': self.mensaje}
+        if self.detalle is not None:
+            cuerpo['detalle'] = self.detalle
+        return JsonResponse(cuerpo, status=self.status)
+
+class Recurso:
+    def __init__(self, campos, orden, por_defecto=None):
+        self.campos = campos
+        self.orden = orden
+        self.por_defecto = por_defecto or tuple(campos)
+
+    def elegir_campos(self, pedido):
+        if not pedido:
+            return list(self.por_defecto)
+        nombres = [n.strip() for n in pedido.split(',') if n.strip()]
+        desconocidos = [n for n in nombres if n not in self.campos]
+        if desconocidos:
+            raise ErrorApi('Campos desconocidos', detalle={'campos': desconocidos, 'disponibles': list(self.campos)})
+        return list(dict.fromkeys(nombres))
+
+RECURSOS = {
+    'espera': Recurso(
+        campos={
+            'id': 'id',
+            'club': 'id_club',
+            'club_nombre': 'id_club__nombre_club',
+            'usuario': 'id_usuario',
+            'fecha': 'fecha',
+            'hora': 'hora',
+            'descripcion': 'descripcion',
+            'clase': 'id_clase',
+            'emparejamiento': 'id_emparejamiento',
+        },
+        orden=('-fecha', '-hora', '-id'),
+        por_defecto=('id', 'club', 'usuario', 'fecha', 'hora', 'descripcion', 'clase', 'emparejamiento'),
+    ),
+    'clases': Recurso(
+        campos={
+            'id': 'id',
+            'fecha': 'fecha',
+            'hora': 'hora',
+            'club': 'id_club',
+            'club_nombre': 'id_club__nombre_club',
+            'profesor': 'id_profesor',
+            'profesor_nombre': 'id_profesor__nombre',
+            'entrenamiento': 'entrenamiento',
+            'entrenamiento_nombre': 'entrenamiento__nombre',
+            'duracion_minutos': 'entrenamiento__duracion_minutos',
+            'valor_ar': 'valor_ar',
+            'confirmado': 'confirmado',
+            'cancelada_en': 'cancelada_en',
+            'serie': 'serie',
+            'descripcion': 'descripcion',
+        },
+        orden=('-fecha', '-hora', '-id'),
+        por_defecto=('id', 'fecha', 'hora', 'club', 'profesor', 'entrenamiento', 'valor_ar',
+                     'confirmado', 'cancelada_en', 'descripcion'),
+    ),
+    'emparejamientos': Recurso(
+        campos={
+            'id': 'id',
+            'clase': 'id_clase',
+            'fecha': 'id_clase__fecha',
+            'hora': 'id_clase__hora',
+            'club': 'id_clase__id_club',
+            'descripcion': 'descripcion',
+            # M2M: se resuelve con una consulta aparte para toda la página
+            'jugadores': None,
+        },
+        orden=('-id',),
+    ),
+    'notificaciones': Recurso(
+        campos={
+            'id': 'id',
+            'usuario': 'id_usuario',
+            'tipo_evento': 'tipo_evento',
+            'clase': 'id_clase',
+            'fecha_creacion': 'fecha_creacion',
+            'enviada': 'enviada',
+            'fecha_envio': 'fecha_envio',
+            'intentos': 'intentos',
+        },
+        orden=('-fecha_creacion', '-id'),
+    ),
+}
+
+def _jugadores_por_emparejamiento(ids):
+    jugadores = defaultdict(list)
+    filas = (Emparejamiento.jugadores.through.objects
+             .filter(emparejamiento_id__in=ids)
+             .values_list('emparejamiento_id', 'customuser_id')
+             .order_by('emparejamiento_id', 'customuser_id'))
+    for emparejamiento, usuario in filas:
+        jugadores[emparejamiento].append(usuario)
+    return jugadores
+
+def _filas(recurso, queryset, campos, extra=()):
+    """Dicts por ruta ORM con un único values_list; el M2M se agrega con una consulta más"""
+    definicion = RECURSOS[recurso]
+    rutas = list(dict.fromkeys(
+        ['id', *(definicion.campos[n] for n in campos if definicion.campos[n] is not None), *extra]
+    ))
+    filas = [dict(zip(rutas, valores)) for valores in queryset.values_list(*rutas)]
+    if 'jugadores' in campos:
+        jugadores = _jugadores_por_emparejamiento([f['id'] for f in filas])
+        for fila in filas:
+            fila['jugadores'] = jugadores.get(fila['id'], [])
+    return filas
+
+def _publicar(recurso, fila, campos):
+    definicion = RECURSOS[recurso]
+    return {n: fila[definicion.campos[n] or n] for n in campos}
+
+def serializar(recurso, queryset, campos):
+    """Lista de dicts con sólo `campos`, sin instanciar modelos"""
+    return [_publicar(recurso, fila, campos) for fila in _filas(recurso, queryset, campos)]
+
+def pagina(recurso, queryset, campos, despues='', tamano=50):
+    """
+    Una página por keyset según el orden del recurso; el cursor viaja en
+    `siguiente`. Un cursor inválido o adulterado devuelve la primera página.
+    """
+    orden = RECURSOS[recurso].orden
+    nombres_orden = [c.lstrip('-') for c in orden]
+    valores = decodificar_cursor(despues, queryset.model, orden) if despues else None
+    if valores:
+        queryset = queryset.filter(filtro_keyset(orden, valores))
+    filas = _filas(recurso, queryset.order_by(*orden)[:tamano + 1], campos, extra=nombres_orden)
+    siguiente = None
+    if len(filas) > tamano:
+        filas = filas[:tamano]
+        siguiente = codificar_cursor([filas[-1][n] for n in nombres_orden])
+    return {'resultados': [_publicar(recurso, fila, campos) for fila in filas], 'siguiente': siguiente}
+
+def respuesta_condicional(request, datos):
+    """
+    JSON con ETag (hash del cuerpo); 304 si el cliente ya tiene esta misma
+    versión.
+    """
+    cuerpo = json.dumps(datos, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    etag = f'"{hashlib.md5(cuerpo, usedforsecurity=False).hexdigest()}"'
+    respuesta = get_conditional_response(request, etag=etag)
+    if respuesta is None:
+        respuesta = HttpResponse(cuerpo, content_type='application/json')
+    respuesta['ETag'] = etag
+    # Datos por usuario: que ningún proxy los comparta y el cliente revalide siempre
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+def leer_json(request):
+    try:
+        return json.loads(request.body or b'null')
+    except (ValueError, UnicodeDecodeError):
+        raise ErrorApi('El cuerpo no es JSON válido')
+
+def _id_club(valor):
+    if isinstance(valor, bool):
+        return None
+    if isinstance(valor, int):
+        return valor
+    if isinstance(valor, str) and valor.isdigit():
+        return int(valor)
+    return None
+
+def _validar_espera(item, clubes):
+    errores = {}
+    if not isinstance(item, dict):
+        return None, {'item': 'Se esperaba un objeto'}
+    club = _id_club(item.get('club'))
+    if club not in clubes:
+        club = None
+        errores['club'] = 'Club inexistente'
+    try:
+        fecha = date.fromisoformat(str(item.get('fecha')))
+    except ValueError:
+        fecha = None
+        errores['fecha'] = 'Formato AAAA-MM-DD'
+    try:
+        hora = time.fromisoformat(str(item.get('hora')))
+    except ValueError:
+        hora = None
+        errores['hora'] = 'Formato HH:MM'
+    descripcion = item.get('descripcion') or ''
+    if not isinstance(descripcion, str) or len(descripcion) > 200:
+        errores['descripcion'] = 'Texto de hasta 200 caracteres'
+    if errores:
+        return None, errores
+    return {'id_club_id': club, 'fecha': fecha, 'hora': hora, 'descripcion': descripcion}, None
+
+def inscribir_esperas(usuario, items):
+    """
+    Alta en lote de solicitudes de espera del usuario: valida todo, inserta
+    con un solo bulk_create y ajusta demanda, analítica y dashboard a mano
+    porque bulk_create no dispara señales. Todo o nada: si algún ítem es
+    inválido lanza ErrorApi con los errores por posición.
+    """
+    if not isinstance(items, list) or not items:
+        raise ErrorApi('Se esperaba una lista de solicitudes')
+    if len(items) > MAXIMO_LOTE_ESPERA:
+        raise ErrorApi(f'Como máximo {MAXIMO_LOTE_ESPERA} solicitudes por lote')
+
+    # Solo ids enteros: un club lista/objeto no es hasheable y lo rechaza _validar_espera
+    pedidos = {_id_club(item.get('club')) for item in items if isinstance(item, dict)}
+    pedidos.discard(None)
+    clubes = set(Club.objects.filter(id__in=pedidos).values_list('id', flat=True))
+    validos = []
+    errores = {}
+    for posicion, item in enumerate(items):
+        datos, error = _validar_espera(item, clubes)
+        if error:
+            errores[posicion] = error
+        else:
+            validos.append(datos)
+    if errores:
+        raise ErrorApi('Solicitudes inválidas', detalle=errores)
+
+    banda = demanda.banda_de(usuario.nivel_categoria)
+    with transaction.atomic():
+        creadas = EnEspera.objects.bulk_create([EnEspera(id_usuario=usuario, **datos) for datos in validos])
+        demanda.aplicar(Counter((e.id_club_id, e.fecha, e.hora, banda) for e in creadas))
+        eventos.publicar_esperas_nuevas([e.id for e in creadas])
+    analitica.marcar_semanas([e.fecha for e in creadas])
+    dashboard.invalidar_alumnos([usuario.id])
+    return creadas
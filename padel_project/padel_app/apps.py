@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class PadelAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'padel_app'
\ No newline at end of file
+    name = 'padel_app'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -1,7 +1,6 @@
 # padel_app/backends.py
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 
 class EmailOrUsernameModelBackend(ModelBackend):
     """
@@ -13,20 +12,16 @@ class EmailOrUsernameModelBackend(ModelBackend):
         if username is None:
             username = kwargs.get(UserModel.USERNAME_FIELD)
         
-        try:
-            # Buscar por username O por email (campo 'mail')
-            user = UserModel.objects.get(
-                Q(username__iexact=username) | Q(mail__iexact=username)
-            )
-        except UserModel.DoesNotExist:
+        if username is None:
+            return None
+        
+        # Buscar por username O por email (campo 'mail') en una sola consulta
+        # sobre los índices lower(); si hay varios, tomar el primero
+        user = UserModel.objects.por_login(username).order_by('id').first()
+        if user is None:
             # Ejecutar el set_password para reducir el timing difference
             UserModel().set_password(password)
             return None
-        except UserModel.MultipleObjectsReturned:
-            # Si hay múltiples usuarios, tomar el primero
-            user = UserModel.objects.filter(
-                Q(username__iexact=username) | Q(mail__iexact=username)
-            ).first()
 
         if user and user.check_password(password) and self.user_can_authenticate(user):
             return user
@@ -0,0 +1,171 @@
+# calendario.py - Feeds iCalendar (.ics) por alumno y por profesor
+#
+# El feed ya armado se guarda en cache por usuario junto con su ETag y el
+# token vigente: un cliente de calendario que consulta cada pocos minutos se
+# resuelve con una lectura de cache (304 si no cambió), sin tocar la base.
+# signals.py y los caminos con UPDATE/bulk_create (reservas, series)
+# invalidan a los usuarios afectados.
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from .canchas import DURACION_POR_DEFECTO
+from .models import Clase, CustomUser, Emparejamiento
+
+CALENDARIO_CACHE_SEGUNDOS = getattr(settings, 'CALENDARIO_CACHE_SEGUNDOS', 3600)
+CALENDARIO_DIAS_ATRAS = getattr(settings, 'CALENDARIO_DIAS_ATRAS', 30)
+CALENDARIO_DIAS_ADELANTE = getattr(settings, 'CALENDARIO_DIAS_ADELANTE', 180)
+PRODID = '-//Padel App//Clases//ES'
+# DTSTAMP se completa al final: el ETag se calcula sin él para que no cambie
+# en cada regeneración si las clases son las mismas
+MARCA = 'AAAAMMDDTHHMMSSZ'
+
+def clave(usuario_id):
+    return f'calendario:{usuario_id}'
+
+def token_de(usuario):
+    """Token del feed, generado la primera vez que se pide"""
+    if not usuario.token_calendario:
+        usuario.token_calendario = secrets.token_urlsafe(32)
+        usuario.save(update_fields=['token_calendario'])
+    return usuario.token_calendario
+
+def regenerar_token(usuario):
+    """Invalida la URL anterior (por ejemplo si se compartió por error)"""
+    usuario.token_calendario = secrets.token_urlsafe(32)
+    usuario.save(update_fields=['token_calendario'])
+    invalidar([usuario.id])
+    return usuario.token_calendario
+
+def invalidar(usuario_ids):
+    claves = [clave(usuario_id) for usuario_id in set(usuario_ids) if usuario_id]
+    if claves:
+        # Después del commit: antes, otro request podría volver a cachear datos viejos
+        transaction.on_commit(lambda: cache.delete_many(claves))
+
+def usuarios_de_clases(clases):
+    """Profesores y jugadores de un queryset de clases, en dos consultas"""
+    profesores = set(clases.values_list('id_profesor', flat=True))
+    jugadores = set(Emparejamiento.jugadores.through.objects
+                    .filter(emparejamiento__id_clase__in=clases)
+                    .values_list('customuser_id', flat=True))
+    return profesores | jugadores
+
+def invalidar_clases(clases):
+    invalidar(usuarios_de_clases(clases))
+
+def _escapar(texto):
+    return (str(texto).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+def _plegar(linea):
+    """RFC 5545: líneas de hasta 75 octetos, la continuación empieza con un espacio"""
+    partes = []
+    actual = ''
+    for caracter in linea:
+        limite = 75 if not partes else 74
+        if len((actual + caracter).encode()) > limite:
+            partes.append(actual)
+            actual = caracter
+        else:
+            actual += caracter
+    partes.append(actual)
+    return '\r\n '.join(partes)
+
+def _utc(momento):
+    return momento.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+CAMPOS = ('id', 'fecha', 'hora', 'descripcion', 'confirmado', 'cancelada_en', 'entrenamiento__nombre',
+          'entrenamiento__duracion_minutos', 'id_club__nombre_club', 'id_club__localidad',
+          'id_profesor__nombre', 'id_profesor__apellido')
+
+def clases_de(usuario):
+    hoy = timezone.localdate()
+    clases = Clase.objects.filter(fecha__gte=hoy - timedelta(days=CALENDARIO_DIAS_ATRAS),
+                                  fecha__lte=hoy + timedelta(days=CALENDARIO_DIAS_ADELANTE))
+    if usuario.rol == 'Profesor_Admin':
+        return clases.filter(id_profesor=usuario)
+    return clases.filter(id__in=Emparejamiento.jugadores.through.objects
+                         .filter(customuser_id=usuario.id)
+                         .values('emparejamiento__id_clase'))
+
+def _jugadores_por_clase(clases):
+    jugadores = {}
+    filas = (Emparejamiento.jugadores.through.objects
+             .filter(emparejamiento__id_clase__in=clases)
+             .values_list('emparejamiento__id_clase', 'customuser__nombre', 'customuser__apellido')
+             .order_by('customuser__nombre'))
+    for clase_id, nombre, apellido in filas:
+        jugadores.setdefault(clase_id, []).append(f'{nombre} {apellido}'.strip())
+    return jugadores
+
+def generar(usuario):
+    """Texto del VCALENDAR con una consulta de clases (y una de jugadores para profesores)"""
+    clases = clases_de(usuario)
+    jugadores = _jugadores_por_clase(clases) if usuario.rol == 'Profesor_Admin' else {}
+    lineas = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{_escapar("Clases de pádel")}',
+    ]
+    for fila in clases.order_by('fecha', 'hora').values(*CAMPOS):
+        inicio = timezone.make_aware(datetime.combine(fila['fecha'], fila['hora']))
+        fin = inicio + timedelta(minutes=fila['entrenamiento__duracion_minutos'] or DURACION_POR_DEFECTO)
+        if fila['cancelada_en']:
+            estado = 'CANCELLED'
+        elif fila['confirmado']:
+            estado = 'CONFIRMED'
+        else:
+            estado = 'TENTATIVE'
+        detalle = [f"Profesor: {fila['id_profesor__nombre']} {fila['id_profesor__apellido']}".strip()]
+        if fila['id'] in jugadores:
+            detalle.append('Jugadores: ' + ', '.join(jugadores[fila['id']]))
+        if fila['descripcion']:
+            detalle.append(fila['descripcion'])
+        lugar = ', '.join(v for v in (fila['id_club__nombre_club'], fila['id_club__localidad']) if v)
+        lineas += [
+            'BEGIN:VEVENT',
+            f"UID:clase-{fila['id']}@padel-app",
+            f'DTSTAMP:{MARCA}',
+            f'DTSTART:{_utc(inicio)}',
+            f'DTEND:{_utc(fin)}',
+            f"SUMMARY:{_escapar(fila['entrenamiento__nombre'] or 'Clase de pádel')}",
+            f'STATUS:{estado}',
+            f"DESCRIPTION:{_escapar(chr(10).join(detalle))}",
+        ]
+        if lugar:
+            lineas.append(f'LOCATION:{_escapar(lugar)}')
+        lineas.append('END:VEVENT')
+    lineas.append('END:VCALENDAR')
+    return '\r\n'.join(_plegar(linea) for linea in lineas) + '\r\n'
+
+def feed(usuario_id, token):
+    """
+    {'etag', 'cuerpo'} del feed del usuario, o None si el token no
+    corresponde. Con el feed en cache no hay ninguna consulta a la base.
+    """
+    datos = cache.get(clave(usuario_id))
+    if datos is None:
+        usuario = (CustomUser.objects.filter(pk=usuario_id, is_active=True)
+                   .exclude(token_calendario='').first())
+        if usuario is None or not constant_time_compare(usuario.token_calendario, token):
+            return None
+        plantilla = generar(usuario)
+        datos = {
+            'token': usuario.token_calendario,
+            'etag': f'"{hashlib.md5(plantilla.encode(), usedforsecurity=False).hexdigest()}"',
+            'cuerpo': plantilla.replace(f'\r\nDTSTAMP:{MARCA}', f'\r\nDTSTAMP:{_utc(timezone.now())}'),
+        }
+        cache.set(clave(usuario_id), datos, CALENDARIO_CACHE_SEGUNDOS)
+    if not constant_time_compare(datos['token'], token):
+        return None
+    return datos
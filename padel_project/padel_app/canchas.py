@@ -0,0 +1,114 @@
+# canchas.py - Ocupación de canchas por club y turno
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from .models import Clase
+
+DURACION_POR_DEFECTO = 60
+APERTURA = time(8)
+CIERRE = time(23)
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+def _hora(minutos):
+    return time(minutos // 60, minutos % 60)
+
+class SinCanchasLibres(Exception):
+    def __init__(self, club, fecha, hora, alternativas=()):
+        self.club = club
+        self.fecha = fecha
+        self.hora = hora
+        self.alternativas = list(alternativas)
+        super().__init__(f'No hay canchas libres en {club} el {fecha} a las {hora}')
+
+class IndiceOcupacion:
+    """
+    Índice de intervalos por día: inicios y finales ordenados por separado.
+    Las clases activas en el minuto t son (#inicios <= t) - (#finales <= t),
+    que se resuelve con dos bisect en O(log n).
+    """
+    def __init__(self, intervalos):
+        self.inicios = defaultdict(list)
+        self.finales = defaultdict(list)
+        for fecha, inicio, fin in intervalos:
+            self.inicios[fecha].append(inicio)
+            self.finales[fecha].append(fin)
+        for fecha in self.inicios:
+            self.inicios[fecha].sort()
+            self.finales[fecha].sort()
+
+    def activas(self, fecha, minuto):
+        return (bisect_right(self.inicios.get(fecha, ()), minuto)
+                - bisect_right(self.finales.get(fecha, ()), minuto))
+
+    def maximo_simultaneo(self, fecha, desde, hasta):
+        """Máximo de clases simultáneas en [desde, hasta)"""
+        inicios = self.inicios.get(fecha, ())
+        maximo = self.activas(fecha, desde)
+        # La ocupación sólo crece cuando empieza otra clase dentro del rango
+        for inicio in inicios[bisect_right(inicios, desde):bisect_left(inicios, hasta)]:
+            maximo = max(maximo, self.activas(fecha, inicio))
+        return maximo
+
+    @classmethod
+    def para_club(cls, club, desde, hasta, excluir_clase=None, excluir_serie=None):
+        """Una consulta sobre el índice (id_club, fecha, hora) para el rango pedido"""
+        clases = Clase.objects.filter(id_club=club, fecha__gte=desde, fecha__lte=hasta, cancelada_en__isnull=True)
+        if excluir_clase is not None:
+            clases = clases.exclude(pk=excluir_clase.pk)
+        if excluir_serie is not None:
+            clases = clases.exclude(serie=excluir_serie)
+        intervalos = []
+        for fecha, hora, duracion in clases.values_list('fecha', 'hora', 'entrenamiento__duracion_minutos'):
+            inicio = _minutos(hora)
+            intervalos.append((fecha, inicio, inicio + (duracion or DURACION_POR_DEFECTO)))
+        return cls(intervalos)
+
+def duracion_de(entrenamiento):
+    return entrenamiento.duracion_minutos if entrenamiento else DURACION_POR_DEFECTO
+
+def total_canchas(club):
+    return club.canchas_techo + club.canchas_sin_techo
+
+def canchas_libres(club, fecha, hora, duracion=DURACION_POR_DEFECTO, indice=None, excluir_clase=None):
+    if indice is None:
+        indice = IndiceOcupacion.para_club(club, fecha, fecha, excluir_clase)
+    inicio = _minutos(hora)
+    return max(0, total_canchas(club) - indice.maximo_simultaneo(fecha, inicio, inicio + duracion))
+
+def franjas_libres(club, desde, hasta, duracion=DURACION_POR_DEFECTO, paso=30):
+    """
+    {fecha: [(hora, canchas_libres), ...]} para cada franja entre APERTURA y
+    CIERRE en el rango de fechas, con una sola consulta a la base.
+    """
+    indice = IndiceOcupacion.para_club(club, desde, hasta)
+    resultado = {}
+    fecha = desde
+    while fecha <= hasta:
+        franjas = []
+        for inicio in range(_minutos(APERTURA), _minutos(CIERRE) - duracion + 1, paso):
+            franjas.append((_hora(inicio), canchas_libres(club, fecha, _hora(inicio), duracion, indice)))
+        resultado[fecha] = franjas
+        fecha += timedelta(days=1)
+    return resultado
+
+def alternativas_cercanas(club, fecha, hora, duracion=DURACION_POR_DEFECTO, cantidad=3, paso=30):
+    """Horarios del mismo día con cancha libre, ordenados por cercanía a `hora`"""
+    pedido = _minutos(hora)
+    libres = [h for h, libres in franjas_libres(club, fecha, fecha, duracion, paso)[fecha] if libres > 0]
+    return sorted(libres, key=lambda h: abs(_minutos(h) - pedido))[:cantidad]
+
+def verificar_capacidad(club, fecha, hora, duracion=DURACION_POR_DEFECTO, excluir_clase=None):
+    """
+    Lanza SinCanchasLibres (con horarios alternativos) si el turno está lleno.
+    Llamar dentro de una transacción después de bloquear el Club con
+    select_for_update para que dos reservas simultáneas no pasen ambas.
+    """
+    if isinstance(fecha, str):
+        fecha = datetime.strptime(fecha, '%Y-%m-%d').date()
+    if isinstance(hora, str):
+        hora = time.fromisoformat(hora)
+    if canchas_libres(club, fecha, hora, duracion, excluir_clase=excluir_clase) <= 0:
+        raise SinCanchasLibres(club, fecha, hora, alternativas_cercanas(club, fecha, hora, duracion))
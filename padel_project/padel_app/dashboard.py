@@ -0,0 +1,64 @@
+# dashboard.py - Datos de HomeView cacheados por usuario
+#
+# Usa el cache por defecto de Django (locmem si no se configura CACHES).
+# La invalidación la hacen los handlers de signals.py.
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Clase, EnEspera
+
+DASHBOARD_CACHE_SEGUNDOS = getattr(settings, 'DASHBOARD_CACHE_SEGUNDOS', 300)
+CLAVE_VERSION_PROFESORES = 'dashboard:profesor:version'
+
+def clave_alumno(usuario_id):
+    return f'dashboard:alumno:{usuario_id}'
+
+def version_inicial():
+    # Del reloj, en nanosegundos: si la versión se pierde (expulsión, reinicio
+    # del cache) la nueva queda por encima de cualquiera ya usada, y los incr
+    # nunca la alcanzan. Volver a 1 serviría de nuevo entradas viejas.
+    return time.time_ns()
+
+def clave_profesor(usuario_id):
+    # Las clases pendientes son las mismas para todos los profesores: en vez
+    # de borrar una clave por profesor se incrementa una versión compartida
+    version = cache.get_or_set(CLAVE_VERSION_PROFESORES, version_inicial, None)
+    return f'dashboard:profesor:{usuario_id}:{timezone.localdate()}:v{version}'
+
+def datos_dashboard(usuario):
+    if usuario.rol == 'Alumno_Usuario':
+        return cache.get_or_set(
+            clave_alumno(usuario.id),
+            lambda: {'en_espera': list(
+                EnEspera.objects.filter(id_usuario=usuario)
+                .select_related('id_club', 'id_clase')
+                .order_by('-fecha', '-hora')
+            )},
+            DASHBOARD_CACHE_SEGUNDOS
+        )
+    if usuario.rol == 'Profesor_Admin':
+        return cache.get_or_set(
+            clave_profesor(usuario.id),
+            lambda: {'clases_pendientes': list(
+                Clase.objects.filter(confirmado=False, cancelada_en__isnull=True, fecha__gte=timezone.localdate())
+                .select_related('id_profesor', 'entrenamiento', 'id_club')
+                .order_by('fecha', 'hora')
+            )},
+            DASHBOARD_CACHE_SEGUNDOS
+        )
+    return {}
+
+def invalidar_alumnos(usuario_ids):
+    cache.delete_many([clave_alumno(usuario_id) for usuario_id in set(usuario_ids)])
+
+def invalidar_profesores():
+    try:
+        cache.incr(CLAVE_VERSION_PROFESORES)
+    except ValueError:
+        # La versión expiró o nunca se creó: cualquier clave vieja queda huérfana.
+        # add y no set: si otro proceso la acaba de crear, se incrementa la suya
+        if not cache.add(CLAVE_VERSION_PROFESORES, version_inicial(), None):
+            cache.incr(CLAVE_VERSION_PROFESORES)
@@ -0,0 +1,134 @@
+# demanda.py - Tabla DemandaTurno mantenida de forma incremental
+#
+# Cada EnEspera sin clase ni emparejamiento suma 1 en su
+# (club, fecha, hora, banda de nivel). Los cambios hechos con save()/delete()
+# llegan por signals.py, igual que los cambios de nivel del usuario; los
+# UPDATE masivos sobre EnEspera tienen que pasar por actualizar_esperas() para
+# que la tabla no se desfase.
+from collections import Counter
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Value, When
+
+from . import eventos
+from .models import DemandaTurno, EnEspera
+
+TURNOS_POR_UPDATE = 200
+
+CAMPOS = ('id_club', 'fecha', 'hora', 'id_clase', 'id_emparejamiento', 'id_usuario__nivel_categoria')
+
+def banda_de(nivel):
+    return min(3, max(1, (nivel + 2) // 3))
+
+def clave(fila):
+    """(club, fecha, hora, banda) si la espera cuenta como demanda, si no None"""
+    if fila['id_clase'] is not None or fila['id_emparejamiento'] is not None:
+        return None
+    return (fila['id_club'], fila['fecha'], fila['hora'], banda_de(fila['id_usuario__nivel_categoria']))
+
+def estado(espera_id):
+    return EnEspera.objects.filter(pk=espera_id).values(*CAMPOS).first()
+
+def aplicar(deltas):
+    """
+    Suma cada delta {(club, fecha, hora, banda): n} con un UPDATE atómico
+    por cada TURNOS_POR_UPDATE turnos, no uno por turno (cierres, altas masivas).
+    """
+    deltas = {k: n for k, n in deltas.items() if k is not None and n}
+    if not deltas:
+        return
+    turnos = [(Q(id_club_id=c, fecha=f, hora=h, banda=b), n) for (c, f, h, b), n in deltas.items()]
+    # Sin savepoint propio: casi siempre corre dentro de la transacción de la reserva
+    with transaction.atomic(savepoint=False):
+        DemandaTurno.objects.bulk_create(
+            [DemandaTurno(id_club_id=c, fecha=f, hora=h, banda=b) for c, f, h, b in deltas],
+            ignore_conflicts=True
+        )
+        # Por lotes para no pasar el límite de profundidad de expresiones de SQLite
+        for i in range(0, len(turnos), TURNOS_POR_UPDATE):
+            lote = turnos[i:i + TURNOS_POR_UPDATE]
+            DemandaTurno.objects.filter(reduce(or_, (turno for turno, _ in lote))).update(
+                pendientes=F('pendientes') + Case(*[When(turno, then=Value(n)) for turno, n in lote],
+                                                  output_field=IntegerField())
+            )
+
+def registrar_cambio(anterior, actual):
+    deltas = Counter()
+    if anterior:
+        deltas[clave(anterior)] -= 1
+    if actual:
+        deltas[clave(actual)] += 1
+    aplicar(deltas)
+
+def actualizar_esperas(queryset, **campos):
+    """
+    queryset.update(**campos) ajustando la demanda de las filas afectadas.
+    Devuelve la cantidad de filas actualizadas.
+    """
+    with transaction.atomic(savepoint=False):
+        # Bloquea sólo las esperas (no los usuarios del join) y lee su estado previo
+        antes = {fila['id']: fila for fila in queryset.select_for_update(of=('self',)).values('id', *CAMPOS)}
+        if not antes:
+            return 0
+        filas = EnEspera.objects.filter(id__in=antes)
+        # El UPDATE conserva las condiciones del queryset (p. ej. id_clase IS NULL):
+        # si otra transacción ya tomó la fila, no se pisa
+        actualizadas = queryset.filter(id__in=antes).update(**campos)
+        despues = {fila['id']: fila for fila in filas.values('id', *CAMPOS)}
+        deltas = Counter(clave(fila) for fila in despues.values())
+        deltas.subtract(Counter(clave(fila) for fila in antes.values()))
+        aplicar(deltas)
+        cambios = [
+            {'id': i, 'clase': fila['id_clase'], 'emparejamiento': fila['id_emparejamiento']}
+            for i, fila in despues.items() if fila != antes.get(i)
+        ]
+        if cambios:
+            eventos.publicar_al_confirmar('espera', {'accion': 'actualizada', 'esperas': cambios})
+    return actualizadas
+
+def liberar_esperas_de_clase(clase):
+    """Antes de borrar una clase: sus esperas vuelven a la demanda (SET_NULL no dispara señales)"""
+    filas = (EnEspera.objects.filter(id_clase=clase)
+             .values('id_club', 'fecha', 'hora', 'id_usuario__nivel_categoria'))
+    aplicar(Counter(
+        (f['id_club'], f['fecha'], f['hora'], banda_de(f['id_usuario__nivel_categoria'])) for f in filas
+    ))
+
+def cambiar_banda(usuario_id, nivel_anterior, nivel_nuevo):
+    """
+    Después de editar nivel_categoria: las esperas abiertas del usuario
+    pasan de la banda anterior a la nueva en cada turno.
+    """
+    anterior, nueva = banda_de(nivel_anterior), banda_de(nivel_nuevo)
+    if anterior == nueva:
+        return
+    deltas = Counter()
+    filas = (EnEspera.objects.filter(id_usuario=usuario_id, id_clase__isnull=True, id_emparejamiento__isnull=True)
+             .values_list('id_club', 'fecha', 'hora'))
+    for club, fecha, hora in filas:
+        deltas[(club, fecha, hora, anterior)] -= 1
+        deltas[(club, fecha, hora, nueva)] += 1
+    aplicar(deltas)
+
+def recalcular_demanda():
+    """Reconstrucción completa, para reconciliar o después de cargas masivas"""
+    banda = Case(
+        When(id_usuario__nivel_categoria__lte=3, then=Value(1)),
+        When(id_usuario__nivel_categoria__lte=6, then=Value(2)),
+        default=Value(3),
+        output_field=IntegerField(),
+    )
+    filas = (EnEspera.objects.filter(id_clase__isnull=True, id_emparejamiento__isnull=True)
+             .values('id_club', 'fecha', 'hora', banda=banda)
+             .annotate(pendientes=Count('id'))
+             .order_by())
+    with transaction.atomic():
+        DemandaTurno.objects.all().delete()
+        DemandaTurno.objects.bulk_create(
+            [DemandaTurno(id_club_id=f['id_club'], fecha=f['fecha'], hora=f['hora'], banda=f['banda'],
+                          pendientes=f['pendientes']) for f in filas],
+            batch_size=2000
+        )
+    return len(filas)
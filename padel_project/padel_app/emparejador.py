@@ -0,0 +1,130 @@
+# emparejador.py - Propuestas automáticas de grupos a partir de la lista de espera
+from collections import defaultdict
+
+JUGADORES_POR_GRUPO = 4
+MINIMO_POR_GRUPO = 2
+
+def _intercalar(a, b):
+    """
+    Mezcla dos listas repartiendo los elementos de la más corta de forma
+    pareja a lo largo de la más larga (D, R, D, R... o D, D, R, D, D, R...)
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if not b:
+        return list(a)
+    resultado = []
+    paso = len(a) / len(b)
+    siguiente = paso / 2
+    j = 0
+    for i, item in enumerate(a):
+        resultado.append(item)
+        if j < len(b) and i + 1 >= siguiente:
+            resultado.append(b[j])
+            j += 1
+            siguiente += paso
+    resultado.extend(b[j:])
+    return resultado
+
+def _ordenar_por_nivel(esperas):
+    """
+    Ordena por nivel y, dentro de cada nivel, intercala Drive/Revés y reparte
+    a los zurdos para que los cortes de a 4 salgan balanceados.
+    """
+    por_nivel = defaultdict(list)
+    for espera in esperas:
+        por_nivel[espera.id_usuario.nivel_categoria].append(espera)
+
+    ordenadas = []
+    for nivel in sorted(por_nivel):
+        lados = {'Drive': [], 'Revés': []}
+        for espera in por_nivel[nivel]:
+            lados.get(espera.id_usuario.jugador_de, lados['Drive']).append(espera)
+        por_lado = []
+        for lado in lados.values():
+            zurdos = [e for e in lado if e.id_usuario.mano_habil == 'Z']
+            diestros = [e for e in lado if e.id_usuario.mano_habil != 'Z']
+            por_lado.append(_intercalar(diestros, zurdos))
+        ordenadas.extend(_intercalar(*por_lado))
+    return ordenadas
+
+def _cortes(total):
+    """Tamaños de grupo para `total` jugadores (nunca deja un grupo de 1)"""
+    if total < MINIMO_POR_GRUPO:
+        return []
+    tamanos = [JUGADORES_POR_GRUPO] * (total // JUGADORES_POR_GRUPO)
+    resto = total % JUGADORES_POR_GRUPO
+    if resto >= MINIMO_POR_GRUPO:
+        tamanos.append(resto)
+    elif resto == 1:
+        # 4 + 1 -> 3 + 2
+        tamanos[-1] -= 1
+        tamanos.append(MINIMO_POR_GRUPO)
+    return tamanos
+
+def _desbalance(grupo):
+    drive = sum(1 for e in grupo if e.id_usuario.jugador_de == 'Drive')
+    zurdos = sum(1 for e in grupo if e.id_usuario.mano_habil == 'Z')
+    return abs(2 * drive - len(grupo)) + max(0, zurdos - 1)
+
+def _ajustar_vecinos(grupos):
+    """
+    Una pasada de intercambios entre grupos consecutivos: sólo se cambian
+    jugadores del mismo nivel, así la dispersión de nivel no empeora.
+    """
+    for g1, g2 in zip(grupos, grupos[1:]):
+        actual = _desbalance(g1) + _desbalance(g2)
+        if actual == 0:
+            continue
+        for i, a in enumerate(g1):
+            mejor = None
+            for j, b in enumerate(g2):
+                if a.id_usuario.nivel_categoria != b.id_usuario.nivel_categoria:
+                    continue
+                g1[i], g2[j] = b, a
+                nuevo = _desbalance(g1) + _desbalance(g2)
+                g1[i], g2[j] = a, b
+                if nuevo < actual:
+                    actual, mejor = nuevo, j
+            if mejor is not None:
+                g1[i], g2[mejor] = g2[mejor], g1[i]
+    return grupos
+
+def _resumen(grupo):
+    niveles = [e.id_usuario.nivel_categoria for e in grupo]
+    return {
+        'esperas': grupo,
+        'dispersion_nivel': max(niveles) - min(niveles),
+        'nivel_promedio': round(sum(niveles) / len(niveles), 1),
+        'drive': sum(1 for e in grupo if e.id_usuario.jugador_de == 'Drive'),
+        'reves': sum(1 for e in grupo if e.id_usuario.jugador_de == 'Revés'),
+        'zurdos': sum(1 for e in grupo if e.id_usuario.mano_habil == 'Z'),
+    }
+
+def proponer_grupos_turno(esperas):
+    """
+    Parte las esperas de un mismo turno (club, fecha, hora) en grupos de
+    hasta 4 ordenando por nivel y cortando en bloques consecutivos
+    (sort-and-sweep, O(n log n)).
+    """
+    # Un alumno anotado dos veces en el mismo turno cuenta una sola vez
+    unicas = list({e.id_usuario_id: e for e in esperas}.values())
+    ordenadas = _ordenar_por_nivel(unicas)
+
+    grupos = []
+    inicio = 0
+    for tamano in _cortes(len(ordenadas)):
+        grupos.append(ordenadas[inicio:inicio + tamano])
+        inicio += tamano
+    return [_resumen(g) for g in _ajustar_vecinos(grupos)]
+
+def proponer_grupos(esperas):
+    """
+    Agrupa las esperas por turno y devuelve {(club_id, fecha, hora): [grupos]}.
+    `esperas` debe traer id_usuario con select_related.
+    """
+    por_turno = defaultdict(list)
+    for espera in esperas:
+        por_turno[(espera.id_club_id, espera.fecha, espera.hora)].append(espera)
+
+    return {turno: proponer_grupos_turno(lista) for turno, lista in por_turno.items()}
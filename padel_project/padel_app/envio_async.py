@@ -0,0 +1,190 @@
+# envio_async.py - Envío concurrente del outbox con asyncio
+#
+# Cada mensaje es una tarea; las sesiones SMTP son un pool acotado de
+# conexiones de Django que las tareas toman prestadas. El envío en sí es
+# bloqueante (smtplib) y corre en un pool de hilos propio, uno por sesión
+# (el executor por defecto de asyncio depende de la cantidad de CPUs), así
+# N sesiones trabajan a la vez sin cambiar de backend de email.
+#
+# - Límite por dominio del destinatario: los proveedores grandes cortan o
+#   demoran a quien les manda ráfagas.
+# - Errores transitorios (4xx, cortes de conexión) se reintentan con
+#   backoff exponencial y jitter sin retener la sesión mientras se espera.
+#   Si siguen fallando al final de la corrida, un 4xx cuenta un solo intento
+#   y un corte no cuenta ninguno: una caída del servidor no agota el outbox.
+# - El resultado de cada mensaje queda en su Notificacion apenas se conoce,
+#   con la misma contabilidad de intentos y backoff que el envío sincrónico.
+# - Antes de cada intento se renueva el reclamo: si venció mientras el
+#   mensaje esperaba turno, otro despachador lo tomó y no se envía.
+import asyncio
+import logging
+import random
+import smtplib
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from . import eventos
+from .models import Notificacion
+from .utils import (construir_email_notificacion, liberar_sin_intento, reclamar_notificaciones_pendientes,
+                    registrar_falla, renovar_reclamo)
+
+logger = logging.getLogger(__name__)
+
+ENVIO_SESIONES = getattr(settings, 'ENVIO_SESIONES', 8)
+ENVIO_POR_DOMINIO_SEGUNDO = getattr(settings, 'ENVIO_POR_DOMINIO_SEGUNDO', 20)
+ENVIO_REINTENTOS = getattr(settings, 'ENVIO_REINTENTOS', 4)
+ENVIO_ESPERA_BASE = getattr(settings, 'ENVIO_ESPERA_BASE', 0.5)
+ENVIO_ESPERA_MAXIMA = getattr(settings, 'ENVIO_ESPERA_MAXIMA', 30)
+
+ENVIADA = 'enviada'
+REINTENTAR = 'reintentar'
+FALLIDA = 'fallida'
+OMITIDA = 'omitida'
+
+class LimitadorPorDominio:
+    """
+    Espaciado uniforme por dominio: cada envío reserva el próximo turno
+    libre (1/tasa segundos después del anterior) y duerme hasta entonces.
+    """
+    def __init__(self, por_segundo):
+        self.intervalo = 1 / por_segundo if por_segundo else 0
+        self.proximo = {}
+
+    async def esperar(self, dominio):
+        if not self.intervalo:
+            return
+        # Sin await entre leer y reservar: en un solo event loop no hay carrera
+        ahora = time.monotonic()
+        turno = max(ahora, self.proximo.get(dominio, ahora))
+        self.proximo[dominio] = turno + self.intervalo
+        if turno > ahora:
+            await asyncio.sleep(turno - ahora)
+
+def es_corte(error):
+    """El servidor no respondió o cortó la sesión: no es culpa del mensaje"""
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException hereda de OSError: las respuestas del servidor no son cortes
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+def es_transitorio(error):
+    if es_corte(error):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= codigo < 500 for codigo, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+def espera_backoff(intento):
+    """Exponencial con jitter completo: uniforme en [0, base * 2^intento]"""
+    return random.uniform(0, min(ENVIO_ESPERA_MAXIMA, ENVIO_ESPERA_BASE * 2 ** intento))
+
+def _dominio(email):
+    return email.to[0].rsplit('@', 1)[-1].lower() if email.to else ''
+
+def registrar_resultado(notificacion, resultado, fallas, error=''):
+    """
+    Guarda el resultado en la fila con la contabilidad del envío sincrónico:
+    `fallas` (0 o 1) dice si el servidor rechazó el mensaje en esta corrida.
+    Las fallas liberan la fila con el backoff de utils.registrar_falla; si
+    sólo hubo cortes de conexión vuelve al outbox sin gastar un intento.
+    """
+    if resultado == REINTENTAR and not fallas:
+        liberar_sin_intento([notificacion], error)
+        return
+    if resultado != ENVIADA:
+        registrar_falla(notificacion, error, permanente=resultado == FALLIDA, fallas=fallas)
+        return
+    notificacion.enviada = True
+    notificacion.fecha_envio = timezone.now()
+    notificacion.intentos += fallas
+    Notificacion.objects.filter(pk=notificacion.pk).update(
+        enviada=True, fecha_envio=notificacion.fecha_envio, ultimo_error='', proximo_intento=None,
+        intentos=F('intentos') + fallas
+    )
+    eventos.bus.publicar('notificacion', eventos.datos_notificacion(notificacion))
+
+async def _enviar(notificacion, email, sesiones, hilos, limitador, reintentos):
+    loop = asyncio.get_running_loop()
+    dominio = _dominio(email)
+    error = ''
+    fallas = 0
+    for intento in range(reintentos + 1):
+        await limitador.esperar(dominio)
+        conexion = await sesiones.get()
+        # La espera por turno, sesión o backoff puede superar el reclamo
+        if not await sync_to_async(renovar_reclamo)(notificacion):
+            sesiones.put_nowait(conexion)
+            logger.warning(f"⚠️ Reclamo vencido de la notificación {notificacion.pk}: la envía otro despachador")
+            return OMITIDA
+        try:
+            await loop.run_in_executor(hilos, conexion.send_messages, [email])
+        except Exception as e:
+            error = str(e) or e.__class__.__name__
+            # Los reintentos de una corrida son un solo intento del outbox
+            if not es_corte(e):
+                fallas = 1
+            # La sesión puede haber quedado en un estado inválido: se reabre en el próximo uso
+            await loop.run_in_executor(hilos, conexion.close)
+            if not es_transitorio(e):
+                logger.error(f"❌ Falla permanente enviando a {email.to}: {error}")
+                resultado = FALLIDA
+                break
+            logger.warning(f"⏳ Falla transitoria enviando a {email.to} (intento {intento + 1}): {error}")
+            resultado = REINTENTAR
+        else:
+            resultado = ENVIADA
+            break
+        finally:
+            sesiones.put_nowait(conexion)
+        if intento < reintentos:
+            await asyncio.sleep(espera_backoff(intento))
+    await sync_to_async(registrar_resultado)(notificacion, resultado, fallas, error)
+    return resultado
+
+async def enviar_async(mensajes, sesiones=ENVIO_SESIONES, por_dominio_segundo=ENVIO_POR_DOMINIO_SEGUNDO,
+                       reintentos=ENVIO_REINTENTOS, **opciones_conexion):
+    """
+    Envía [(notificacion, EmailMessage), ...] con hasta `sesiones` sesiones
+    SMTP simultáneas. Devuelve un Counter por resultado.
+    """
+    pool = asyncio.Queue()
+    conexiones = [get_connection(fail_silently=False, **opciones_conexion)
+                  for _ in range(min(sesiones, len(mensajes)) or 1)]
+    for conexion in conexiones:
+        pool.put_nowait(conexion)
+    limitador = LimitadorPorDominio(por_dominio_segundo)
+    with ThreadPoolExecutor(max_workers=len(conexiones), thread_name_prefix='smtp') as hilos:
+        try:
+            resultados = await asyncio.gather(*[
+                _enviar(notificacion, email, pool, hilos, limitador, reintentos) for notificacion, email in mensajes
+            ])
+        finally:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(hilos, conexion.close) for conexion in conexiones])
+    return Counter(resultados)
+
+def despachar_async(limite=500, **opciones):
+    """
+    Versión concurrente de utils.despachar_notificaciones_pendientes: reclama
+    un lote del outbox y lo envía con enviar_async. Llamar desde código
+    sincrónico (comandos), no desde un event loop en marcha.
+    """
+    notificaciones = reclamar_notificaciones_pendientes(limite)
+    if not notificaciones:
+        return Counter()
+    mensajes = [
+        (n, construir_email_notificacion(n.id_usuario, n.tipo_evento, n.id_clase)) for n in notificaciones
+    ]
+    resultados = asyncio.run(enviar_async(mensajes, **opciones))
+    logger.info(f"✅ Lote async: {resultados[ENVIADA]} enviadas, {resultados[REINTENTAR]} a reintentar, "
+                f"{resultados[FALLIDA]} fallidas, {resultados[OMITIDA]} tomadas por otro despachador")
+    return resultados
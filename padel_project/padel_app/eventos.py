@@ -0,0 +1,234 @@
+# eventos.py - Pub/sub en proceso para el feed en vivo (Server-Sent Events)
+#
+# signals.py publica deltas chicos (espera nueva, emparejamiento creado,
+# estado de notificación) después del commit; cada conexión SSE abierta
+# tiene una cola asyncio en el event loop del servidor ASGI. publicar() se
+# puede llamar desde cualquier hilo: la entrega pasa por call_soon_threadsafe.
+#
+# El bus vive en la memoria del proceso. Con varios workers cada uno ve sólo
+# sus propias escrituras; los envíos de mail los hace despachar_notificaciones
+# en otro proceso, por eso VigiaEnvios consulta una vez por intervalo (para
+# todas las conexiones juntas) las notificaciones enviadas desde la última vuelta.
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Emparejamiento, EnEspera, Notificacion
+
+logger = logging.getLogger(__name__)
+
+EVENTOS_HISTORIAL = getattr(settings, 'EVENTOS_HISTORIAL', 500)
+EVENTOS_COLA_MAXIMA = getattr(settings, 'EVENTOS_COLA_MAXIMA', 200)
+EVENTOS_LATIDO_SEGUNDOS = getattr(settings, 'EVENTOS_LATIDO_SEGUNDOS', 25)
+EVENTOS_VIGIA_SEGUNDOS = getattr(settings, 'EVENTOS_VIGIA_SEGUNDOS', 5)
+TIPOS = ('espera', 'emparejamiento', 'notificacion')
+# Aviso al cliente de que perdió eventos y debe recargar la página
+RECARGAR = {'id': None, 'tipo': 'recargar', 'datos': {}}
+
+class Suscripcion:
+    def __init__(self, tipos, loop):
+        self.tipos = set(tipos)
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=EVENTOS_COLA_MAXIMA)
+
+    def _encolar(self, evento):
+        try:
+            self.cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se descarta lo pendiente y recarga
+            while not self.cola.empty():
+                self.cola.get_nowait()
+            self.cola.put_nowait(RECARGAR)
+
+    def entregar(self, evento):
+        if evento['tipo'] not in self.tipos:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._encolar, evento)
+        except RuntimeError:
+            # El loop ya cerró (apagado del servidor)
+            pass
+
+class Bus:
+    def __init__(self, historial=EVENTOS_HISTORIAL):
+        self._lock = threading.Lock()
+        self._suscripciones = set()
+        self._historial = deque(maxlen=historial)
+        self._ids = itertools.count(1)
+
+    def publicar(self, tipo, datos):
+        with self._lock:
+            evento = {'id': next(self._ids), 'tipo': tipo, 'datos': datos}
+            self._historial.append(evento)
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(evento)
+        return evento
+
+    def suscribir(self, tipos, ultimo_id=None):
+        """
+        Alta desde el event loop. Con ultimo_id (cabecera Last-Event-ID de una
+        reconexión) se reencolan los eventos del historial posteriores a ese id.
+        """
+        suscripcion = Suscripcion(tipos, asyncio.get_running_loop())
+        with self._lock:
+            if ultimo_id is not None:
+                if self._historial and ultimo_id < self._historial[0]['id'] - 1:
+                    suscripcion._encolar(RECARGAR)
+                else:
+                    for evento in self._historial:
+                        if evento['id'] > ultimo_id and evento['tipo'] in suscripcion.tipos:
+                            suscripcion._encolar(evento)
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def desuscribir(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+    def hay_suscriptores(self, tipo):
+        with self._lock:
+            return any(tipo in s.tipos for s in self._suscripciones)
+
+bus = Bus()
+
+def publicar_al_confirmar(tipo, datos):
+    """
+    Publica cuando la transacción en curso confirma (o ya, fuera de
+    transacción). robust: el feed en vivo es best-effort, si la consulta de
+    los datos falla se loguea y no convierte en error una escritura ya
+    confirmada.
+    """
+    transaction.on_commit(lambda: bus.publicar(tipo, datos() if callable(datos) else datos), robust=True)
+
+CAMPOS_ESPERA = {
+    'id': 'id',
+    'club': 'id_club',
+    'club_nombre': 'id_club__nombre_club',
+    'usuario': 'id_usuario',
+    'nombre': 'id_usuario__nombre',
+    'apellido': 'id_usuario__apellido',
+    'nivel': 'id_usuario__nivel_categoria',
+    'jugador_de': 'id_usuario__jugador_de',
+    'fecha': 'fecha',
+    'hora': 'hora',
+    'descripcion': 'descripcion',
+    'clase': 'id_clase',
+    'emparejamiento': 'id_emparejamiento',
+}
+
+def _filas_espera(ids):
+    return [dict(zip(CAMPOS_ESPERA, fila))
+            for fila in EnEspera.objects.filter(pk__in=ids).values_list(*CAMPOS_ESPERA.values())]
+
+def datos_espera(espera_id, accion):
+    filas = _filas_espera([espera_id])
+    if not filas:
+        return {'accion': 'eliminada', 'ids': [espera_id]}
+    return {'accion': accion, **filas[0]}
+
+def publicar_esperas_nuevas(ids):
+    """Para altas con bulk_create, que no disparan post_save: una consulta para todo el lote"""
+    def publicar():
+        for fila in _filas_espera(ids):
+            bus.publicar('espera', {'accion': 'nueva', **fila})
+    transaction.on_commit(publicar, robust=True)
+
+def datos_emparejamiento(emparejamiento_id):
+    fila = (Emparejamiento.objects.filter(pk=emparejamiento_id)
+            .values('id', 'id_clase', 'id_clase__fecha', 'id_clase__hora', 'id_clase__id_club').first())
+    if fila is None:
+        return {'id': emparejamiento_id, 'accion': 'eliminado'}
+    return {
+        'id': fila['id'], 'accion': 'creado', 'clase': fila['id_clase'], 'fecha': fila['id_clase__fecha'],
+        'hora': fila['id_clase__hora'], 'club': fila['id_clase__id_club'],
+        'jugadores': list(Emparejamiento.jugadores.through.objects
+                          .filter(emparejamiento_id=emparejamiento_id)
+                          .values_list('customuser_id', flat=True)),
+    }
+
+def datos_notificacion(notificacion):
+    return {
+        'id': notificacion.pk, 'usuario': notificacion.id_usuario_id, 'clase': notificacion.id_clase_id,
+        'tipo_evento': notificacion.tipo_evento,
+        'estado': 'enviada' if notificacion.enviada else 'pendiente',
+        'fecha_envio': notificacion.fecha_envio,
+    }
+
+def formatear(evento):
+    lineas = []
+    if evento['id'] is not None:
+        lineas.append(f"id: {evento['id']}")
+    lineas.append(f"event: {evento['tipo']}")
+    lineas.append('data: ' + json.dumps(evento['datos'], cls=DjangoJSONEncoder, separators=(',', ':')))
+    return '\n'.join(lineas) + '\n\n'
+
+def _enviadas_desde(marca):
+    return list(
+        Notificacion.objects.filter(enviada=True, fecha_envio__gt=marca)
+        .order_by('fecha_envio')
+        .values('id', 'tipo_evento', 'fecha_envio', usuario=F('id_usuario'), clase=F('id_clase'))[:1000]
+    )
+
+class VigiaEnvios:
+    """
+    Una tarea por proceso que publica las notificaciones marcadas como
+    enviadas por otros procesos. Corre sólo mientras haya suscriptores.
+    """
+    # Los commits del despachador pueden llegar con fecha_envio algo anterior
+    # a la última vista: se relee un margen y se descartan los ids repetidos
+    margen = timedelta(seconds=10)
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.tarea = None
+
+    def asegurar(self):
+        if self.tarea is None or self.tarea.done():
+            self.tarea = asyncio.get_running_loop().create_task(self.vigilar())
+
+    async def vigilar(self):
+        marca = timezone.now()
+        vistas = {}
+        while self.bus.hay_suscriptores('notificacion'):
+            await asyncio.sleep(EVENTOS_VIGIA_SEGUNDOS)
+            try:
+                filas = await sync_to_async(_enviadas_desde, thread_sensitive=False)(marca - self.margen)
+            except Exception as e:
+                logger.warning(f"⚠️ VigiaEnvios: {e}")
+                continue
+            for fila in filas:
+                if fila['id'] in vistas:
+                    continue
+                vistas[fila['id']] = fila['fecha_envio']
+                self.bus.publicar('notificacion', {**fila, 'estado': 'enviada'})
+                marca = max(marca, fila['fecha_envio'])
+            vistas = {i: f for i, f in vistas.items() if f > marca - self.margen}
+
+vigia = VigiaEnvios(bus)
+
+async def flujo(suscripcion):
+    """Cuerpo del StreamingHttpResponse: eventos de la cola y latidos para que los proxies no corten"""
+    try:
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                evento = await asyncio.wait_for(suscripcion.cola.get(), EVENTOS_LATIDO_SEGUNDOS)
+            except asyncio.TimeoutError:
+                yield ': latido\n\n'
+                continue
+            yield formatear(evento)
+    finally:
+        # Desconexión del cliente: el servidor ASGI cancela el generador
+        bus.desuscribir(suscripcion)
@@ -0,0 +1,131 @@
+# exportacion.py - Exportación CSV / XLSX en memoria constante
+#
+# Cada dataset es un values_list() recorrido con iterator(): nunca se
+# materializa el queryset completo ni se arma un DataFrame.
+import csv
+from tempfile import TemporaryFile
+
+from django.db.models import Count
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .models import Clase, Emparejamiento, EnEspera, Notificacion
+
+TAMANO_CHUNK = 2000
+
+def _clases(desde, hasta):
+    return (Clase.objects.filter(fecha__range=(desde, hasta))
+            .annotate(cant_jugadores=Count('emparejamiento__jugadores'))
+            .order_by('fecha', 'hora', 'id'))
+
+def _asistencia(desde, hasta):
+    return (Emparejamiento.jugadores.through.objects
+            .filter(emparejamiento__id_clase__fecha__range=(desde, hasta))
+            .order_by('emparejamiento__id_clase__fecha', 'emparejamiento__id_clase__hora', 'id'))
+
+def _espera(desde, hasta):
+    return EnEspera.objects.filter(fecha__range=(desde, hasta)).order_by('fecha', 'hora', 'id')
+
+def _notificaciones(desde, hasta):
+    return (Notificacion.objects.filter(fecha_creacion__date__range=(desde, hasta))
+            .order_by('fecha_creacion', 'id'))
+
+# nombre: (queryset(desde, hasta), [(encabezado, campo de values_list), ...])
+DATASETS = {
+    'clases': (_clases, [
+        ('ID', 'id'),
+        ('Fecha', 'fecha'),
+        ('Hora', 'hora'),
+        ('Club', 'id_club__nombre_club'),
+        ('Profesor', 'id_profesor__nombre'),
+        ('Profesor apellido', 'id_profesor__apellido'),
+        ('Entrenamiento', 'entrenamiento__nombre'),
+        ('Confirmada', 'confirmado'),
+        ('Cancelada', 'cancelada_en'),
+        ('Valor ARS', 'valor_ar'),
+        ('Jugadores', 'cant_jugadores'),
+    ]),
+    'asistencia': (_asistencia, [
+        ('Clase', 'emparejamiento__id_clase'),
+        ('Fecha', 'emparejamiento__id_clase__fecha'),
+        ('Hora', 'emparejamiento__id_clase__hora'),
+        ('Club', 'emparejamiento__id_clase__id_club__nombre_club'),
+        ('Emparejamiento', 'emparejamiento'),
+        ('Usuario', 'customuser__username'),
+        ('Nombre', 'customuser__nombre'),
+        ('Apellido', 'customuser__apellido'),
+        ('Nivel', 'customuser__nivel_categoria'),
+        ('Valor ARS', 'emparejamiento__id_clase__valor_ar'),
+    ]),
+    'espera': (_espera, [
+        ('ID', 'id'),
+        ('Fecha', 'fecha'),
+        ('Hora', 'hora'),
+        ('Club', 'id_club__nombre_club'),
+        ('Usuario', 'id_usuario__username'),
+        ('Nombre', 'id_usuario__nombre'),
+        ('Apellido', 'id_usuario__apellido'),
+        ('Clase', 'id_clase'),
+        ('Emparejamiento', 'id_emparejamiento'),
+    ]),
+    'notificaciones': (_notificaciones, [
+        ('ID', 'id'),
+        ('Usuario', 'id_usuario__username'),
+        ('Tipo', 'tipo_evento'),
+        ('Clase', 'id_clase'),
+        ('Creada', 'fecha_creacion'),
+        ('Enviada', 'enviada'),
+        ('Fecha envío', 'fecha_envio'),
+        ('Intentos', 'intentos'),
+        ('Último error', 'ultimo_error'),
+    ]),
+}
+
+def encabezados(dataset):
+    return [encabezado for encabezado, _ in DATASETS[dataset][1]]
+
+# Texto que Excel/LibreOffice interpretarían como fórmula (CSV/formula injection)
+INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+def _valor(valor):
+    # Nombres y descripciones los carga el usuario: con ' delante quedan como texto
+    if isinstance(valor, str) and valor.startswith(INICIO_FORMULA):
+        return "'" + valor
+    # Hora local sin zona: openpyxl no acepta datetimes aware
+    if getattr(valor, 'tzinfo', None) is not None:
+        return timezone.localtime(valor).replace(tzinfo=None)
+    return valor
+
+def filas(dataset, desde, hasta):
+    consulta, columnas = DATASETS[dataset]
+    for fila in (consulta(desde, hasta)
+                 .values_list(*[campo for _, campo in columnas])
+                 .iterator(chunk_size=TAMANO_CHUNK)):
+        yield [_valor(valor) for valor in fila]
+
+class _Eco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de guardarla"""
+    def write(self, valor):
+        return valor
+
+def filas_csv(dataset, desde, hasta):
+    writer = csv.writer(_Eco())
+    # BOM para que Excel abra bien los acentos
+    yield '\ufeff' + writer.writerow(encabezados(dataset))
+    for fila in filas(dataset, desde, hasta):
+        yield writer.writerow(fila)
+
+def archivo_xlsx(dataset, desde, hasta):
+    """
+    Escribe el XLSX en modo write-only (las filas van a disco a medida que
+    llegan) sobre un archivo temporal y lo devuelve rebobinado.
+    """
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet(dataset)
+    hoja.append(encabezados(dataset))
+    for fila in filas(dataset, desde, hasta):
+        hoja.append(fila)
+    archivo = TemporaryFile()
+    libro.save(archivo)
+    archivo.seek(0)
+    return archivo
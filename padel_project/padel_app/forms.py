@@ -1,7 +1,9 @@
 # padel_app/forms.py
 from django import forms
 from django.contrib.auth.forms import PasswordResetForm
-from .models import CustomUser
+from datetime import date
+
+from .models import Club, CustomUser, SerieClase
 
 class CustomPasswordResetForm(PasswordResetForm):
     """
@@ -20,8 +22,57 @@ class CustomPasswordResetForm(PasswordResetForm):
     
     def get_users(self, email):
         """Busca usuarios por el campo 'mail' en lugar de 'email'"""
-        active_users = CustomUser.objects.filter(
-            mail__iexact=email, 
-            is_active=True
-        )
-        return active_users
\ No newline at end of file
+        active_users = CustomUser.objects.por_mail(email).filter(is_active=True)
+        return active_users
+
+class SerieClaseForm(forms.ModelForm):
+    """Alta/edición de series. Las fechas excluidas se cargan como texto AAAA-MM-DD separado por comas."""
+    excluidas = forms.CharField(required=False)
+    
+    class Meta:
+        model = SerieClase
+        fields = ['dia_semana', 'hora', 'fecha_inicio', 'fecha_fin', 'valor_ar', 'entrenamiento', 'id_club',
+                  'descripcion', 'excluidas']
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.pk:
+            # Cambiar el día reordenaría todas las fechas: para eso se crea otra serie
+            self.fields['dia_semana'].disabled = True
+        self.initial['excluidas'] = ', '.join(self.instance.excluidas or [])
+    
+    def clean_excluidas(self):
+        fechas = []
+        for valor in self.cleaned_data['excluidas'].replace('\n', ',').split(','):
+            valor = valor.strip()
+            if not valor:
+                continue
+            try:
+                fechas.append(date.fromisoformat(valor).isoformat())
+            except ValueError:
+                raise forms.ValidationError(f'Fecha inválida: {valor} (usar AAAA-MM-DD)')
+        return sorted(set(fechas))
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        inicio, fin = cleaned_data.get('fecha_inicio'), cleaned_data.get('fecha_fin')
+        if inicio and fin and fin < inicio:
+            self.add_error('fecha_fin', 'La fecha de fin debe ser posterior al inicio.')
+        return cleaned_data
+
+class CierreClubForm(forms.Form):
+    """Cancelación masiva por cierre del club. Las fechas llegan de inputs datetime-local."""
+    club = forms.ModelChoiceField(queryset=Club.objects.order_by('nombre_club'))
+    desde = forms.DateTimeField()
+    hasta = forms.DateTimeField()
+    solo_sin_techo = forms.BooleanField(required=False)
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        desde, hasta = cleaned_data.get('desde'), cleaned_data.get('hasta')
+        if desde and hasta and hasta <= desde:
+            self.add_error('hasta', 'El fin del cierre debe ser posterior al inicio.')
+        club = cleaned_data.get('club')
+        if club and cleaned_data.get('solo_sin_techo') and not club.canchas_sin_techo:
+            self.add_error('solo_sin_techo', f'{club} no tiene canchas sin techo.')
+        return cleaned_data
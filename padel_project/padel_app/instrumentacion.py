@@ -0,0 +1,152 @@
+# instrumentacion.py - Consultas SQL y tiempos por vista
+#
+# Activar agregando a settings.MIDDLEWARE:
+#     'padel_app.instrumentacion.InstrumentacionMiddleware',
+#
+# Settings opcionales:
+#     INSTRUMENTACION_TAMANO_BUFFER   cantidad de requests que se guardan en memoria (1000)
+#     INSTRUMENTACION_ARCHIVO         ruta JSONL donde además se anexa cada medición
+#     INSTRUMENTACION_ESTRICTA        si es True, exceder el presupuesto lanza excepción (tests)
+#     PRESUPUESTO_CONSULTAS           {'url_name': max_consultas} para pisar el de la vista
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_buffer = deque(maxlen=getattr(settings, 'INSTRUMENTACION_TAMANO_BUFFER', 1000))
+_lock = threading.Lock()
+
+class PresupuestoConsultasExcedido(Exception):
+    pass
+
+class _ContadorConsultas:
+    def __init__(self):
+        self.cantidad = 0
+        self.tiempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.cantidad += 1
+            self.tiempo += time.perf_counter() - inicio
+
+def registrar(medicion):
+    with _lock:
+        _buffer.append(medicion)
+    archivo = getattr(settings, 'INSTRUMENTACION_ARCHIVO', None)
+    if archivo:
+        with open(archivo, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(medicion) + '\n')
+
+def mediciones():
+    with _lock:
+        return list(_buffer)
+
+def limpiar():
+    with _lock:
+        _buffer.clear()
+
+def leer_archivo(archivo):
+    with open(archivo, encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f if linea.strip()]
+
+def percentil(valores, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    if not valores:
+        return 0
+    indice = max(0, min(len(valores) - 1, round(p / 100 * len(valores) + 0.5) - 1))
+    return valores[indice]
+
+def resumen_por_vista(registros=None):
+    """
+    Agrupa las mediciones por url_name y devuelve p50/p95/p99/máximo de
+    consultas y tiempos, ordenado por tiempo total p95 descendente.
+    """
+    por_vista = defaultdict(list)
+    for medicion in mediciones() if registros is None else registros:
+        por_vista[medicion['vista']].append(medicion)
+
+    resumen = []
+    for vista, lista in por_vista.items():
+        fila = {'vista': vista, 'requests': len(lista)}
+        for campo in ('consultas', 'tiempo_sql_ms', 'tiempo_template_ms', 'tiempo_total_ms'):
+            valores = sorted(m[campo] for m in lista)
+            fila[campo] = {
+                'p50': percentil(valores, 50),
+                'p95': percentil(valores, 95),
+                'p99': percentil(valores, 99),
+                'max': valores[-1],
+            }
+        resumen.append(fila)
+    return sorted(resumen, key=lambda f: f['tiempo_total_ms']['p95'], reverse=True)
+
+def presupuesto_de(request):
+    """
+    Presupuesto de consultas para la vista resuelta: primero settings, después
+    el atributo `presupuesto_consultas` de la clase de la vista.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    presupuestos = getattr(settings, 'PRESUPUESTO_CONSULTAS', {})
+    if match.url_name in presupuestos:
+        return presupuestos[match.url_name]
+    vista = getattr(match.func, 'view_class', None)
+    return getattr(vista, 'presupuesto_consultas', None)
+
+class InstrumentacionMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = _ContadorConsultas()
+        request._tiempo_template = 0.0
+        inicio = time.perf_counter()
+
+        with ExitStack() as stack:
+            for conexion in connections.all():
+                stack.enter_context(conexion.execute_wrapper(contador))
+            response = self.get_response(request)
+
+        match = getattr(request, 'resolver_match', None)
+        medicion = {
+            'vista': match.url_name if match and match.url_name else request.path,
+            'metodo': request.method,
+            'status': response.status_code,
+            'consultas': contador.cantidad,
+            'tiempo_sql_ms': round(contador.tiempo * 1000, 2),
+            'tiempo_template_ms': round(request._tiempo_template * 1000, 2),
+            'tiempo_total_ms': round((time.perf_counter() - inicio) * 1000, 2),
+            'fecha': timezone.now().isoformat(),
+        }
+        registrar(medicion)
+
+        presupuesto = presupuesto_de(request)
+        if presupuesto is not None and contador.cantidad > presupuesto:
+            mensaje = (f"La vista {medicion['vista']} hizo {contador.cantidad} consultas "
+                       f"(presupuesto: {presupuesto})")
+            if getattr(settings, 'INSTRUMENTACION_ESTRICTA', False):
+                raise PresupuestoConsultasExcedido(mensaje)
+            logger.warning(f"⚠️ {mensaje}")
+
+        return response
+
+    def process_template_response(self, request, response):
+        # El render ocurre justo después de este hook
+        inicio = time.perf_counter()
+
+        def medir_render(rendered):
+            request._tiempo_template += time.perf_counter() - inicio
+
+        response.add_post_render_callback(medir_render)
+        return response
@@ -0,0 +1,15 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from padel_app.analitica import actualizar_resumenes
+
+class Command(BaseCommand):
+    help = 'Recalcula las tablas resumen de ingresos y ocupación (sólo semanas con cambios, salvo --completo)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--completo', action='store_true', help='Reconstruir todo el historial')
+        parser.add_argument('--desde', type=date.fromisoformat, help='Reconstruir desde esta fecha (AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        semanas = actualizar_resumenes(completo=options['completo'], desde=options['desde'])
+        self.stdout.write(self.style.SUCCESS(f'📊 {semanas} semanas recalculadas'))
@@ -0,0 +1,180 @@
+import json
+import platform
+import time
+import tracemalloc
+from datetime import datetime
+from math import log
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from padel_app.instrumentacion import percentil
+from padel_app.models import Clase, CustomUser, EnEspera
+
+class Command(BaseCommand):
+    help = ('Mide latencia, consultas y memoria de las vistas principales con datasets de tamaño '
+            'creciente (en una base de test descartable) y escribe un reporte JSON comparable entre commits')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alumnos', default='500,2000,8000', help='Tamaños de dataset (alumnos), separados por coma')
+        parser.add_argument('--meses', type=int, default=3, help='Meses de historia de cada dataset')
+        parser.add_argument('--repeticiones', type=int, default=20)
+        parser.add_argument('--salida', default='benchmark_vistas.json')
+
+    def handle(self, *args, **options):
+        tamanos = [int(t) for t in options['alumnos'].split(',')]
+        self.repeticiones = options['repeticiones']
+        setup_test_environment()
+        nombre_original = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            resultados = {}
+            for alumnos in tamanos:
+                call_command('flush', interactive=False, verbosity=0)
+                call_command('generar_datos_masivos', alumnos=alumnos, clubes=max(1, alumnos // 400),
+                             profesores=max(2, alumnos // 200), meses=options['meses'], verbosity=0,
+                             stdout=self.stdout)
+                resultados[alumnos] = self.medir()
+                self.imprimir(alumnos, resultados[alumnos])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            teardown_test_environment()
+
+        reporte = {
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'base_de_datos': connection.vendor,
+            'repeticiones': options['repeticiones'],
+            'resultados': resultados,
+            'crecimiento': self.crecimiento(tamanos, resultados),
+        }
+        with open(options['salida'], 'w', encoding='utf-8') as f:
+            json.dump(reporte, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Reporte escrito en {options['salida']}"))
+
+    def escenarios(self):
+        """(nombre, cliente, método, url, datos, verificar) de cada ruta a medir"""
+        profesor = CustomUser.objects.filter(rol='Profesor_Admin').order_by('id').first()
+        alumno = EnEspera.objects.values_list('id_usuario', flat=True).order_by('-fecha').first()
+        alumno = CustomUser.objects.get(id=alumno)
+        clase = Clase.objects.order_by('-fecha', '-hora').first()
+
+        como_profesor = Client()
+        como_profesor.force_login(profesor)
+        como_alumno = Client()
+        como_alumno.force_login(alumno)
+
+        return [
+            ('home', como_profesor, 'get', reverse('home'), None, None),
+            ('lista_espera', como_alumno, 'get', reverse('lista_espera'), None, None),
+            ('emparejamiento', como_profesor, 'get', reverse('emparejamiento'), None, None),
+            # Las repeticiones más la medición de memoria
+            ('crear_emparejamiento', como_profesor, 'post', reverse('crear_emparejamiento'),
+             self.grupos_disponibles(self.repeticiones + 1), self.turno_reservado),
+            ('gestion_espera', como_profesor, 'get', reverse('gestion_espera'), None, None),
+            ('lista_clases', como_profesor, 'get', reverse('lista_clases'), None, None),
+            ('gestionar_alumnos_clase', como_profesor, 'get', reverse('gestionar_alumnos_clase', args=[clase.id]),
+             None, None),
+            ('login', Client(), 'post', reverse('login'), {'username': profesor.username, 'password': 'pass123'}, None),
+        ]
+
+    def grupos_disponibles(self, cantidad):
+        """
+        POSTs para crear_emparejamiento: cada uno usa un turno distinto con al
+        menos dos alumnos sin asignar. Se arman antes de medir.
+        """
+        turnos = (EnEspera.objects.filter(id_clase__isnull=True, id_emparejamiento__isnull=True)
+                  .values('id_club', 'fecha', 'hora')
+                  .annotate(cantidad=Count('id_usuario', distinct=True))
+                  .filter(cantidad__gte=2).order_by('fecha', 'hora', 'id_club')[:cantidad])
+        posts = []
+        for turno in turnos:
+            jugadores = list(EnEspera.objects.filter(
+                id_club=turno['id_club'], fecha=turno['fecha'], hora=turno['hora'], id_clase__isnull=True
+            ).values_list('id_usuario', flat=True).distinct()[:4])
+            posts.append({'jugadores': jugadores, 'fecha': turno['fecha'].isoformat(),
+                          'hora': turno['hora'].isoformat(), 'club_id': turno['id_club'], 'valor_ar': '15000'})
+        if len(posts) < cantidad:
+            raise CommandError(f'crear_emparejamiento necesita {cantidad} turnos con al menos dos alumnos en espera '
+                               f'y el dataset tiene {len(posts)}: bajar --repeticiones o generar más alumnos')
+        return iter(posts)
+
+    def turno_reservado(self, datos):
+        """
+        La vista siempre redirige, también cuando muestra un error (sin
+        canchas libres, esperas ya asignadas): se mide sólo si los jugadores
+        quedaron con la clase asignada.
+        """
+        pendientes = EnEspera.objects.filter(
+            id_usuario__in=datos['jugadores'], id_club=datos['club_id'], fecha=datos['fecha'], hora=datos['hora'],
+            id_clase__isnull=True
+        )
+        if pendientes.exists():
+            return f"no reservó el turno {datos['fecha']} {datos['hora']} del club {datos['club_id']}"
+        return None
+
+    def pedir(self, cliente, metodo, url, datos):
+        """Devuelve la respuesta y los datos enviados"""
+        if metodo == 'get':
+            return cliente.get(url), None
+        if hasattr(datos, '__next__'):
+            datos = next(datos)
+        return cliente.post(url, datos), datos
+
+    def medir(self):
+        resultado = {}
+        for nombre, cliente, metodo, url, datos, verificar in self.escenarios():
+            latencias = []
+            consultas = []
+            for _ in range(self.repeticiones):
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    response, enviados = self.pedir(cliente, metodo, url, datos)
+                    latencias.append((time.perf_counter() - inicio) * 1000)
+                consultas.append(len(capturadas.captured_queries))
+                if response.status_code >= 400:
+                    raise CommandError(f'{nombre} respondió {response.status_code}')
+                error = verificar(enviados) if verificar else None
+                if error:
+                    raise CommandError(f'{nombre} falló: {error}')
+
+            # La memoria se mide aparte: tracemalloc distorsiona los tiempos
+            tracemalloc.start()
+            self.pedir(cliente, metodo, url, datos)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            latencias.sort()
+            resultado[nombre] = {
+                'p50_ms': round(percentil(latencias, 50), 2),
+                'p95_ms': round(percentil(latencias, 95), 2),
+                'p99_ms': round(percentil(latencias, 99), 2),
+                'consultas': max(consultas),
+                'memoria_pico_kb': round(pico / 1024, 1),
+            }
+        return resultado
+
+    def crecimiento(self, tamanos, resultados):
+        """
+        Exponente empírico de p50 entre el dataset más chico y el más grande:
+        ~0 constante, ~1 lineal, >1 superlineal.
+        """
+        if len(tamanos) < 2:
+            return {}
+        chico, grande = resultados[tamanos[0]], resultados[tamanos[-1]]
+        escala = log(tamanos[-1] / tamanos[0])
+        return {
+            vista: round(log(max(grande[vista]['p50_ms'], 0.01) / max(chico[vista]['p50_ms'], 0.01)) / escala, 2)
+            for vista in chico
+        }
+
+    def imprimir(self, alumnos, resultado):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Dataset: {alumnos} alumnos'))
+        for vista, m in resultado.items():
+            self.stdout.write(
+                f"  {vista:<26} p50 {m['p50_ms']:>8} ms  p95 {m['p95_ms']:>8} ms  "
+                f"{m['consultas']:>3} consultas  {m['memoria_pico_kb']:>8} KB"
+            )
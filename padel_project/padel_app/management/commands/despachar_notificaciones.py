@@ -0,0 +1,62 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from padel_app.envio_async import ENVIADA, ENVIO_SESIONES, FALLIDA, REINTENTAR, despachar_async
+from padel_app.utils import despachar_notificaciones_pendientes, reencolar_abandonadas
+
+class Command(BaseCommand):
+    help = 'Envía las notificaciones pendientes del outbox (modo continuo con --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help='Notificaciones reclamadas por lote')
+        parser.add_argument('--loop', action='store_true', help='Quedar escuchando el outbox indefinidamente')
+        parser.add_argument('--intervalo', type=float, default=5.0, help='Segundos de espera cuando no hay pendientes')
+        parser.add_argument('--async', dest='concurrente', action='store_true',
+                            help='Enviar cada lote con varias sesiones SMTP en paralelo (envio_async)')
+        parser.add_argument('--sesiones', type=int, default=ENVIO_SESIONES, help='Sesiones SMTP simultáneas con --async')
+        parser.add_argument('--reencolar', action='store_true',
+                            help='Antes de despachar, devolver al outbox las notificaciones que agotaron los intentos')
+
+    def handle(self, *args, **options):
+        lote = options['lote']
+        if options['reencolar']:
+            self.stdout.write(f'{reencolar_abandonadas()} notificaciones abandonadas vuelven al outbox')
+        if options['concurrente']:
+            return self.despachar_concurrente(options)
+        # Una sola conexión SMTP compartida por todos los lotes del proceso
+        connection = get_connection(fail_silently=False)
+        
+        try:
+            while True:
+                enviadas, fallidas = despachar_notificaciones_pendientes(lote, connection)
+                if enviadas or fallidas:
+                    self.stdout.write(f'Lote procesado: {enviadas} enviadas, {fallidas} fallidas')
+                
+                if not options['loop']:
+                    # Modo de una sola pasada: vaciar el outbox y terminar
+                    if enviadas == 0 or enviadas + fallidas < lote:
+                        break
+                    continue
+                
+                # Sin envíos exitosos no tiene sentido reintentar en caliente
+                if enviadas == 0:
+                    # No retener la sesión SMTP mientras el outbox está vacío
+                    connection.close()
+                    time.sleep(options['intervalo'])
+        finally:
+            connection.close()
+
+    def despachar_concurrente(self, options):
+        # Las sesiones se abren y cierran por lote dentro de envio_async
+        while True:
+            resultados = despachar_async(options['lote'], sesiones=options['sesiones'])
+            procesadas = sum(resultados.values())
+            if procesadas:
+                self.stdout.write(f"Lote procesado: {resultados[ENVIADA]} enviadas, "
+                                  f"{resultados[REINTENTAR] + resultados[FALLIDA]} fallidas")
+            if not options['loop']:
+                if not resultados[ENVIADA] or procesadas < options['lote']:
+                    break
+            elif not resultados[ENVIADA]:
+                time.sleep(options['intervalo'])
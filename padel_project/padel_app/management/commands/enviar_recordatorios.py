@@ -0,0 +1,52 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+from padel_app.recordatorios import RECORDATORIO_HORAS_ANTES, programar_recordatorios
+from padel_app.utils import despachar_notificaciones_pendientes
+
+class Command(BaseCommand):
+    help = 'Crea y envía los recordatorios de las clases confirmadas próximas (para cron o con --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--horas', type=float, default=RECORDATORIO_HORAS_ANTES,
+                            help='Ventana hacia adelante: clases que empiezan dentro de estas horas')
+        parser.add_argument('--lote', type=int, default=500, help='Clases procesadas por transacción')
+        parser.add_argument('--lote-envio', type=int, default=50, help='Notificaciones enviadas por lote')
+        parser.add_argument('--sin-envio', action='store_true', help='Sólo encolar; el envío queda para despachar_notificaciones')
+        parser.add_argument('--loop', action='store_true', help='Repetir indefinidamente')
+        parser.add_argument('--intervalo', type=float, default=60.0, help='Segundos entre pasadas con --loop')
+
+    def handle(self, *args, **options):
+        connection = None if options['sin_envio'] else get_connection(fail_silently=False)
+        try:
+            while True:
+                self.pasada(options, connection)
+                if not options['loop']:
+                    break
+                if connection is not None:
+                    connection.close()
+                time.sleep(options['intervalo'])
+        finally:
+            if connection is not None:
+                connection.close()
+
+    def pasada(self, options, connection):
+        total_clases = total_creadas = 0
+        while True:
+            clases, creadas = programar_recordatorios(options['horas'], options['lote'])
+            total_clases += clases
+            total_creadas += creadas
+            if clases < options['lote']:
+                break
+        if total_clases:
+            self.stdout.write(f'🔔 {total_creadas} recordatorios encolados para {total_clases} clases')
+
+        if connection is None:
+            return
+        while True:
+            enviadas, fallidas = despachar_notificaciones_pendientes(options['lote_envio'], connection)
+            if enviadas or fallidas:
+                self.stdout.write(f'Lote procesado: {enviadas} enviadas, {fallidas} fallidas')
+            if enviadas == 0 or enviadas + fallidas < options['lote_envio']:
+                break
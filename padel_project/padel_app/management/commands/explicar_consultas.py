@@ -0,0 +1,92 @@
+import random
+import time
+from datetime import date, time as hora, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from padel_app.models import Clase, Club, CustomUser, EnEspera, Notificacion
+
+class Command(BaseCommand):
+    help = 'Muestra el plan y el tiempo de las consultas más usadas por las vistas (usar antes/después de migrar índices)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sembrar', type=int, default=0, help='Crear N filas de espera/clases/notificaciones de prueba antes de medir; '
+                                 'se descartan con rollback al terminar')
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def consultas(self):
+        hoy = date.today()
+        muestra = EnEspera.objects.order_by('id').first()
+        fecha, hora_turno = (muestra.fecha, muestra.hora) if muestra else (hoy, hora(19))
+        return {
+            'EmparejamientoView': EnEspera.objects.filter(
+                id_clase__isnull=True, id_emparejamiento__isnull=True, fecha__gte=hoy
+            ).values('fecha', 'hora', 'id_club').annotate(cantidad=Count('id')).order_by('fecha', 'hora', 'id_club')[:31],
+            'GestionarAlumnosClaseView': EnEspera.objects.filter(
+                fecha=fecha, hora=hora_turno, id_clase__isnull=True
+            ),
+            'GestionEsperaView': EnEspera.objects.order_by('-fecha', '-hora')[:50],
+            'HomeView (profesor)': Clase.objects.filter(confirmado=False, cancelada_en__isnull=True, fecha__gte=hoy),
+            'ListaClasesView': Clase.objects.order_by('-fecha', '-hora')[:50],
+            'Outbox de notificaciones': Notificacion.objects.filter(enviada=False).order_by('fecha_creacion', 'id')[:50],
+        }
+
+    def sembrar(self, cantidad):
+        rnd = random.Random(42)
+        profesor = CustomUser.objects.filter(rol='Profesor_Admin').first() or CustomUser.objects.create(
+            username='profesor_explicar', rol='Profesor_Admin', nombre='Profesor', mail='profesor_explicar@ejemplo.com'
+        )
+        club = Club.objects.first() or Club.objects.create(
+            nombre_club='Club Explicar', canchas_techo=2, canchas_sin_techo=2,
+            tipo_superficie='Vidrio/Sintetico', valor_hora_ar=15000
+        )
+        alumnos = CustomUser.objects.bulk_create([
+            CustomUser(username=f'explicar_{i}', nombre=f'Alumno {i}', mail=f'explicar_{i}@ejemplo.com')
+            for i in range(max(cantidad // 20, 4))
+        ], batch_size=500)
+        inicio = date.today() - timedelta(days=365)
+
+        clases = Clase.objects.bulk_create([
+            Clase(id_profesor=profesor, fecha=inicio + timedelta(days=rnd.randrange(400)),
+                  hora=hora(rnd.randrange(8, 23)), valor_ar=15000, confirmado=rnd.random() < 0.95)
+            for _ in range(cantidad // 4)
+        ], batch_size=500)
+        EnEspera.objects.bulk_create([
+            EnEspera(id_club=club, id_usuario=rnd.choice(alumnos),
+                     fecha=inicio + timedelta(days=rnd.randrange(400)), hora=hora(rnd.randrange(8, 23)),
+                     id_clase=rnd.choice(clases) if rnd.random() < 0.9 else None)
+            for _ in range(cantidad)
+        ], batch_size=500)
+        Notificacion.objects.bulk_create([
+            Notificacion(id_usuario=rnd.choice(alumnos), tipo_evento='Confirmacion',
+                         id_clase=rnd.choice(clases), enviada=rnd.random() < 0.98)
+            for _ in range(cantidad)
+        ], batch_size=500)
+
+    def handle(self, *args, **options):
+        # Las filas sembradas (notificaciones sin enviar incluidas) no se confirman nunca:
+        # se mide dentro de la misma transacción y se descarta
+        with transaction.atomic():
+            if options['sembrar']:
+                self.sembrar(options['sembrar'])
+                if connection.vendor == 'postgresql':
+                    # Estadísticas con las filas nuevas para que el plan sea el de una base cargada
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE ' + ', '.join(m._meta.db_table for m in (EnEspera, Clase, Notificacion)))
+                self.stdout.write(self.style.SUCCESS(f"Sembradas {options['sembrar']} filas (se descartan al terminar)"))
+            self.medir(options['repeticiones'])
+            transaction.set_rollback(True)
+
+    def medir(self, repeticiones):
+        for nombre, queryset in self.consultas().items():
+            tiempos = []
+            for _ in range(repeticiones):
+                t0 = time.perf_counter()
+                list(queryset.all())
+                tiempos.append((time.perf_counter() - t0) * 1000)
+            tiempos.sort()
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{nombre}: mediana {tiempos[len(tiempos) // 2]:.2f} ms'
+            ))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,182 @@
+import random
+import time as reloj
+from datetime import date, datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from padel_app import analitica, dashboard
+from padel_app.canchas import total_canchas
+from padel_app.demanda import recalcular_demanda
+from padel_app.models import Clase, Club, CustomUser, Emparejamiento, EnEspera, Entrenamiento, Notificacion
+
+NIVELES = list(range(1, 10))
+PESOS_NIVEL = [4, 9, 15, 20, 20, 15, 9, 5, 3]
+HORAS = [time(h) for h in range(8, 23)]
+TIPOS_ENTRENO = [t for t, _ in Entrenamiento.TIPO_ENTRENO_CHOICES]
+
+class Command(BaseCommand):
+    help = 'Genera un volumen parametrizable de datos sintéticos (clubes, alumnos, clases, espera, notificaciones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clubes', type=int, default=5)
+        parser.add_argument('--profesores', type=int, default=10)
+        parser.add_argument('--alumnos', type=int, default=2000)
+        parser.add_argument('--meses', type=int, default=6, help='Meses de historia hacia atrás')
+        parser.add_argument('--dias-futuros', type=int, default=30, help='Días hacia adelante con lista de espera abierta')
+        parser.add_argument('--clases-por-dia', type=int, default=8, help='Clases promedio por club y día')
+        parser.add_argument('--espera-por-dia', type=int, default=20, help='Solicitudes sin asignar por club y día futuro')
+        parser.add_argument('--lote', type=int, default=5000, help='Tamaño de cada bulk_create')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--prefijo', default='sint', help='Prefijo de usernames y nombres de club generados')
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['semilla'])
+        self.lote = options['lote']
+        self.prefijo = options['prefijo']
+        # Un único hash compartido: hashear cada password tomaría minutos
+        self.password = make_password('pass123')
+        inicio = reloj.perf_counter()
+
+        clubes = self.crear_clubes(options['clubes'])
+        entrenamientos = self.crear_entrenamientos()
+        profesores = self.crear_usuarios(options['profesores'], 'Profesor_Admin')
+        alumnos = self.crear_usuarios(options['alumnos'], 'Alumno_Usuario')
+        self.stdout.write(f'{len(clubes)} clubes, {len(profesores)} profesores, {len(alumnos)} alumnos')
+
+        hoy = date.today()
+        desde = hoy - timedelta(days=options['meses'] * 30)
+        totales = {'clases': 0, 'esperas': 0, 'notificaciones': 0}
+
+        # Historia semana por semana para acotar memoria
+        dia = desde
+        while dia < hoy:
+            hasta = min(dia + timedelta(days=7), hoy)
+            for clave, cantidad in self.crear_historia(dia, hasta, clubes, entrenamientos, profesores,
+                                                       alumnos, options['clases_por_dia']).items():
+                totales[clave] += cantidad
+            dia = hasta
+
+        totales['esperas'] += self.crear_espera_futura(hoy, options['dias_futuros'], clubes, alumnos,
+                                                       options['espera_por_dia'])
+
+        # bulk_create no dispara señales: demanda, resúmenes y dashboard se reconstruyen a mano
+        turnos = recalcular_demanda()
+        semanas = analitica.actualizar_resumenes(desde=desde)
+        dashboard.invalidar_profesores()
+        self.stdout.write(f'{turnos} turnos con demanda, {semanas} semanas de analítica recalculadas')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totales['clases']} clases, {totales['esperas']} esperas, {totales['notificaciones']} notificaciones "
+            f"en {reloj.perf_counter() - inicio:.1f}s"
+        ))
+
+    def crear_clubes(self, cantidad):
+        superficies = [s for s, _ in Club.SURFACE_CHOICES]
+        clubes = []
+        for i in range(cantidad):
+            techo = self.rnd.randint(0, 4)
+            clubes.append(Club(
+                nombre_club=f'{self.prefijo} Club {i + 1}',
+                canchas_techo=techo,
+                canchas_sin_techo=self.rnd.randint(1, 6),
+                es_techado=techo > 0,
+                tipo_superficie=self.rnd.choice(superficies),
+                cant_profesores=self.rnd.randint(1, 5),
+                localidad='CABA',
+                provincia='Buenos Aires',
+                valor_hora_ar=self.rnd.choice([12000, 15000, 18000, 22000]),
+            ))
+        return Club.objects.bulk_create(clubes, batch_size=self.lote)
+
+    def crear_entrenamientos(self):
+        return Entrenamiento.objects.bulk_create([
+            Entrenamiento(nombre=f'{self.prefijo} {tipo}', tipo_entreno=tipo,
+                          duracion_minutos=self.rnd.choice([60, 90]))
+            for tipo in TIPOS_ENTRENO
+        ])
+
+    def crear_usuarios(self, cantidad, rol):
+        etiqueta = 'prof' if rol == 'Profesor_Admin' else 'alu'
+        usuarios = []
+        for i in range(cantidad):
+            username = f'{self.prefijo}_{etiqueta}_{i}'
+            usuarios.append(CustomUser(
+                username=username,
+                password=self.password,
+                rol=rol,
+                nombre=f'{etiqueta.capitalize()} {i}',
+                apellido=self.prefijo,
+                mail=f'{username}@ejemplo.com',
+                celular='+5491100000000',
+                nivel_categoria=self.rnd.choices(NIVELES, PESOS_NIVEL)[0],
+                jugador_de='Drive' if self.rnd.random() < 0.55 else 'Revés',
+                mano_habil='Z' if self.rnd.random() < 0.12 else 'D',
+            ))
+        return CustomUser.objects.bulk_create(usuarios, batch_size=self.lote)
+
+    @transaction.atomic
+    def crear_historia(self, desde, hasta, clubes, entrenamientos, profesores, alumnos, clases_por_dia):
+        clases = []
+        detalle = []  # (club, jugadores) en paralelo a clases
+        dia = desde
+        while dia < hasta:
+            for club in clubes:
+                cantidad = max(0, int(self.rnd.gauss(clases_por_dia, clases_por_dia / 4)))
+                # Canchas ocupadas por franja de 30 minutos: nunca más clases simultáneas que canchas
+                ocupadas = {}
+                for hora in self.rnd.sample(HORAS, min(cantidad, len(HORAS))):
+                    entrenamiento = self.rnd.choice(entrenamientos)
+                    inicio = hora.hour * 60
+                    franjas = range(inicio, inicio + entrenamiento.duracion_minutos, 30)
+                    if any(ocupadas.get(franja, 0) >= total_canchas(club) for franja in franjas):
+                        continue
+                    for franja in franjas:
+                        ocupadas[franja] = ocupadas.get(franja, 0) + 1
+                    clases.append(Clase(
+                        id_profesor_id=self.rnd.choice(profesores).id,
+                        id_club_id=club.id,
+                        fecha=dia,
+                        hora=hora,
+                        confirmado=self.rnd.random() < 0.97,
+                        notificado=True,
+                        valor_ar=club.valor_hora_ar,
+                        entrenamiento_id=entrenamiento.id,
+                    ))
+                    detalle.append((club, self.rnd.sample(alumnos, self.rnd.choice([2, 3, 4, 4, 4]))))
+            dia += timedelta(days=1)
+
+        clases = Clase.objects.bulk_create(clases, batch_size=self.lote)
+        emparejamientos = Emparejamiento.objects.bulk_create(
+            [Emparejamiento(id_clase_id=clase.id) for clase in clases], batch_size=self.lote
+        )
+
+        Jugadores = Emparejamiento.jugadores.through
+        jugadores = []
+        esperas = []
+        notificaciones = []
+        for clase, emparejamiento, (club, grupo) in zip(clases, emparejamientos, detalle):
+            envio = timezone.make_aware(datetime.combine(clase.fecha, clase.hora)) - timedelta(days=1)
+            for alumno in grupo:
+                jugadores.append(Jugadores(emparejamiento_id=emparejamiento.id, customuser_id=alumno.id))
+                esperas.append(EnEspera(id_club_id=club.id, id_usuario_id=alumno.id, fecha=clase.fecha, hora=clase.hora,
+                                        id_clase_id=clase.id, id_emparejamiento_id=emparejamiento.id))
+                notificaciones.append(Notificacion(id_usuario_id=alumno.id, tipo_evento='Confirmacion', id_clase_id=clase.id,
+                                                   enviada=True, fecha_envio=envio))
+        Jugadores.objects.bulk_create(jugadores, batch_size=self.lote)
+        EnEspera.objects.bulk_create(esperas, batch_size=self.lote)
+        Notificacion.objects.bulk_create(notificaciones, batch_size=self.lote)
+        return {'clases': len(clases), 'esperas': len(esperas), 'notificaciones': len(notificaciones)}
+
+    @transaction.atomic
+    def crear_espera_futura(self, hoy, dias, clubes, alumnos, por_dia):
+        esperas = []
+        for offset in range(1, dias + 1):
+            fecha = hoy + timedelta(days=offset)
+            for club in clubes:
+                for _ in range(max(0, int(self.rnd.gauss(por_dia, por_dia / 3)))):
+                    esperas.append(EnEspera(id_club_id=club.id, id_usuario_id=self.rnd.choice(alumnos).id,
+                                            fecha=fecha, hora=self.rnd.choice(HORAS)))
+        EnEspera.objects.bulk_create(esperas, batch_size=self.lote)
+        return len(esperas)
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from padel_app.series import SERIES_VENTANA_DIAS, materializar_pendientes
+
+class Command(BaseCommand):
+    help = f'Materializa las clases de las series activas hasta hoy + {SERIES_VENTANA_DIAS} días (para cron diario)'
+
+    def handle(self, *args, **options):
+        series, clases = materializar_pendientes()
+        self.stdout.write(self.style.SUCCESS(f'🔁 {clases} clases creadas en {series} series'))
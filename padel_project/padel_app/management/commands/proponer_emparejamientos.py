@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from padel_app.emparejador import proponer_grupos
+from padel_app.models import EnEspera
+
+class Command(BaseCommand):
+    help = 'Muestra los grupos sugeridos para la lista de espera sin asignar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, default=None, help='Fecha inicial (AAAA-MM-DD)')
+        parser.add_argument('--hasta', type=date.fromisoformat, default=None, help='Fecha final (AAAA-MM-DD)')
+        parser.add_argument('--club', type=int, default=None, help='ID del club')
+
+    def handle(self, *args, **options):
+        esperas = EnEspera.objects.filter(
+            id_clase__isnull=True,
+            id_emparejamiento__isnull=True
+        ).select_related('id_usuario')
+        if options['desde']:
+            esperas = esperas.filter(fecha__gte=options['desde'])
+        if options['hasta']:
+            esperas = esperas.filter(fecha__lte=options['hasta'])
+        if options['club']:
+            esperas = esperas.filter(id_club_id=options['club'])
+
+        propuestas = proponer_grupos(esperas.order_by('fecha', 'hora', 'id_club'))
+        total = 0
+        for (club_id, fecha, hora), grupos in propuestas.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Club {club_id} - {fecha} {hora}'))
+            for grupo in grupos:
+                jugadores = ', '.join(
+                    f'{e.id_usuario} (N{e.id_usuario.nivel_categoria} {e.id_usuario.jugador_de})'
+                    for e in grupo['esperas']
+                )
+                self.stdout.write(f'  [dispersión {grupo["dispersion_nivel"]}] {jugadores}')
+                total += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{total} grupos sugeridos en {len(propuestas)} turnos'))
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from padel_app.demanda import recalcular_demanda
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla DemandaTurno desde EnEspera (después de cargas masivas o para reconciliar)'
+
+    def handle(self, *args, **options):
+        filas = recalcular_demanda()
+        self.stdout.write(self.style.SUCCESS(f'📊 {filas} turnos con demanda'))
@@ -0,0 +1,34 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from padel_app.instrumentacion import leer_archivo, resumen_por_vista
+
+class Command(BaseCommand):
+    help = 'Muestra percentiles de consultas y tiempos por vista a partir del archivo de InstrumentacionMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--archivo', default=None, help='JSONL de mediciones (por defecto settings.INSTRUMENTACION_ARCHIVO)')
+        parser.add_argument('--json', action='store_true', help='Salida en JSON')
+
+    def handle(self, *args, **options):
+        archivo = options['archivo'] or getattr(settings, 'INSTRUMENTACION_ARCHIVO', None)
+        if not archivo:
+            raise CommandError('Indicá --archivo o configurá INSTRUMENTACION_ARCHIVO')
+        try:
+            resumen = resumen_por_vista(leer_archivo(archivo))
+        except FileNotFoundError:
+            raise CommandError(f'No existe el archivo {archivo}')
+
+        if options['json']:
+            self.stdout.write(json.dumps(resumen, indent=2))
+            return
+
+        self.stdout.write(f"{'vista':<28}{'reqs':>6}{'cons p50':>10}{'cons p95':>10}{'sql p95':>10}{'tpl p95':>10}{'tot p50':>10}{'tot p95':>10}{'tot p99':>10}")
+        for fila in resumen:
+            self.stdout.write(
+                f"{fila['vista']:<28}{fila['requests']:>6}"
+                f"{fila['consultas']['p50']:>10}{fila['consultas']['p95']:>10}"
+                f"{fila['tiempo_sql_ms']['p95']:>10}{fila['tiempo_template_ms']['p95']:>10}"
+                f"{fila['tiempo_total_ms']['p50']:>10}{fila['tiempo_total_ms']['p95']:>10}{fila['tiempo_total_ms']['p99']:>10}"
+            )
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0002_entrenamiento_remove_notificacion_fecha_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='intentos',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='reclamada_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='ultimo_error',
+            field=models.TextField(blank=True),
+        ),
+    ]
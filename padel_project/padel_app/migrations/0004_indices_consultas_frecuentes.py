@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0003_notificacion_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['fecha', 'hora'], name='clase_fecha_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(condition=models.Q(('confirmado', False)), fields=['fecha', 'hora'], name='clase_pendientes_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enespera',
+            index=models.Index(fields=['fecha', 'hora'], name='enespera_fecha_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enespera',
+            index=models.Index(condition=models.Q(('id_clase__isnull', True), ('id_emparejamiento__isnull', True)), fields=['fecha', 'hora', 'id_club'], name='enespera_sin_asignar_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(condition=models.Q(('enviada', False)), fields=['fecha_creacion', 'id'], name='notif_pendientes_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:08
+
+import django.db.models.functions.text
+import padel_app.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('padel_app', '0004_indices_consultas_frecuentes'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', padel_app.models.CustomUserManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('username'), name='customuser_username_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(django.db.models.functions.text.Lower('mail'), name='customuser_mail_lower_idx'),
+        ),
+    ]
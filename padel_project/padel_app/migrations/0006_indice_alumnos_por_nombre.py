@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('padel_app', '0005_indices_login_sin_mayusculas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['rol', 'nombre', 'id'], name='customuser_rol_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def completar_club_de_clases(apps, schema_editor):
+    """Toma el club de las esperas ya asignadas a cada clase"""
+    Clase = apps.get_model('padel_app', 'Clase')
+    EnEspera = apps.get_model('padel_app', 'EnEspera')
+    club_de_espera = EnEspera.objects.filter(id_clase=models.OuterRef('pk')).values('id_club')[:1]
+    Clase.objects.filter(id_club__isnull=True).update(id_club=models.Subquery(club_de_espera))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0006_indice_alumnos_por_nombre'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clase',
+            name='id_club',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='padel_app.club'),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['id_club', 'fecha', 'hora'], name='clase_club_fecha_idx'),
+        ),
+        migrations.RunPython(completar_club_de_clases, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0007_clase_club'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clase',
+            name='recordatorio_enviado',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(condition=models.Q(('confirmado', True), ('recordatorio_enviado__isnull', True)), fields=['fecha', 'hora'], name='clase_recordatorio_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='notificacion',
+            constraint=models.UniqueConstraint(condition=models.Q(('tipo_evento', 'Recordatorio')), fields=('id_usuario', 'id_clase'), name='notif_recordatorio_unico'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0008_recordatorios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SemanaPendienteAnalitica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField(unique=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ResumenSemanalClases',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField()),
+                ('tipo_entreno', models.CharField(blank=True, max_length=20)),
+                ('clases', models.IntegerField(default=0)),
+                ('clases_confirmadas', models.IntegerField(default=0)),
+                ('jugadores', models.IntegerField(default=0)),
+                ('minutos_cancha', models.IntegerField(default=0)),
+                ('ingresos_ar', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('id_club', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='padel_app.club')),
+                ('id_profesor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['semana'], name='resumen_clases_semana_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenSemanalEspera',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('semana', models.DateField()),
+                ('solicitudes', models.IntegerField(default=0)),
+                ('asignadas', models.IntegerField(default=0)),
+                ('id_club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='padel_app.club')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('semana', 'id_club'), name='resumen_espera_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def cargar_demanda(apps, schema_editor):
+    """Carga inicial desde las esperas sin asignar (misma lógica que demanda.recalcular_demanda)"""
+    EnEspera = apps.get_model('padel_app', 'EnEspera')
+    DemandaTurno = apps.get_model('padel_app', 'DemandaTurno')
+    banda = models.Case(
+        models.When(id_usuario__nivel_categoria__lte=3, then=models.Value(1)),
+        models.When(id_usuario__nivel_categoria__lte=6, then=models.Value(2)),
+        default=models.Value(3),
+        output_field=models.IntegerField(),
+    )
+    filas = (EnEspera.objects.filter(id_clase__isnull=True, id_emparejamiento__isnull=True)
+             .values('id_club', 'fecha', 'hora', banda=banda)
+             .annotate(pendientes=models.Count('id'))
+             .order_by())
+    DemandaTurno.objects.bulk_create(
+        [DemandaTurno(id_club_id=f['id_club'], fecha=f['fecha'], hora=f['hora'], banda=f['banda'],
+                      pendientes=f['pendientes']) for f in filas],
+        batch_size=2000
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0009_resumenes_analitica'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandaTurno',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora', models.TimeField()),
+                ('banda', models.PositiveSmallIntegerField(choices=[(1, 'Inicial (1-3)'), (2, 'Intermedio (4-6)'), (3, 'Avanzado (7-9)')])),
+                ('pendientes', models.IntegerField(default=0)),
+                ('id_club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='padel_app.club')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fecha', 'hora'], name='demanda_fecha_hora_idx')],
+                'constraints': [models.UniqueConstraint(fields=('id_club', 'fecha', 'hora', 'banda'), name='demanda_turno_unico')],
+            },
+        ),
+        migrations.RunPython(cargar_demanda, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0010_demanda_turno'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clase',
+            name='cancelada_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SerieClase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descripcion', models.CharField(blank=True, max_length=200)),
+                ('dia_semana', models.PositiveSmallIntegerField(choices=[(0, 'Lunes'), (1, 'Martes'), (2, 'Miércoles'), (3, 'Jueves'), (4, 'Viernes'), (5, 'Sábado'), (6, 'Domingo')])),
+                ('hora', models.TimeField()),
+                ('valor_ar', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('fecha_inicio', models.DateField()),
+                ('fecha_fin', models.DateField()),
+                ('excluidas', models.JSONField(blank=True, default=list)),
+                ('activa', models.BooleanField(default=True)),
+                ('generada_hasta', models.DateField(blank=True, null=True)),
+                ('entrenamiento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='padel_app.entrenamiento')),
+                ('id_club', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='padel_app.club')),
+                ('id_profesor', models.ForeignKey(limit_choices_to={'rol': 'Profesor_Admin'}, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='clase',
+            name='serie',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clases', to='padel_app.serieclase'),
+        ),
+        migrations.AddIndex(
+            model_name='clase',
+            index=models.Index(fields=['serie', 'fecha'], name='clase_serie_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serieclase',
+            index=models.Index(condition=models.Q(('activa', True)), fields=['generada_hasta'], name='serie_activas_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0011_series_de_clases'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(condition=models.Q(('enviada', True)), fields=['fecha_envio'], name='notif_enviadas_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0012_indice_envios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='token_calendario',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0013_token_calendario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='proximo_intento',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
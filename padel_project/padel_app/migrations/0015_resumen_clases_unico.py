@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('padel_app', '0014_notificacion_proximo_intento'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='resumensemanalclases',
+            constraint=models.UniqueConstraint(fields=('semana', 'id_club', 'id_profesor', 'tipo_entreno'), name='resumen_clases_unico'),
+        ),
+    ]
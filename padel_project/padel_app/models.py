@@ -1,9 +1,27 @@
 from django.db import models
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db.models.functions import Lower
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from django.core.mail import send_mail  # ← AGREGAR ESTE IMPORT
 
+class CustomUserManager(UserManager):
+    """
+    Búsquedas sin distinguir mayúsculas sobre lower(username) / lower(mail),
+    que son las expresiones indexadas en CustomUser.Meta. El valor buscado
+    también lo pasa a minúsculas la base: LOWER() de SQLite sólo convierte
+    ASCII, y con str.lower() en Python 'ÑandúX' dejaría de coincidir consigo mismo.
+    """
+    def por_mail(self, mail):
+        return self.alias(mail_lower=Lower('mail')).filter(mail_lower=Lower(models.Value(mail)))
+    
+    def por_login(self, valor):
+        valor = Lower(models.Value(valor))
+        return self.alias(
+            username_lower=Lower('username'),
+            mail_lower=Lower('mail'),
+        ).filter(models.Q(username_lower=valor) | models.Q(mail_lower=valor))
+
 # Custom User Model (EXISTENTE)
 class CustomUser(AbstractUser):
     ROL_CHOICES = [
@@ -37,6 +55,19 @@ class CustomUser(AbstractUser):
     localidad = models.CharField(max_length=100, blank=True)
     provincia = models.CharField(max_length=100, blank=True)
     pais = models.CharField(max_length=100, blank=True)
+    # Secreto de la URL del feed .ics (calendario.py); vacío hasta el primer uso
+    token_calendario = models.CharField(max_length=64, blank=True)
+    
+    objects = CustomUserManager()
+    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Login por usuario o email sin distinguir mayúsculas
+            models.Index(Lower('username'), name='customuser_username_lower_idx'),
+            models.Index(Lower('mail'), name='customuser_mail_lower_idx'),
+            # GestionAlumnosView pagina alumnos por (nombre, id)
+            models.Index(fields=['rol', 'nombre', 'id'], name='customuser_rol_nombre_idx'),
+        ]
     
     # MÉTODOS PARA PASSWORD RESET - AGREGAR ESTOS
     def get_email(self):
@@ -98,6 +129,40 @@ class Entrenamiento(models.Model):
     def __str__(self):
         return f"{self.nombre} ({self.get_tipo_entreno_display()})"
 
+# Recurring series: series.py materializa sus Clase por ventanas
+class SerieClase(models.Model):
+    DIA_SEMANA_CHOICES = [
+        (0, 'Lunes'),
+        (1, 'Martes'),
+        (2, 'Miércoles'),
+        (3, 'Jueves'),
+        (4, 'Viernes'),
+        (5, 'Sábado'),
+        (6, 'Domingo'),
+    ]
+    
+    descripcion = models.CharField(max_length=200, blank=True)
+    id_profesor = models.ForeignKey(CustomUser, on_delete=models.CASCADE, limit_choices_to={'rol': 'Profesor_Admin'})
+    id_club = models.ForeignKey(Club, on_delete=models.SET_NULL, null=True, blank=True)
+    entrenamiento = models.ForeignKey(Entrenamiento, on_delete=models.SET_NULL, null=True, blank=True)
+    dia_semana = models.PositiveSmallIntegerField(choices=DIA_SEMANA_CHOICES)
+    hora = models.TimeField()
+    valor_ar = models.DecimalField(max_digits=10, decimal_places=2)
+    fecha_inicio = models.DateField()
+    fecha_fin = models.DateField()
+    excluidas = models.JSONField(default=list, blank=True)  # fechas ISO sin clase (feriados, etc.)
+    activa = models.BooleanField(default=True)
+    generada_hasta = models.DateField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # generar_series: series activas con clases por materializar
+            models.Index(fields=['generada_hasta'], name='serie_activas_idx', condition=models.Q(activa=True)),
+        ]
+    
+    def __str__(self):
+        return f"Serie {self.get_dia_semana_display()} {self.hora} - {self.id_profesor}"
+
 # Class Model (MODIFICAR el existente - NO redefinir)
 class Clase(models.Model):
     descripcion = models.CharField(max_length=200, blank=True)
@@ -108,6 +173,27 @@ class Clase(models.Model):
     notificado = models.BooleanField(default=False)
     valor_ar = models.DecimalField(max_digits=10, decimal_places=2)
     entrenamiento = models.ForeignKey(Entrenamiento, on_delete=models.SET_NULL, null=True, blank=True)  # ← NUEVO CAMPO
+    id_club = models.ForeignKey(Club, on_delete=models.SET_NULL, null=True, blank=True)
+    # Marca de idempotencia del programador de recordatorios
+    recordatorio_enviado = models.DateTimeField(null=True, blank=True)
+    serie = models.ForeignKey(SerieClase, on_delete=models.SET_NULL, null=True, blank=True, related_name='clases')
+    cancelada_en = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            # Ocupación de canchas por club y día (canchas.IndiceOcupacion)
+            models.Index(fields=['id_club', 'fecha', 'hora'], name='clase_club_fecha_idx'),
+            # ListaClasesView ordena por -fecha, -hora
+            models.Index(fields=['fecha', 'hora'], name='clase_fecha_hora_idx'),
+            # HomeView: clases pendientes de confirmar
+            models.Index(fields=['fecha', 'hora'], name='clase_pendientes_idx',
+                         condition=models.Q(confirmado=False)),
+            # Edición y cancelación de las clases futuras de una serie
+            models.Index(fields=['serie', 'fecha'], name='clase_serie_fecha_idx'),
+            # enviar_recordatorios: confirmadas que todavía no tienen recordatorio
+            models.Index(fields=['fecha', 'hora'], name='clase_recordatorio_idx',
+                         condition=models.Q(confirmado=True, recordatorio_enviado__isnull=True)),
+        ]
     
     def __str__(self):
         entrenamiento_str = f" - {self.entrenamiento.nombre}" if self.entrenamiento else ""
@@ -132,6 +218,15 @@ class EnEspera(models.Model):
     id_clase = models.ForeignKey(Clase, on_delete=models.SET_NULL, null=True, blank=True)
     id_emparejamiento = models.ForeignKey(Emparejamiento, on_delete=models.SET_NULL, null=True, blank=True)
     
+    class Meta:
+        indexes = [
+            # GestionEsperaView y GestionarAlumnosClaseView filtran/ordenan por fecha y hora
+            models.Index(fields=['fecha', 'hora'], name='enespera_fecha_hora_idx'),
+            # EmparejamientoView: sólo las esperas sin clase ni emparejamiento
+            models.Index(fields=['fecha', 'hora', 'id_club'], name='enespera_sin_asignar_idx',
+                         condition=models.Q(id_clase__isnull=True, id_emparejamiento__isnull=True)),
+        ]
+    
     def __str__(self):
         return f"Espera: {self.id_usuario} - {self.fecha} {self.hora}"
 
@@ -149,6 +244,25 @@ class Notificacion(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_envio = models.DateTimeField(null=True, blank=True)
     enviada = models.BooleanField(default=False)
+    # Outbox: el despachador reclama la fila antes de enviarla
+    reclamada_en = models.DateTimeField(null=True, blank=True)
+    intentos = models.IntegerField(default=0)  # envíos fallidos; los cortes de conexión no cuentan
+    ultimo_error = models.TextField(blank=True)
+    proximo_intento = models.DateTimeField(null=True, blank=True)  # backoff después de una falla
+    
+    class Meta:
+        indexes = [
+            # Outbox: el despachador recorre las pendientes por antigüedad
+            models.Index(fields=['fecha_creacion', 'id'], name='notif_pendientes_idx',
+                         condition=models.Q(enviada=False)),
+            # eventos.VigiaEnvios: envíos recientes hechos por otros procesos
+            models.Index(fields=['fecha_envio'], name='notif_enviadas_idx', condition=models.Q(enviada=True)),
+        ]
+        constraints = [
+            # Un solo recordatorio por jugador y clase aunque el programador corra dos veces
+            models.UniqueConstraint(fields=['id_usuario', 'id_clase'], name='notif_recordatorio_unico',
+                                    condition=models.Q(tipo_evento='Recordatorio')),
+        ]
     
     def __str__(self):
         return f"Notificación {self.tipo_evento} - {self.id_usuario}"
@@ -157,4 +271,77 @@ class Notificacion(models.Model):
         """Marca la notificación como enviada con timestamp"""
         self.enviada = True
         self.fecha_envio = timezone.now()
-        self.save()
\ No newline at end of file
+        self.ultimo_error = ''
+        self.save(update_fields=['enviada', 'fecha_envio', 'ultimo_error'])
+
+# Analytics: tablas resumen que mantiene analitica.actualizar_resumenes()
+class ResumenSemanalClases(models.Model):
+    semana = models.DateField()  # lunes de la semana
+    id_club = models.ForeignKey(Club, on_delete=models.CASCADE, null=True, blank=True)
+    id_profesor = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    tipo_entreno = models.CharField(max_length=20, blank=True)
+    clases = models.IntegerField(default=0)
+    clases_confirmadas = models.IntegerField(default=0)
+    jugadores = models.IntegerField(default=0)
+    minutos_cancha = models.IntegerField(default=0)
+    ingresos_ar = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['semana'], name='resumen_clases_semana_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['semana', 'id_club', 'id_profesor', 'tipo_entreno'],
+                                    name='resumen_clases_unico'),
+        ]
+    
+    def __str__(self):
+        return f"Resumen {self.semana} - {self.id_club} - {self.id_profesor}"
+
+class ResumenSemanalEspera(models.Model):
+    semana = models.DateField()
+    id_club = models.ForeignKey(Club, on_delete=models.CASCADE)
+    solicitudes = models.IntegerField(default=0)
+    asignadas = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['semana', 'id_club'], name='resumen_espera_unico'),
+        ]
+    
+    def __str__(self):
+        return f"Espera {self.semana} - {self.id_club}"
+
+class SemanaPendienteAnalitica(models.Model):
+    """Semanas con cambios desde el último recálculo (las marca signals.py)"""
+    semana = models.DateField(unique=True)
+    
+    def __str__(self):
+        return f"Pendiente {self.semana}"
+
+# Demanda de la lista de espera: esperas sin asignar por turno y banda de nivel.
+# La mantiene demanda.py de forma incremental; recalcular_demanda la reconstruye.
+class DemandaTurno(models.Model):
+    BANDA_CHOICES = [
+        (1, 'Inicial (1-3)'),
+        (2, 'Intermedio (4-6)'),
+        (3, 'Avanzado (7-9)'),
+    ]
+    
+    id_club = models.ForeignKey(Club, on_delete=models.CASCADE)
+    fecha = models.DateField()
+    hora = models.TimeField()
+    banda = models.PositiveSmallIntegerField(choices=BANDA_CHOICES)
+    pendientes = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['id_club', 'fecha', 'hora', 'banda'], name='demanda_turno_unico'),
+        ]
+        indexes = [
+            # DemandaView: todos los clubes en un rango de fechas
+            models.Index(fields=['fecha', 'hora'], name='demanda_fecha_hora_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Demanda {self.id_club} {self.fecha} {self.hora} - {self.get_banda_display()}: {self.pendientes}"
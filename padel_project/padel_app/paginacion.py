@@ -0,0 +1,105 @@
+# paginacion.py - Paginación por cursor (keyset) para los listados grandes
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+def codificar_cursor(valores):
+    return urlsafe_base64_encode(json.dumps([force_str(v) for v in valores]).encode())
+
+def decodificar_cursor(cursor, modelo=None, orden=None):
+    """
+    Valores del cursor, o None si no se puede usar. Con modelo y orden
+    además exige un valor por campo del orden y convierte cada uno al tipo
+    del campo: un cursor adulterado no debe llegar a la consulta.
+    """
+    try:
+        valores = json.loads(urlsafe_base64_decode(cursor))
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(valores, list):
+        return None
+    if modelo is None:
+        return valores
+    if len(valores) != len(orden):
+        return None
+    try:
+        return [modelo._meta.get_field(campo.lstrip('-')).to_python(valor) for campo, valor in zip(orden, valores)]
+    except (ValidationError, ValueError, TypeError, FieldDoesNotExist):
+        return None
+
+def filtro_keyset(orden, valores, hacia_atras=False):
+    """
+    Arma el Q lexicográfico "después de `valores`" según el orden dado, por
+    ejemplo para ('-fecha', '-hora', '-id'):
+    fecha < f OR (fecha = f AND hora < h) OR (fecha = f AND hora = h AND id < i)
+    """
+    condicion = Q()
+    iguales = {}
+    for campo, valor in zip(orden, valores):
+        nombre = campo.lstrip('-')
+        descendente = campo.startswith('-')
+        # Avanzar en un orden descendente es buscar valores menores
+        lookup = 'lt' if descendente != hacia_atras else 'gt'
+        condicion |= Q(**iguales, **{f'{nombre}__{lookup}': valor})
+        iguales[nombre] = valor
+    return condicion
+
+def invertir_orden(orden):
+    return [campo[1:] if campo.startswith('-') else f'-{campo}' for campo in orden]
+
+class PaginacionKeysetMixin:
+    """
+    Reemplaza la paginación por OFFSET de ListView: cada página busca desde el
+    último registro mostrado usando el índice, así el costo no crece con el
+    historial. Parámetros GET: despues / antes (cursor) y tamano.
+    """
+    orden_keyset = ('-fecha', '-hora', '-id')
+    tamano_pagina = 50
+    tamano_pagina_maximo = 200
+
+    def get_tamano_pagina(self):
+        try:
+            tamano = int(self.request.GET.get('tamano', self.tamano_pagina))
+        except ValueError:
+            tamano = self.tamano_pagina
+        return max(1, min(tamano, self.tamano_pagina_maximo))
+
+    def valores_cursor(self, obj):
+        return [getattr(obj, campo.lstrip('-')) for campo in self.orden_keyset]
+
+    def paginar_keyset(self, queryset):
+        tamano = self.get_tamano_pagina()
+        # Un cursor inválido o adulterado muestra la primera página
+        modelo = queryset.model
+        despues = decodificar_cursor(self.request.GET.get('despues', ''), modelo, self.orden_keyset)
+        antes = decodificar_cursor(self.request.GET.get('antes', ''), modelo, self.orden_keyset) if not despues else None
+
+        if antes:
+            queryset = queryset.filter(filtro_keyset(self.orden_keyset, antes, hacia_atras=True))
+            filas = list(queryset.order_by(*invertir_orden(self.orden_keyset))[:tamano + 1])
+            hay_anterior = len(filas) > tamano
+            filas = filas[:tamano][::-1]
+            hay_siguiente = True
+        else:
+            if despues:
+                queryset = queryset.filter(filtro_keyset(self.orden_keyset, despues))
+            filas = list(queryset.order_by(*self.orden_keyset)[:tamano + 1])
+            hay_siguiente = len(filas) > tamano
+            filas = filas[:tamano]
+            hay_anterior = bool(despues)
+
+        return {
+            'filas': filas,
+            'tamano_pagina': tamano,
+            'cursor_anterior': codificar_cursor(self.valores_cursor(filas[0])) if filas and hay_anterior else None,
+            'cursor_siguiente': codificar_cursor(self.valores_cursor(filas[-1])) if filas and hay_siguiente else None,
+        }
+
+    def get_context_data(self, **kwargs):
+        pagina = self.paginar_keyset(kwargs.pop('object_list', self.object_list))
+        context = super().get_context_data(object_list=pagina.pop('filas'), **kwargs)
+        context.update(pagina)
+        return context
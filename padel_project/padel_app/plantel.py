@@ -0,0 +1,71 @@
+# plantel.py - Alta y baja masiva de alumnos en una clase
+from django.db import transaction
+
+from .demanda import actualizar_esperas
+from .models import Clase, CustomUser, Emparejamiento, EnEspera
+from .reservas import MAXIMO_JUGADORES, reclamar_esperas
+
+class CupoCompleto(Exception):
+    def __init__(self, clase, disponibles, pedidos):
+        self.clase = clase
+        self.disponibles = disponibles
+        self.pedidos = pedidos
+        super().__init__(f'La clase admite {disponibles} alumno(s) más y se pidieron {pedidos}')
+
+def _ids(valores):
+    return {int(v) for v in valores if str(v).isdigit()}
+
+def agregar_alumnos(clase_id, alumno_ids):
+    """
+    Agrega varios alumnos en una transacción. Devuelve (agregados,
+    ya_estaban, invalidos) como sets de ids; puede lanzar CupoCompleto o
+    reservas.EsperaYaAsignada. El SELECT ... FOR UPDATE sobre
+    la clase serializa a dos profesores editando el mismo plantel, así el
+    límite de MAXIMO_JUGADORES se respeta aunque los POST lleguen juntos.
+    """
+    pedidos = _ids(alumno_ids)
+    with transaction.atomic():
+        clase = Clase.objects.select_for_update().get(pk=clase_id)
+        validos = set(CustomUser.objects.filter(id__in=pedidos, rol='Alumno_Usuario').values_list('id', flat=True))
+        emparejamiento = Emparejamiento.objects.filter(id_clase=clase).order_by('id').first()
+        if emparejamiento is None:
+            emparejamiento = Emparejamiento.objects.create(
+                id_clase=clase, descripcion=f'Emparejamiento para clase del {clase.fecha}'
+            )
+        
+        # Plantel actual (a lo sumo MAXIMO_JUGADORES filas) en una sola consulta
+        actuales = set(Emparejamiento.jugadores.through.objects
+                       .filter(emparejamiento__id_clase=clase)
+                       .values_list('customuser_id', flat=True))
+        nuevos = validos - actuales
+        disponibles = MAXIMO_JUGADORES - len(actuales)
+        if len(nuevos) > disponibles:
+            raise CupoCompleto(clase, max(0, disponibles), len(nuevos))
+        
+        if nuevos:
+            emparejamiento.jugadores.add(*nuevos)
+            # Un alumno sin espera puede sumarse, pero no uno cuya espera ya tomó otra clase
+            reclamar_esperas(nuevos, clase, emparejamiento, exigir_espera=False)
+    return nuevos, validos & actuales, pedidos - validos
+
+def quitar_alumnos(clase_id, alumno_ids):
+    """Quita varios alumnos y libera sus esperas. Devuelve (quitados, no_estaban)."""
+    pedidos = _ids(alumno_ids)
+    with transaction.atomic():
+        clase = Clase.objects.select_for_update().get(pk=clase_id)
+        presentes = list(Emparejamiento.jugadores.through.objects
+                         .filter(emparejamiento__id_clase=clase, customuser_id__in=pedidos)
+                         .values_list('emparejamiento_id', 'customuser_id'))
+        por_emparejamiento = {}
+        for emparejamiento_id, alumno_id in presentes:
+            por_emparejamiento.setdefault(emparejamiento_id, []).append(alumno_id)
+        for emparejamiento in Emparejamiento.objects.filter(id__in=por_emparejamiento):
+            emparejamiento.jugadores.remove(*por_emparejamiento[emparejamiento.id])
+        
+        quitados = {alumno_id for _, alumno_id in presentes}
+        if quitados:
+            actualizar_esperas(
+                EnEspera.objects.filter(id_usuario__in=quitados, id_clase=clase),
+                id_clase=None, id_emparejamiento=None
+            )
+    return quitados, pedidos - quitados
@@ -0,0 +1,62 @@
+# recordatorios.py - Programación de notificaciones 'Recordatorio'
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Clase, Emparejamiento, Notificacion
+
+RECORDATORIO_HORAS_ANTES = getattr(settings, 'RECORDATORIO_HORAS_ANTES', 24)
+
+def filtro_rango(desde, hasta):
+    """
+    Q para las clases cuya fecha+hora cae en [desde, hasta]. Fecha y hora
+    son columnas separadas, así que se expresa como rango lexicográfico
+    sobre (fecha, hora) para que use el índice.
+    """
+    if desde.date() == hasta.date():
+        return Q(fecha=desde.date(), hora__gte=desde.time(), hora__lte=hasta.time())
+    return (Q(fecha=desde.date(), hora__gte=desde.time())
+            | Q(fecha__gt=desde.date(), fecha__lt=hasta.date())
+            | Q(fecha=hasta.date(), hora__lte=hasta.time()))
+
+def clases_a_recordar(horas_antes=RECORDATORIO_HORAS_ANTES, ahora=None):
+    ahora = timezone.localtime(ahora).replace(tzinfo=None)
+    return (Clase.objects
+            .filter(confirmado=True, recordatorio_enviado__isnull=True)
+            .filter(filtro_rango(ahora, ahora + timedelta(hours=horas_antes))))
+
+def programar_recordatorios(horas_antes=RECORDATORIO_HORAS_ANTES, limite=500, ahora=None):
+    """
+    Crea los Recordatorio de un lote de clases próximas y las marca como
+    recordadas. Devuelve (clases, notificaciones creadas).
+
+    La marca en Clase hace que cada corrida sólo vea clases nuevas; la
+    restricción notif_recordatorio_unico cubre el caso de dos programadores
+    simultáneos o una corrida que murió entre el INSERT y el UPDATE.
+    """
+    marca = timezone.now()
+    with transaction.atomic():
+        ids = list(clases_a_recordar(horas_antes, ahora)
+                   .order_by('fecha', 'hora')
+                   .select_for_update(skip_locked=True)
+                   .values_list('id', flat=True)[:limite])
+        if not ids:
+            return 0, 0
+
+        jugadores = (Emparejamiento.jugadores.through.objects
+                     .filter(emparejamiento__id_clase__in=ids)
+                     .values_list('emparejamiento__id_clase', 'customuser_id')
+                     .distinct())
+        existentes = set(Notificacion.objects
+                         .filter(tipo_evento='Recordatorio', id_clase__in=ids)
+                         .values_list('id_clase', 'id_usuario'))
+        creadas = Notificacion.objects.bulk_create(
+            [Notificacion(id_usuario_id=usuario_id, tipo_evento='Recordatorio', id_clase_id=clase_id)
+             for clase_id, usuario_id in jugadores if (clase_id, usuario_id) not in existentes],
+            ignore_conflicts=True
+        )
+        Clase.objects.filter(id__in=ids, recordatorio_enviado__isnull=True).update(recordatorio_enviado=marca)
+    return len(ids), len(creadas)
@@ -0,0 +1,150 @@
+# reservas.py - Asignación de esperas a clases sin dobles reservas
+#
+# Cada EnEspera se reclama con un UPDATE condicional (WHERE id_clase IS NULL
+# AND id_emparejamiento IS NULL) dentro de la transacción de la reserva: si
+# dos profesores emparejan al mismo alumno a la vez, sólo uno lo consigue y
+# el otro recibe EsperaYaAsignada y su transacción se revierte completa.
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import analitica, calendario, dashboard
+from .canchas import verificar_capacidad
+from .demanda import actualizar_esperas
+from .models import Clase, Club, CustomUser, Emparejamiento, EnEspera
+from .utils import encolar_notificaciones, encolar_notificaciones_por_clase
+
+MINIMO_JUGADORES = 2
+MAXIMO_JUGADORES = 4
+
+class EsperaYaAsignada(Exception):
+    def __init__(self, alumnos):
+        self.alumnos = list(alumnos)
+        nombres = ', '.join(f'{a.nombre} {a.apellido}'.strip() or a.username for a in self.alumnos)
+        super().__init__(f'Ya no están disponibles en ese turno: {nombres}')
+
+def reclamar_esperas(alumno_ids, clase, emparejamiento, club_id=None, exigir_espera=True):
+    """
+    Asigna a la clase las esperas libres de los alumnos en el turno de la
+    clase. Devuelve los ids reclamados. Lanza EsperaYaAsignada si algún
+    alumno tiene su espera tomada por otra clase o, con exigir_espera, si no
+    tiene ninguna espera libre. Llamar dentro de transaction.atomic().
+    """
+    alumno_ids = set(alumno_ids)
+    esperas = EnEspera.objects.filter(id_usuario__in=alumno_ids, fecha=clase.fecha, hora=clase.hora)
+    if club_id is not None:
+        esperas = esperas.filter(id_club_id=club_id)
+    actualizar_esperas(
+        esperas.filter(id_clase__isnull=True, id_emparejamiento__isnull=True),
+        id_clase=clase, id_emparejamiento=emparejamiento
+    )
+    
+    reclamados = set(esperas.filter(id_clase=clase).values_list('id_usuario', flat=True))
+    if exigir_espera:
+        faltan = alumno_ids - reclamados
+    else:
+        faltan = set(esperas.exclude(id_clase=clase).values_list('id_usuario', flat=True)) - reclamados
+    if faltan:
+        raise EsperaYaAsignada(CustomUser.objects.filter(id__in=faltan).order_by('nombre'))
+    return reclamados
+
+def reservar_turno(profesor, club_id, fecha, hora, jugadores, valor_ar, descripcion=''):
+    """
+    Crea clase confirmada + emparejamiento para los jugadores y reclama sus
+    esperas, todo o nada. Puede lanzar SinCanchasLibres o EsperaYaAsignada.
+    """
+    if not MINIMO_JUGADORES <= len(jugadores) <= MAXIMO_JUGADORES:
+        raise ValueError(f'Debes seleccionar entre {MINIMO_JUGADORES} y {MAXIMO_JUGADORES} jugadores.')
+    
+    with transaction.atomic():
+        # Bloquear el club serializa las reservas concurrentes del mismo club
+        club = Club.objects.select_for_update().get(id=club_id)
+        verificar_capacidad(club, fecha, hora)
+        
+        clase = Clase.objects.create(
+            descripcion=descripcion,
+            id_profesor=profesor,
+            id_club=club,
+            fecha=fecha,
+            hora=hora,
+            valor_ar=valor_ar,
+            confirmado=True
+        )
+        emparejamiento = Emparejamiento.objects.create(descripcion=descripcion, id_clase=clase)
+        emparejamiento.jugadores.add(*jugadores)
+        reclamar_esperas([j.id for j in jugadores], clase, emparejamiento, club_id=club.id)
+        
+        # El envío lo hace despachar_notificaciones
+        encolar_notificaciones(jugadores, 'Confirmacion', clase)
+    return clase, emparejamiento
+
+def cancelar_clases(clases, liberar_esperas=False):
+    """
+    Cancela todas las clases del queryset con un solo UPDATE y encola un
+    Cancelacion por jugador. Devuelve (clases canceladas, notificaciones).
+
+    Las filas se marcan con el mismo cancelada_en, que después sirve de
+    filtro para el fan-out sin pasar listas de ids por la consulta. Las
+    esperas quedan apuntando a la clase cancelada como historial, salvo con
+    liberar_esperas: entonces vuelven a la lista de espera (y a la demanda)
+    para poder emparejarlas en otro turno.
+    """
+    marca = timezone.now()
+    with transaction.atomic():
+        canceladas = clases.filter(cancelada_en__isnull=True).update(cancelada_en=marca, confirmado=False)
+        if not canceladas:
+            return 0, 0
+        afectadas = Clase.objects.filter(cancelada_en=marca)
+        jugadores = (Emparejamiento.jugadores.through.objects
+                     .filter(emparejamiento__id_clase__in=afectadas)
+                     .values_list('customuser_id', 'emparejamiento__id_clase')
+                     .distinct())
+        notificaciones = encolar_notificaciones_por_clase(jugadores.iterator(), 'Cancelacion')
+        calendario.invalidar_clases(afectadas)
+        fechas = list(afectadas.values_list('fecha', flat=True).distinct())
+        alumnos = list(EnEspera.objects.filter(id_clase__in=afectadas).values_list('id_usuario', flat=True).distinct())
+        if liberar_esperas:
+            actualizar_esperas(EnEspera.objects.filter(id_clase__in=afectadas), id_clase=None, id_emparejamiento=None)
+
+    # UPDATE masivo: las señales no corren, se invalida a mano
+    analitica.marcar_semanas(fechas)
+    dashboard.invalidar_profesores()
+    dashboard.invalidar_alumnos(alumnos)
+    return canceladas, notificaciones
+
+def clases_en_rango(club, desde, hasta, solo_sin_techo=False):
+    """
+    Clases activas del club que empiezan en [desde, hasta).
+
+    Clase no guarda en qué cancha se juega: con solo_sin_techo se supone que
+    en cada turno las primeras canchas_techo clases (por orden de reserva)
+    pasan a las canchas techadas y el resto queda a la intemperie.
+    """
+    desde, hasta = timezone.localtime(desde), timezone.localtime(hasta)
+    clases = Clase.objects.filter(
+        Q(fecha__gt=desde.date()) | Q(fecha=desde.date(), hora__gte=desde.time()),
+        Q(fecha__lt=hasta.date()) | Q(fecha=hasta.date(), hora__lt=hasta.time()),
+        id_club=club, cancelada_en__isnull=True,
+    )
+    if not solo_sin_techo:
+        return clases
+    if not club.canchas_sin_techo:
+        return clases.none()
+    orden = Window(RowNumber(), partition_by=[F('fecha'), F('hora')], order_by=F('id').asc())
+    # El filtro sobre la ventana no admite UPDATE: se pasa como subconsulta de ids
+    return Clase.objects.filter(id__in=clases.annotate(orden=orden).filter(orden__gt=club.canchas_techo)
+                                .values('id'))
+
+def cancelar_por_cierre(club, desde, hasta, solo_sin_techo=False):
+    """
+    Cierre del club (lluvia, corte de luz, mantenimiento): cancela las
+    clases del rango, libera sus esperas y encola las notificaciones.
+    La cantidad de consultas no depende de cuántas clases se cancelen.
+    Devuelve (clases canceladas, notificaciones).
+    """
+    # Las clases que ya empezaron no se cancelan
+    desde = max(desde, timezone.now())
+    if hasta <= desde:
+        return 0, 0
+    return cancelar_clases(clases_en_rango(club, desde, hasta, solo_sin_techo), liberar_esperas=True)
@@ -0,0 +1,137 @@
+# series.py - Clases recurrentes (SerieClase)
+#
+# Las clases de una serie no se crean todas de una vez: generar_series (o el
+# alta de la serie) materializa sólo la ventana de las próximas semanas con
+# bulk_create y avanza generada_hasta. Las ediciones se guardan clase por
+# clase (señales de calendario, dashboard y analítica); las cancelaciones,
+# con un solo UPDATE.
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import analitica, calendario, dashboard
+from .canchas import IndiceOcupacion, SinCanchasLibres, alternativas_cercanas, canchas_libres, duracion_de
+from .models import Clase, Club, SerieClase
+from .reservas import cancelar_clases
+
+SERIES_VENTANA_DIAS = getattr(settings, 'SERIES_VENTANA_DIAS', 56)
+
+def fechas_de(serie, desde, hasta):
+    desde = max(desde, serie.fecha_inicio)
+    hasta = min(hasta, serie.fecha_fin)
+    excluidas = set(serie.excluidas)
+    fecha = desde + timedelta(days=(serie.dia_semana - desde.weekday()) % 7)
+    while fecha <= hasta:
+        if fecha.isoformat() not in excluidas:
+            yield fecha
+        fecha += timedelta(weeks=1)
+
+def materializar(serie, hasta=None):
+    """
+    Crea las clases que faltan hasta `hasta` (por defecto hoy + la ventana).
+    Devuelve (clases creadas, fechas salteadas por falta de cancha).
+    """
+    hoy = timezone.localdate()
+    with transaction.atomic():
+        # El lock evita que dos generadores creen la misma semana dos veces
+        serie = SerieClase.objects.select_for_update().select_related('entrenamiento').get(pk=serie.pk)
+        if not serie.activa:
+            return [], []
+        desde = max(serie.fecha_inicio, hoy)
+        if serie.generada_hasta:
+            desde = max(desde, serie.generada_hasta + timedelta(days=1))
+        hasta = min(hasta or hoy + timedelta(days=SERIES_VENTANA_DIAS), serie.fecha_fin)
+        if desde > hasta:
+            return [], []
+        
+        fechas = list(fechas_de(serie, desde, hasta))
+        sin_cancha = []
+        if serie.id_club_id and fechas:
+            club = Club.objects.select_for_update().get(pk=serie.id_club_id)
+            indice = IndiceOcupacion.para_club(club, desde, hasta)
+            duracion = duracion_de(serie.entrenamiento)
+            sin_cancha = [f for f in fechas if canchas_libres(club, f, serie.hora, duracion, indice) <= 0]
+            fechas = [f for f in fechas if f not in sin_cancha]
+        
+        clases = Clase.objects.bulk_create([
+            Clase(serie=serie, id_profesor_id=serie.id_profesor_id, id_club_id=serie.id_club_id,
+                  entrenamiento_id=serie.entrenamiento_id, descripcion=serie.descripcion, fecha=fecha,
+                  hora=serie.hora, valor_ar=serie.valor_ar, confirmado=False)
+            for fecha in fechas
+        ])
+        serie.generada_hasta = hasta
+        serie.save(update_fields=['generada_hasta'])
+    
+    # bulk_create no dispara señales
+    if clases:
+        analitica.marcar_semanas(fechas)
+        dashboard.invalidar_profesores()
+        calendario.invalidar([serie.id_profesor_id])
+    return clases, sin_cancha
+
+def materializar_pendientes(hasta=None):
+    """Todas las series activas cuya ventana quedó corta. Devuelve (series, clases)."""
+    hasta = hasta or timezone.localdate() + timedelta(days=SERIES_VENTANA_DIAS)
+    series = list(SerieClase.objects.filter(activa=True).filter(
+        Q(generada_hasta__isnull=True) | (Q(generada_hasta__lt=hasta) & Q(generada_hasta__lt=F('fecha_fin')))
+    ))
+    total = 0
+    for serie in series:
+        clases, _ = materializar(serie, hasta)
+        total += len(clases)
+    return len(series), total
+
+def clases_futuras(serie):
+    return serie.clases.filter(fecha__gte=timezone.localdate(), cancelada_en__isnull=True)
+
+def aplicar_cambios(serie):
+    """
+    Después de editar la serie: cancela las clases futuras que quedaron fuera
+    del rango o excluidas y copia los campos de la serie a las demás. Las que
+    cambian de club, hora o entrenamiento tienen que entrar en las canchas
+    del club; si alguna no entra lanza SinCanchasLibres y no se aplica nada.
+    Devuelve (actualizadas, canceladas).
+    """
+    campos = {
+        'descripcion': serie.descripcion,
+        'id_club_id': serie.id_club_id,
+        'entrenamiento_id': serie.entrenamiento_id,
+        'hora': serie.hora,
+        'valor_ar': serie.valor_ar,
+    }
+    with transaction.atomic():
+        canceladas, _ = cancelar_clases(clases_futuras(serie).filter(
+            Q(fecha__lt=serie.fecha_inicio) | Q(fecha__gt=serie.fecha_fin) | Q(fecha__in=serie.excluidas)
+        ))
+        if serie.generada_hasta and serie.generada_hasta > serie.fecha_fin:
+            SerieClase.objects.filter(pk=serie.pk).update(generada_hasta=serie.fecha_fin)
+        
+        cambiadas = [c for c in clases_futuras(serie).order_by('fecha')
+                     if any(getattr(c, campo) != valor for campo, valor in campos.items())]
+        movidas = [c for c in cambiadas if (c.id_club_id, c.hora, c.entrenamiento_id)
+                   != (serie.id_club_id, serie.hora, serie.entrenamiento_id)]
+        if serie.id_club_id and movidas:
+            club = Club.objects.select_for_update().get(pk=serie.id_club_id)
+            duracion = duracion_de(serie.entrenamiento)
+            # Sin las clases de la serie: cada una deja libre su turno anterior
+            indice = IndiceOcupacion.para_club(club, movidas[0].fecha, movidas[-1].fecha, excluir_serie=serie)
+            for clase in movidas:
+                if canchas_libres(club, clase.fecha, serie.hora, duracion, indice) <= 0:
+                    raise SinCanchasLibres(club, clase.fecha, serie.hora,
+                                           alternativas_cercanas(club, clase.fecha, serie.hora, duracion))
+        
+        # De a una con save(): las señales invalidan calendario, dashboard y analítica
+        for clase in cambiadas:
+            for campo, valor in campos.items():
+                setattr(clase, campo, valor)
+            clase.save(update_fields=list(campos))
+    return len(cambiadas), canceladas
+
+def cancelar_serie(serie):
+    """Desactiva la serie y cancela sus clases futuras. Devuelve (clases, notificaciones)."""
+    with transaction.atomic():
+        SerieClase.objects.filter(pk=serie.pk).update(activa=False)
+        return cancelar_clases(clases_futuras(serie))
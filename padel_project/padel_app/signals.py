@@ -0,0 +1,148 @@
+# signals.py - Handlers registrados en PadelAppConfig.ready()
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import analitica, calendario, dashboard, demanda, eventos
+from .models import Clase, CustomUser, Emparejamiento, EnEspera, Notificacion
+
+@receiver([post_save, post_delete], sender=EnEspera)
+def espera_modificada(sender, instance, **kwargs):
+    dashboard.invalidar_alumnos([instance.id_usuario_id])
+
+@receiver([post_save, post_delete], sender=Clase)
+def clase_modificada(sender, instance, created=False, **kwargs):
+    dashboard.invalidar_profesores()
+    # Una clase recién creada todavía no tiene esperas asignadas
+    if not created:
+        dashboard.invalidar_alumnos(
+            EnEspera.objects.filter(id_clase=instance.pk).values_list('id_usuario', flat=True)
+        )
+
+@receiver([post_save, post_delete], sender=Emparejamiento)
+def emparejamiento_modificado(sender, instance, created=False, **kwargs):
+    # Al crearlo no cambia nada de lo que ven los alumnos: los jugadores que
+    # se agregan después se invalidan en jugadores_modificados
+    if not created:
+        dashboard.invalidar_alumnos(
+            EnEspera.objects.filter(id_clase=instance.id_clase_id).values_list('id_usuario', flat=True)
+        )
+
+@receiver(m2m_changed, sender=Emparejamiento.jugadores.through)
+def jugadores_modificados(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove') and isinstance(instance, Emparejamiento):
+        dashboard.invalidar_alumnos(pk_set or ())
+
+# Analytics: marcar las semanas a recalcular
+@receiver(pre_save, sender=Clase)
+def clase_por_guardar(sender, instance, **kwargs):
+    # Si la clase cambia de semana también hay que recalcular la anterior
+    if instance.pk:
+        anterior = Clase.objects.filter(pk=instance.pk).values_list('fecha', flat=True).first()
+        analitica.marcar_semanas([anterior])
+
+@receiver([post_save, post_delete], sender=Clase)
+def clase_para_analitica(sender, instance, **kwargs):
+    analitica.marcar_semanas([instance.fecha])
+
+@receiver([post_save, post_delete], sender=EnEspera)
+def espera_para_analitica(sender, instance, **kwargs):
+    analitica.marcar_semanas([instance.fecha])
+
+@receiver(m2m_changed, sender=Emparejamiento.jugadores.through)
+def jugadores_para_analitica(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Emparejamiento):
+        # id_clase suele venir en cache desde Emparejamiento.objects.create(id_clase=clase)
+        analitica.marcar_semanas([instance.id_clase.fecha] if instance.id_clase_id else [])
+    else:
+        analitica.marcar_semanas(Clase.objects.filter(emparejamiento__in=pk_set or ()).values_list('fecha', flat=True))
+
+@receiver(post_delete, sender=Emparejamiento)
+def emparejamiento_para_analitica(sender, instance, **kwargs):
+    analitica.marcar_semanas(Clase.objects.filter(pk=instance.id_clase_id).values_list('fecha', flat=True))
+
+# Demanda por turno: se guarda el estado previo para aplicar sólo la diferencia
+@receiver(pre_save, sender=EnEspera)
+def espera_por_guardar(sender, instance, **kwargs):
+    instance._demanda_anterior = demanda.estado(instance.pk) if instance.pk else None
+
+@receiver(post_save, sender=EnEspera)
+def espera_guardada(sender, instance, **kwargs):
+    demanda.registrar_cambio(getattr(instance, '_demanda_anterior', None), demanda.estado(instance.pk))
+
+@receiver(pre_delete, sender=EnEspera)
+def espera_por_borrar(sender, instance, **kwargs):
+    demanda.registrar_cambio(demanda.estado(instance.pk), None)
+
+@receiver(pre_save, sender=CustomUser)
+def usuario_por_guardar(sender, instance, update_fields=None, **kwargs):
+    # El login guarda sólo last_login: no hace falta leer el nivel anterior
+    instance._nivel_anterior = None
+    if instance.pk and (update_fields is None or 'nivel_categoria' in update_fields):
+        instance._nivel_anterior = (CustomUser.objects.filter(pk=instance.pk)
+                                    .values_list('nivel_categoria', flat=True).first())
+
+@receiver(post_save, sender=CustomUser)
+def usuario_guardado(sender, instance, **kwargs):
+    # La banda de las esperas abiertas depende del nivel del usuario
+    anterior = getattr(instance, '_nivel_anterior', None)
+    if anterior is not None and anterior != instance.nivel_categoria:
+        demanda.cambiar_banda(instance.pk, anterior, instance.nivel_categoria)
+
+@receiver(pre_delete, sender=Clase)
+def clase_por_borrar(sender, instance, **kwargs):
+    demanda.liberar_esperas_de_clase(instance)
+
+# Feed en vivo (SSE): deltas publicados después del commit
+@receiver(post_save, sender=EnEspera)
+def espera_para_eventos(sender, instance, created, **kwargs):
+    eventos.publicar_al_confirmar(
+        'espera', lambda: eventos.datos_espera(instance.pk, 'nueva' if created else 'modificada')
+    )
+
+@receiver(post_delete, sender=EnEspera)
+def espera_borrada_para_eventos(sender, instance, **kwargs):
+    eventos.publicar_al_confirmar('espera', {'accion': 'eliminada', 'ids': [instance.pk]})
+
+@receiver(post_save, sender=Emparejamiento)
+def emparejamiento_para_eventos(sender, instance, created, **kwargs):
+    # Los jugadores se agregan después del create: se leen recién al confirmar
+    if created:
+        eventos.publicar_al_confirmar('emparejamiento', lambda: eventos.datos_emparejamiento(instance.pk))
+
+@receiver(post_save, sender=Notificacion)
+def notificacion_para_eventos(sender, instance, **kwargs):
+    eventos.publicar_al_confirmar('notificacion', eventos.datos_notificacion(instance))
+
+# Feeds .ics: cada cambio invalida a profesor y jugadores de la clase
+@receiver([pre_save, post_save, pre_delete], sender=Clase)
+def clase_para_calendario(sender, instance, signal, **kwargs):
+    # pre_save cubre al profesor anterior y a los jugadores; pre_delete, a los
+    # jugadores antes del cascade. Después de guardar sólo falta el profesor
+    # actual, que ya está en la instancia.
+    if signal is post_save:
+        calendario.invalidar([instance.id_profesor_id])
+    elif instance.pk:
+        calendario.invalidar_clases(Clase.objects.filter(pk=instance.pk))
+
+@receiver(pre_delete, sender=Emparejamiento)
+def emparejamiento_para_calendario(sender, instance, **kwargs):
+    calendario.invalidar(instance.jugadores.values_list('id', flat=True))
+
+@receiver(m2m_changed, sender=Emparejamiento.jugadores.through)
+def jugadores_para_calendario(sender, instance, action, pk_set, **kwargs):
+    # El feed del profesor lista a los jugadores: también cambia
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Emparejamiento) and action == 'pre_clear':
+        calendario.invalidar_clases(Clase.objects.filter(pk=instance.id_clase_id))
+    elif isinstance(instance, Emparejamiento):
+        # El feed del alumno no lista a los demás jugadores: alcanza con el
+        # profesor y los jugadores que entran o salen
+        profesor = instance.id_clase.id_profesor_id if instance.id_clase_id else None
+        calendario.invalidar([profesor, *pk_set])
+    else:
+        emparejamientos = pk_set if pk_set is not None else instance.emparejamiento_set.all()
+        calendario.invalidar_clases(Clase.objects.filter(emparejamiento__in=emparejamientos))
+        calendario.invalidar([instance.pk])
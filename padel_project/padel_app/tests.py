@@ -0,0 +1,427 @@
+import random
+import socket
+import socketserver
+import threading
+from collections import Counter
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Count, F
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from padel_app import dashboard
+from padel_app.canchas import SinCanchasLibres
+from padel_app.envio_async import ENVIADA, FALLIDA, REINTENTAR, despachar_async
+from padel_app.exportacion import archivo_xlsx, filas_csv
+from padel_app.models import Clase, Club, CustomUser, Emparejamiento, EnEspera, Notificacion, SerieClase
+from padel_app.reservas import EsperaYaAsignada, reservar_turno
+from padel_app.series import aplicar_cambios, materializar
+from padel_app.utils import NOTIFICACION_MAX_INTENTOS, reclamar_notificaciones_pendientes
+from padel_app.views import CrearEmparejamientoView
+
+class ConsultasPorVistaTests(TestCase):
+    """
+    Cantidad de consultas SQL de cada listado sobre un dataset grande: tiene
+    que ser fija, sin importar cuántas filas se muestren (sin N+1). Las dos
+    primeras de cada request son la sesión y el usuario logueado.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generar_datos_masivos', alumnos=400, clubes=2, profesores=4, meses=2, dias_futuros=14,
+                     clases_por_dia=6, espera_por_dia=15, verbosity=0, stdout=StringIO())
+        cls.profesor = CustomUser.objects.filter(rol='Profesor_Admin').order_by('id').first()
+        cls.alumno = CustomUser.objects.get(
+            id=EnEspera.objects.values_list('id_usuario', flat=True).order_by('-fecha').first()
+        )
+        cls.clase = Clase.objects.filter(emparejamiento__isnull=False).order_by('-fecha', '-hora').first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.profesor)
+
+    def assertConsultas(self, cantidad, url, **params):
+        with self.assertNumQueries(cantidad):
+            respuesta = self.client.get(url, params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta
+
+    def test_dataset_grande(self):
+        self.assertGreater(Clase.objects.count(), 500)
+        self.assertGreater(EnEspera.objects.filter(id_clase__isnull=True).count(), 200)
+
+    def test_lista_clases(self):
+        respuesta = self.assertConsultas(3, reverse('lista_clases'), tamano=200)
+        self.assertEqual(len(respuesta.context['clases']), 200)
+        self.assertConsultas(3, reverse('lista_clases'), tamano=10)
+
+    def test_gestion_espera(self):
+        respuesta = self.assertConsultas(3, reverse('gestion_espera'), tamano=200)
+        self.assertEqual(len(respuesta.context['lista_espera']), 200)
+        self.assertConsultas(3, reverse('gestion_espera'), tamano=10)
+
+    def test_gestion_alumnos(self):
+        self.assertConsultas(3, reverse('gestion_alumnos'), tamano=200)
+
+    def test_emparejamiento(self):
+        # Sesión, usuario, turnos de la página y sus esperas
+        respuesta = self.assertConsultas(4, reverse('emparejamiento'), tamano=100)
+        self.assertEqual(len(respuesta.context['espera_agrupada']), 100)
+        self.assertConsultas(4, reverse('emparejamiento'), tamano=5)
+
+    def test_emparejamiento_pagina_por_turno(self):
+        vistos = {}
+        params = {'tamano': 7}
+        while True:
+            respuesta = self.client.get(reverse('emparejamiento'), params)
+            turnos = respuesta.context['turnos']
+            grupos = respuesta.context['espera_agrupada']
+            self.assertEqual(len(grupos), len(turnos))
+            for turno, grupo in zip(turnos, grupos.values()):
+                # Cada turno entero en una sola página
+                self.assertEqual(len(grupo), turno['cantidad'])
+            self.assertFalse(vistos.keys() & grupos.keys())
+            vistos.update(grupos)
+            if not respuesta.context['cursor_siguiente']:
+                break
+            params['despues'] = respuesta.context['cursor_siguiente']
+        pendientes = EnEspera.objects.filter(id_clase__isnull=True, id_emparejamiento__isnull=True,
+                                             fecha__gte=timezone.localdate())
+        self.assertEqual(sum(len(grupo) for grupo in vistos.values()), pendientes.count())
+
+    def test_gestionar_alumnos_clase(self):
+        self.assertConsultas(6, reverse('gestionar_alumnos_clase', args=[self.clase.id]))
+
+    def test_home_profesor(self):
+        self.assertConsultas(3, reverse('home'))
+
+    def test_crear_emparejamiento(self):
+        # Turno libre fuera del rango generado: la cantidad no depende de los datos previos
+        club = Club.objects.order_by('id').first()
+        fecha = timezone.localdate() + timedelta(days=60)
+        alumnos = list(CustomUser.objects.filter(rol='Alumno_Usuario').order_by('id')[:4])
+        for alumno in alumnos:
+            EnEspera.objects.create(id_usuario=alumno, id_club=club, fecha=fecha, hora=time(10))
+        datos = {'jugadores': [a.id for a in alumnos], 'fecha': fecha.isoformat(), 'hora': '10:00',
+                 'club_id': club.id, 'valor_ar': '15000'}
+
+        # Con las publicaciones al feed en vivo, que corren después del commit
+        with self.assertNumQueries(CrearEmparejamientoView.presupuesto_consultas):
+            with self.captureOnCommitCallbacks(execute=True):
+                respuesta = self.client.post(reverse('crear_emparejamiento'), datos)
+        self.assertEqual(respuesta.status_code, 302)
+        clase = Clase.objects.get(id_club=club, fecha=fecha, hora=time(10))
+        self.assertEqual(clase.emparejamiento_set.get().jugadores.count(), 4)
+
+    def test_lista_espera_alumno(self):
+        self.client.force_login(self.alumno)
+        self.assertConsultas(3, reverse('lista_espera'))
+
+class ExportacionTests(TestCase):
+    """Texto cargado por usuarios que Excel interpretaría como fórmula"""
+    def test_formulas_quedan_como_texto(self):
+        alumno = CustomUser.objects.create_user(username='=HYPERLINK("http://x","y")', password='x',
+                                                mail='a@x.com', nombre='-2+3', apellido='Pérez')
+        club = Club.objects.create(nombre_club='@club', canchas_techo=1, canchas_sin_techo=0, cant_profesores=1,
+                                   celular='1', mail='c@x.com', valor_hora_ar=1000)
+        EnEspera.objects.create(id_usuario=alumno, id_club=club, fecha=date(2026, 11, 2), hora=time(9))
+        desde, hasta = date(2026, 1, 1), date(2026, 12, 31)
+
+        csv = ''.join(filas_csv('espera', desde, hasta))
+        self.assertIn('"\'=HYPERLINK(""http://x"",""y"")"', csv)
+        self.assertIn(",'@club,", csv)
+        self.assertIn(",'-2+3,Pérez,", csv)
+
+        hoja = load_workbook(archivo_xlsx('espera', desde, hasta)).active
+        fila = [celda.value for celda in hoja[2]]
+        self.assertEqual(fila[3:7], ["'@club", '\'=HYPERLINK("http://x","y")', "'-2+3", 'Pérez'])
+        self.assertEqual(hoja['E2'].data_type, 's')
+
+class DashboardCacheTests(TestCase):
+    def test_version_perdida_no_vuelve_a_una_clave_vieja(self):
+        cache.clear()
+        vistas = {dashboard.clave_profesor(1)}
+        for _ in range(3):
+            dashboard.invalidar_profesores()
+            vistas.add(dashboard.clave_profesor(1))
+        # Expulsada del cache: la versión recreada no puede repetir ninguna anterior
+        cache.delete(dashboard.CLAVE_VERSION_PROFESORES)
+        dashboard.invalidar_profesores()
+        self.assertNotIn(dashboard.clave_profesor(1), vistas)
+        cache.delete(dashboard.CLAVE_VERSION_PROFESORES)
+        self.assertNotIn(dashboard.clave_profesor(1), vistas)
+        self.assertEqual(len(vistas), 4)
+
+class SeriesTests(TestCase):
+    def setUp(self):
+        self.profesor = CustomUser.objects.create_user(username='profe', password='x', mail='p@x.com',
+                                                       rol='Profesor_Admin')
+        self.club = Club.objects.create(nombre_club='Una cancha', canchas_techo=0, canchas_sin_techo=1,
+                                        cant_profesores=1, celular='1', mail='c@x.com', valor_hora_ar=1000)
+        inicio = timezone.localdate() + timedelta(days=1)
+        self.serie = SerieClase.objects.create(id_profesor=self.profesor, id_club=self.club,
+                                               dia_semana=inicio.weekday(), hora=time(10), valor_ar=1000,
+                                               fecha_inicio=inicio, fecha_fin=inicio + timedelta(weeks=2))
+        materializar(self.serie)
+        # Otra clase ocupa la única cancha a las 18 en la segunda fecha de la serie
+        Clase.objects.create(id_profesor=self.profesor, id_club=self.club, fecha=inicio + timedelta(weeks=1),
+                             hora=time(18), valor_ar=1000)
+
+    def test_mover_a_un_turno_lleno_no_cambia_nada(self):
+        self.serie.hora = time(18)
+        with self.assertRaises(SinCanchasLibres):
+            aplicar_cambios(self.serie)
+        self.assertEqual(set(self.serie.clases.values_list('hora', flat=True)), {time(10)})
+
+    def test_mover_guarda_cada_clase_con_sus_senales(self):
+        self.serie.hora = time(12)
+        with mock.patch('padel_app.signals.calendario.invalidar') as invalidar:
+            self.assertEqual(aplicar_cambios(self.serie), (3, 0))
+        self.assertEqual(set(self.serie.clases.values_list('hora', flat=True)), {time(12)})
+        # post_save de cada clase invalida el feed .ics del profesor
+        self.assertEqual(invalidar.call_args_list.count(mock.call([self.profesor.id])), 3)
+
+class ApiEsperaTests(TestCase):
+    def setUp(self):
+        self.alumno = CustomUser.objects.create_user(username='alumno', password='x', mail='a@x.com',
+                                                     nombre='Ana', apellido='Gómez', rol='Alumno_Usuario')
+        self.client.force_login(self.alumno)
+
+    def test_club_no_entero_es_400(self):
+        for club in ([1], {'id': 1}, True, '1a'):
+            respuesta = self.client.post(reverse('api_espera'),
+                                         [{'club': club, 'fecha': '2026-11-02', 'hora': '09:00'}],
+                                         content_type='application/json')
+            self.assertEqual(respuesta.status_code, 400)
+            self.assertEqual(respuesta.json()['detalle'], {'0': {'club': 'Club inexistente'}})
+        self.assertFalse(EnEspera.objects.exists())
+
+class ReservasConcurrentesTests(TransactionTestCase):
+    """
+    Varios hilos emparejan los mismos alumnos a la vez: ninguna espera puede
+    quedar asignada dos veces ni un emparejamiento pasar de 4 jugadores.
+    """
+    hilos = 4
+    intentos = 20
+    turnos = 5
+    alumnos_por_turno = 8
+    reintentos = 50
+
+    def setUp(self):
+        # Canchas de sobra: la prueba es sobre las esperas, no sobre la capacidad
+        club = Club.objects.create(nombre_club='Estrés', canchas_techo=100, canchas_sin_techo=100,
+                                   cant_profesores=self.hilos, localidad='CABA', provincia='Buenos Aires',
+                                   valor_hora_ar=15000)
+        self.profesores = CustomUser.objects.bulk_create([
+            CustomUser(username=f'prof_{i}', rol='Profesor_Admin', mail=f'prof_{i}@ejemplo.com')
+            for i in range(self.hilos)
+        ])
+        fecha = timezone.localdate() + timedelta(days=1)
+        self.turnos_libres = []
+        for t in range(self.turnos):
+            hora = time(8 + t)
+            alumnos = CustomUser.objects.bulk_create([
+                CustomUser(username=f'alu_{t}_{i}', rol='Alumno_Usuario', mail=f'alu_{t}_{i}@ejemplo.com',
+                           nivel_categoria=1 + i % 9)
+                for i in range(self.alumnos_por_turno)
+            ])
+            EnEspera.objects.bulk_create([
+                EnEspera(id_club=club, id_usuario=alumno, fecha=fecha, hora=hora) for alumno in alumnos
+            ])
+            self.turnos_libres.append((club.id, fecha, hora, alumnos))
+
+    def reservar(self, numero, barrera, reservas):
+        rnd = random.Random(42 + numero)
+        profesor = self.profesores[numero]
+        barrera.wait()
+        try:
+            for _ in range(self.intentos):
+                club_id, fecha, hora, alumnos = rnd.choice(self.turnos_libres)
+                jugadores = rnd.sample(alumnos, rnd.randint(2, 4))
+                for _ in range(self.reintentos):
+                    try:
+                        reservar_turno(profesor, club_id, fecha, hora, jugadores, 15000)
+                        reservas.append(1)
+                    except (EsperaYaAsignada, SinCanchasLibres):
+                        pass
+                    except OperationalError:
+                        # SQLite bloquea la base entera en vez de la fila: reintentar
+                        threading.Event().wait(rnd.uniform(0.001, 0.01))
+                        continue
+                    break
+        finally:
+            connection.close()
+
+    def test_ninguna_espera_asignada_dos_veces(self):
+        barrera = threading.Barrier(self.hilos)
+        reservas = []
+        hilos = [threading.Thread(target=self.reservar, args=(i, barrera, reservas)) for i in range(self.hilos)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertTrue(reservas)
+
+        Jugadores = Emparejamiento.jugadores.through
+        # Un alumno en más de una clase del mismo turno
+        repetidos = (Jugadores.objects
+                     .values('customuser', fecha=F('emparejamiento__id_clase__fecha'),
+                             hora=F('emparejamiento__id_clase__hora'))
+                     .annotate(clases=Count('emparejamiento__id_clase', distinct=True))
+                     .filter(clases__gt=1))
+        self.assertFalse(list(repetidos))
+        self.assertFalse(Emparejamiento.objects.annotate(cantidad=Count('jugadores')).filter(cantidad__gt=4).exists())
+        self.assertEqual(Emparejamiento.objects.count(), len(reservas))
+        # Cada jugador tiene su espera apuntando a su emparejamiento, y ninguna espera a uno ajeno
+        self.assertFalse(Jugadores.objects.exclude(customuser__enespera__id_emparejamiento=F('emparejamiento')).exists())
+        self.assertFalse(EnEspera.objects.filter(id_emparejamiento__isnull=False)
+                         .exclude(id_emparejamiento__jugadores=F('id_usuario')).exists())
+
+DOMINIOS = ['gmail.test', 'hotmail.test', 'yahoo.test', 'fibertel.test']
+DOMINIO_REBOTE = 'rebota.test'
+
+class ManejadorSMTP(socketserver.StreamRequestHandler):
+    """SMTP mínimo: lo justo para smtplib (EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT)"""
+    def responder(self, linea):
+        self.wfile.write(f'{linea}\r\n'.encode())
+
+    def handle(self):
+        servidor = self.server
+        self.responder('220 smtp-local listo')
+        destinatarios = []
+        while True:
+            linea = self.rfile.readline()
+            if not linea:
+                return
+            comando = linea.decode(errors='replace').strip()
+            verbo = comando[:4].upper()
+            if verbo == 'EHLO':
+                self.responder('250-smtp-local')
+                self.responder('250 8BITMIME')
+            elif verbo in ('HELO', 'NOOP'):
+                self.responder('250 OK')
+            elif verbo in ('MAIL', 'RSET'):
+                destinatarios = []
+                self.responder('250 OK')
+            elif verbo == 'RCPT':
+                direccion = comando.split(':', 1)[1].strip(' <>').lower()
+                if direccion.endswith('@' + DOMINIO_REBOTE):
+                    self.responder('550 Casilla inexistente')
+                elif servidor.azar() < servidor.fallas_transitorias:
+                    self.responder('451 Intente más tarde')
+                else:
+                    destinatarios.append(direccion)
+                    self.responder('250 OK')
+            elif verbo == 'DATA':
+                self.responder('354 Fin con <CRLF>.<CRLF>')
+                while self.rfile.readline() not in (b'.\r\n', b'.\n', b''):
+                    pass
+                with servidor.lock:
+                    servidor.entregados.update(destinatarios)
+                self.responder('250 Encolado')
+            elif verbo == 'QUIT':
+                self.responder('221 Chau')
+                return
+            else:
+                self.responder('502 No implementado')
+
+class ServidorSMTPLocal(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, fallas_transitorias=0.0, semilla=42):
+        super().__init__(('127.0.0.1', 0), ManejadorSMTP)
+        self.fallas_transitorias = fallas_transitorias
+        self.lock = threading.Lock()
+        self.rnd = random.Random(semilla)
+        self.entregados = Counter()
+
+    def azar(self):
+        with self.lock:
+            return self.rnd.random()
+
+def conexion_smtp(puerto):
+    return {'backend': 'django.core.mail.backends.smtp.EmailBackend', 'host': '127.0.0.1', 'port': puerto,
+            'use_tls': False, 'use_ssl': False, 'username': '', 'password': '', 'timeout': 5}
+
+class EnvioAsyncTests(TransactionTestCase):
+    """
+    Envío concurrente del outbox contra un servidor SMTP local: cada
+    notificación queda enviada o con su error, y sólo los rechazos del
+    servidor gastan intentos.
+    """
+    def sembrar(self, direcciones):
+        usuarios = CustomUser.objects.bulk_create([
+            CustomUser(username=direccion, mail=direccion, nombre=f'Alumno {i}')
+            for i, direccion in enumerate(direcciones)
+        ])
+        Notificacion.objects.bulk_create([Notificacion(id_usuario=u, tipo_evento='Cancelacion') for u in usuarios])
+
+    def servidor(self, fallas_transitorias):
+        servidor = ServidorSMTPLocal(fallas_transitorias)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        return servidor
+
+    def test_lote_con_rebotes_y_fallas_transitorias(self):
+        direcciones = [f'alumno{i}@{DOMINIOS[i % len(DOMINIOS)]}' for i in range(60)]
+        direcciones += [f'rebote{i}@{DOMINIO_REBOTE}' for i in range(3)]
+        self.sembrar(direcciones)
+        servidor = self.servidor(fallas_transitorias=0.05)
+
+        resultados = despachar_async(len(direcciones), sesiones=4, por_dominio_segundo=0, reintentos=2,
+                                     **conexion_smtp(servidor.server_address[1]))
+
+        self.assertEqual(sum(resultados.values()), len(direcciones))
+        self.assertEqual(resultados[FALLIDA], 3)
+        for mail, enviada, error, intentos, reclamada_en in Notificacion.objects.values_list(
+                'id_usuario__mail', 'enviada', 'ultimo_error', 'intentos', 'reclamada_en'):
+            with self.subTest(mail=mail):
+                self.assertEqual(servidor.entregados[mail], 1 if enviada else 0)
+                if not enviada:
+                    self.assertTrue(error)
+                    self.assertIsNone(reclamada_en)
+                if mail.endswith('@' + DOMINIO_REBOTE):
+                    self.assertEqual(intentos, NOTIFICACION_MAX_INTENTOS)
+                else:
+                    # Los reintentos de una corrida son a lo sumo un intento del outbox
+                    self.assertLessEqual(intentos, 1)
+
+    def test_rechazos_transitorios_gastan_un_solo_intento(self):
+        self.sembrar(['alumno@gmail.test'])
+        servidor = self.servidor(fallas_transitorias=1.0)
+
+        resultados = despachar_async(sesiones=1, por_dominio_segundo=0, reintentos=2,
+                                     **conexion_smtp(servidor.server_address[1]))
+
+        self.assertEqual(resultados[REINTENTAR], 1)
+        notificacion = Notificacion.objects.get()
+        self.assertEqual(notificacion.intentos, 1)
+        self.assertIn('451', notificacion.ultimo_error)
+
+    def test_corte_del_servidor_no_gasta_intentos(self):
+        self.sembrar(['alumno@gmail.test'])
+        # Puerto sin nadie escuchando: conexión rechazada, como un SMTP caído
+        with socket.socket() as libre:
+            libre.bind(('127.0.0.1', 0))
+            puerto = libre.getsockname()[1]
+
+        resultados = despachar_async(sesiones=1, por_dominio_segundo=0, reintentos=0, **conexion_smtp(puerto))
+
+        self.assertEqual(resultados[REINTENTAR], 1)
+        notificacion = Notificacion.objects.get()
+        self.assertEqual(notificacion.intentos, 0)
+        self.assertFalse(notificacion.enviada)
+        self.assertIsNone(notificacion.reclamada_en)
+        self.assertTrue(notificacion.ultimo_error)
+        # Espera el backoff y después se puede volver a reclamar
+        self.assertEqual(reclamar_notificaciones_pendientes(), [])
+        with mock.patch('django.utils.timezone.now', return_value=notificacion.proximo_intento):
+            self.assertEqual([n.pk for n in reclamar_notificaciones_pendientes()], [notificacion.pk])
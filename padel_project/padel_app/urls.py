@@ -40,6 +40,8 @@ urlpatterns = [
     # Perfil y usuarios
     path('perfil/', views.PerfilView.as_view(), name='perfil'),
     path('perfil/editar/', views.EditarPerfilView.as_view(), name='editar_perfil'),
+    path('perfil/calendario/regenerar/', views.RegenerarCalendarioView.as_view(), name='regenerar_calendario'),
+    path('calendario/<int:usuario_id>/<str:token>.ics', views.CalendarioView.as_view(), name='calendario'),
     
     # Lista de espera - Alumnos
     path('espera/', views.ListaEsperaListView.as_view(), name='lista_espera'),
@@ -50,6 +52,7 @@ urlpatterns = [
     # Emparejamiento (solo profesores)
     path('emparejamiento/', views.EmparejamientoView.as_view(), name='emparejamiento'),
     path('emparejamiento/crear/', views.CrearEmparejamientoView.as_view(), name='crear_emparejamiento'),
+    path('emparejamiento/demanda/', views.DemandaView.as_view(), name='demanda'),
     
     # Gestión de Alumnos
     path('gestion-alumnos/', views.GestionAlumnosView.as_view(), name='gestion_alumnos'),
@@ -61,12 +64,39 @@ urlpatterns = [
     path('gestion-espera/confirmar/<int:pk>/', views.ConfirmarClaseView.as_view(), name='confirmar_clase'),
     path('gestion-espera/notificacion/<int:pk>/', views.DetalleNotificacionView.as_view(), name='detalle_notificacion'),
     path('gestion-espera/clase/<int:pk>/', views.DetalleClaseView.as_view(), name='detalle_clase'),
+    path('eventos/', views.EventosView.as_view(), name='eventos'),
 
     path('clases/', views.ListaClasesView.as_view(), name='lista_clases'),
     path('clases/crear/', views.CrearClaseView.as_view(), name='crear_clase'),
     path('clases/editar/<int:pk>/', views.EditarClaseView.as_view(), name='editar_clase'),
     path('clases/eliminar/<int:pk>/', views.EliminarClaseView.as_view(), name='eliminar_clase'),
+    path('clases/cierre/', views.CierreClubView.as_view(), name='cierre_club'),
     path('clases/<int:pk>/gestionar-alumnos/', views.GestionarAlumnosClaseView.as_view(), name='gestionar_alumnos_clase'),
     path('clases/<int:clase_id>/agregar-alumno/', views.AgregarAlumnoClaseView.as_view(), name='agregar_alumno_clase'),
     path('clases/<int:clase_id>/quitar-alumno/', views.QuitarAlumnoClaseView.as_view(), name='quitar_alumno_clase'),
+    path('exportar/<str:dataset>.<str:formato>', views.ExportarView.as_view(), name='exportar'),
+    path('series/', views.ListaSeriesView.as_view(), name='lista_series'),
+    path('series/crear/', views.CrearSerieView.as_view(), name='crear_serie'),
+    path('series/editar/<int:pk>/', views.EditarSerieView.as_view(), name='editar_serie'),
+    path('series/cancelar/<int:pk>/', views.CancelarSerieView.as_view(), name='cancelar_serie'),
+    path('clubes/<int:pk>/disponibilidad/', views.DisponibilidadCanchasView.as_view(), name='disponibilidad_canchas'),
+    
+    # Reportes de ingresos y ocupación (solo profesores)
+    path('reportes/', views.ReportesView.as_view(), name='reportes'),
+    
+    # Métricas de rendimiento (solo profesores)
+    path('rendimiento/', views.EstadisticasRendimientoView.as_view(), name='rendimiento'),
+    
+    # API JSON
+    path('api/espera/', views.ApiEsperaListaView.as_view(), name='api_espera'),
+    path('api/espera/<int:pk>/', views.ApiEsperaDetalleView.as_view(), name='api_espera_detalle'),
+    path('api/clases/', views.ApiClasesListaView.as_view(), name='api_clases'),
+    path('api/clases/<int:pk>/', views.ApiClaseDetalleView.as_view(), name='api_clase_detalle'),
+    path('api/clases/<int:pk>/jugadores/', views.ApiJugadoresClaseView.as_view(), name='api_clase_jugadores'),
+    path('api/emparejamientos/', views.ApiEmparejamientosListaView.as_view(), name='api_emparejamientos'),
+    path('api/emparejamientos/<int:pk>/', views.ApiEmparejamientoDetalleView.as_view(),
+         name='api_emparejamiento_detalle'),
+    path('api/notificaciones/', views.ApiNotificacionesListaView.as_view(), name='api_notificaciones'),
+    path('api/notificaciones/<int:pk>/', views.ApiNotificacionDetalleView.as_view(),
+         name='api_notificacion_detalle'),
 ]
\ No newline at end of file
@@ -1,13 +1,33 @@
 # utils.py - VERSIÓN MEJORADA
-from django.core.mail import send_mail
+from datetime import timedelta
+from smtplib import SMTPServerDisconnected
+from django.core.mail import EmailMessage, get_connection, send_mail
 from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
 import logging
 
+from . import eventos
+from .models import Notificacion
+
 logger = logging.getLogger(__name__)
 
-def enviar_notificacion_email(usuario, tipo_evento, clase=None, notificacion_obj=None):
+# Tiempo que una notificación reclamada queda reservada para un despachador.
+# Si el proceso muere a mitad del envío, otro la vuelve a tomar al vencer;
+# el despachador renueva el reclamo antes de cada mensaje.
+NOTIFICACION_RECLAMO_SEGUNDOS = getattr(settings, 'NOTIFICACION_RECLAMO_SEGUNDOS', 300)
+NOTIFICACION_MAX_INTENTOS = getattr(settings, 'NOTIFICACION_MAX_INTENTOS', 5)
+# Backoff entre intentos fallidos: base * 2^intentos, con tope
+NOTIFICACION_ESPERA_BASE = getattr(settings, 'NOTIFICACION_ESPERA_BASE', 60)
+NOTIFICACION_ESPERA_MAXIMA = getattr(settings, 'NOTIFICACION_ESPERA_MAXIMA', 3600)
+
+class ConexionCaida(Exception):
+    """El servidor SMTP no está disponible: no es culpa del mensaje y no cuenta como intento"""
+
+def construir_mensaje_notificacion(usuario, tipo_evento, clase=None):
     """
-    Función para enviar notificaciones por email CON MEJOR LOGGING
+    Arma el asunto y el cuerpo del email según el tipo de evento
     """
     if tipo_evento == 'Confirmacion':
         asunto = '🎾 Clase de Pádel Confirmada'
@@ -58,6 +78,23 @@ def enviar_notificacion_email(usuario, tipo_evento, clase=None, notificacion_obj
         Saludos,
         Equipo Padel App
         """
+    return asunto, mensaje
+
+def remitente_notificaciones():
+    return getattr(settings, 'DEFAULT_FROM_EMAIL', 'aromero@fpimpresora.com.ar')
+
+def construir_email_notificacion(usuario, tipo_evento, clase=None, connection=None):
+    """
+    Devuelve el EmailMessage listo para enviar por una conexión compartida
+    """
+    asunto, mensaje = construir_mensaje_notificacion(usuario, tipo_evento, clase)
+    return EmailMessage(asunto, mensaje, remitente_notificaciones(), [usuario.mail], connection=connection)
+
+def enviar_notificacion_email(usuario, tipo_evento, clase=None, notificacion_obj=None):
+    """
+    Función para enviar notificaciones por email CON MEJOR LOGGING
+    """
+    asunto, mensaje = construir_mensaje_notificacion(usuario, tipo_evento, clase)
     
     try:
         logger.info(f"🔧 Intentando enviar email a {usuario.mail} - Tipo: {tipo_evento}")
@@ -66,7 +103,7 @@ def enviar_notificacion_email(usuario, tipo_evento, clase=None, notificacion_obj
         resultado = send_mail(
             asunto,
             mensaje,
-            getattr(settings, 'DEFAULT_FROM_EMAIL', 'aromero@fpimpresora.com.ar'),
+            remitente_notificaciones(),
             [usuario.mail],
             fail_silently=False,
         )
@@ -82,4 +119,208 @@ def enviar_notificacion_email(usuario, tipo_evento, clase=None, notificacion_obj
         
     except Exception as e:
         logger.error(f"❌ ERROR enviando email a {usuario.mail}: {str(e)}")
-        return False
\ No newline at end of file
+        # Liberar el reclamo para que el despachador la reintente más tarde
+        if notificacion_obj:
+            registrar_falla(notificacion_obj, str(e))
+        return False
+
+def encolar_notificacion(usuario, tipo_evento, clase=None):
+    """
+    Registra la notificación en el outbox sin enviarla. El envío real lo hace
+    el comando despachar_notificaciones fuera del request.
+    """
+    return Notificacion.objects.create(
+        id_usuario=usuario,
+        tipo_evento=tipo_evento,
+        id_clase=clase
+    )
+
+def encolar_notificaciones(usuarios, tipo_evento, clase=None):
+    """
+    Versión masiva de encolar_notificacion: un solo INSERT para todo el grupo
+    """
+    creadas = Notificacion.objects.bulk_create([
+        Notificacion(id_usuario=usuario, tipo_evento=tipo_evento, id_clase=clase)
+        for usuario in usuarios
+    ])
+    for notificacion in creadas:
+        eventos.publicar_al_confirmar('notificacion', eventos.datos_notificacion(notificacion))
+    return creadas
+
+def encolar_notificaciones_por_clase(pares, tipo_evento, tamano_lote=1000):
+    """
+    Fan-out masivo para muchas clases a la vez: `pares` es un iterable de
+    (usuario_id, clase_id). Inserta en lotes sin cargar usuarios ni clases.
+    Devuelve la cantidad encolada.
+    """
+    total = 0
+    lote = []
+    for usuario_id, clase_id in pares:
+        lote.append(Notificacion(id_usuario_id=usuario_id, tipo_evento=tipo_evento, id_clase_id=clase_id))
+        if len(lote) >= tamano_lote:
+            total += len(Notificacion.objects.bulk_create(lote))
+            lote = []
+    if lote:
+        total += len(Notificacion.objects.bulk_create(lote))
+    if total:
+        # Fan-out masivo: un solo aviso con el total en vez de un evento por fila
+        eventos.publicar_al_confirmar('notificacion', {'estado': 'encoladas', 'tipo_evento': tipo_evento,
+                                                       'cantidad': total})
+    return total
+
+def proximo_intento(intentos, ahora=None):
+    espera = min(NOTIFICACION_ESPERA_MAXIMA, NOTIFICACION_ESPERA_BASE * 2 ** max(intentos - 1, 0))
+    return (ahora or timezone.now()) + timedelta(seconds=espera)
+
+def registrar_falla(notificacion, error, permanente=False, fallas=1):
+    """
+    Suma los envíos fallidos y libera la fila con backoff. Las fallas
+    permanentes (casilla inexistente) llegan al máximo para que no se vuelva
+    a tomar.
+    """
+    notificacion.intentos = NOTIFICACION_MAX_INTENTOS if permanente else notificacion.intentos + fallas
+    Notificacion.objects.filter(pk=notificacion.pk).update(
+        reclamada_en=None, intentos=notificacion.intentos, ultimo_error=f'Permanente: {error}' if permanente else error,
+        proximo_intento=None if permanente else proximo_intento(notificacion.intentos)
+    )
+    eventos.bus.publicar('notificacion', {**eventos.datos_notificacion(notificacion),
+                                          'estado': 'fallida', 'error': error})
+
+def liberar_sin_intento(notificaciones, error):
+    """Devuelve el lote al outbox tras un corte de conexión, sin gastar intentos"""
+    Notificacion.objects.filter(pk__in=[n.pk for n in notificaciones]).update(
+        reclamada_en=None, ultimo_error=error, proximo_intento=proximo_intento(1)
+    )
+
+def renovar_reclamo(notificacion):
+    """
+    Extiende el reclamo antes de enviar. Devuelve False si venció y otro
+    despachador la tomó: entonces no hay que enviarla.
+    """
+    ahora = timezone.now()
+    renovada = Notificacion.objects.filter(
+        pk=notificacion.pk, reclamada_en=notificacion.reclamada_en, enviada=False
+    ).update(reclamada_en=ahora)
+    notificacion.reclamada_en = ahora
+    return bool(renovada)
+
+def reencolar_abandonadas(desde=None):
+    """
+    Vuelve a poner en el outbox las notificaciones que agotaron los
+    intentos (por ejemplo después de una caída larga del proveedor).
+    Devuelve la cantidad reencolada.
+    """
+    abandonadas = Notificacion.objects.filter(enviada=False, intentos__gte=NOTIFICACION_MAX_INTENTOS)
+    if desde is not None:
+        abandonadas = abandonadas.filter(fecha_creacion__gte=desde)
+    return abandonadas.update(intentos=0, proximo_intento=None, reclamada_en=None)
+
+def reclamar_notificaciones_pendientes(limite=50):
+    """
+    Reclama un lote de notificaciones pendientes con un UPDATE condicional,
+    de modo que dos despachadores nunca tomen la misma fila. Las que
+    fallaron esperan hasta proximo_intento.
+    """
+    ahora = timezone.now()
+    vencimiento = ahora - timedelta(seconds=NOTIFICACION_RECLAMO_SEGUNDOS)
+    disponibles = Q(reclamada_en__isnull=True) | Q(reclamada_en__lt=vencimiento)
+    
+    with transaction.atomic():
+        candidatas = list(
+            Notificacion.objects.select_for_update(skip_locked=True)
+            .filter(disponibles, enviada=False, intentos__lt=NOTIFICACION_MAX_INTENTOS)
+            .filter(Q(proximo_intento__isnull=True) | Q(proximo_intento__lte=ahora))
+            .order_by('fecha_creacion', 'id')
+            .values_list('id', flat=True)[:limite]
+        )
+        if not candidatas:
+            return []
+        Notificacion.objects.filter(disponibles, id__in=candidatas, enviada=False).update(reclamada_en=ahora)
+    
+    return list(
+        Notificacion.objects.filter(id__in=candidatas, reclamada_en=ahora)
+        .select_related('id_usuario', 'id_clase', 'id_clase__id_profesor', 'id_clase__entrenamiento')
+        .order_by('fecha_creacion', 'id')
+    )
+
+def _enviar_con_reconexion(connection, email):
+    """
+    Envía un mensaje por la conexión abierta; si el servidor cortó la sesión
+    (timeout, límite de mensajes por conexión) reabre una vez y reintenta.
+    Si no se puede reabrir, lanza ConexionCaida.
+    """
+    try:
+        return connection.send_messages([email])
+    except (SMTPServerDisconnected, ConnectionError):
+        logger.warning("🔌 Conexión SMTP perdida, reconectando...")
+        connection.close()
+        try:
+            connection.open()
+        except Exception as e:
+            raise ConexionCaida(str(e)) from e
+        return connection.send_messages([email])
+
+def enviar_notificaciones_en_lote(notificaciones, connection=None):
+    """
+    Envía varias notificaciones por una única conexión SMTP reutilizada.
+    Cada notificación se marca apenas sale, así un corte a mitad del lote
+    no provoca reenvíos. Si el servidor no responde, lo que falta del lote
+    vuelve al outbox con backoff y sin contar un intento. Devuelve
+    (enviadas, fallidas).
+    """
+    if not notificaciones:
+        return 0, 0
+    
+    propia = connection is None
+    if propia:
+        connection = get_connection(fail_silently=False)
+    
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"❌ ERROR abriendo conexión SMTP: {str(e)}")
+        liberar_sin_intento(notificaciones, str(e))
+        return 0, len(notificaciones)
+    
+    enviadas = 0
+    fallidas = 0
+    try:
+        for i, notificacion in enumerate(notificaciones):
+            if not renovar_reclamo(notificacion):
+                logger.warning(f"⚠️ Reclamo vencido de la notificación {notificacion.pk}: la envía otro despachador")
+                continue
+            usuario = notificacion.id_usuario
+            email = construir_email_notificacion(usuario, notificacion.tipo_evento, notificacion.id_clase)
+            try:
+                _enviar_con_reconexion(connection, email)
+            except ConexionCaida as e:
+                logger.error(f"❌ ERROR reconectando con el servidor SMTP: {str(e)}")
+                pendientes = notificaciones[i:]
+                liberar_sin_intento(pendientes, str(e))
+                fallidas += len(pendientes)
+                break
+            except Exception as e:
+                logger.error(f"❌ ERROR enviando email a {usuario.mail}: {str(e)}")
+                registrar_falla(notificacion, str(e))
+                fallidas += 1
+                continue
+            
+            notificacion.enviada = True
+            notificacion.fecha_envio = timezone.now()
+            Notificacion.objects.filter(pk=notificacion.pk).update(
+                enviada=True, fecha_envio=notificacion.fecha_envio, ultimo_error='', proximo_intento=None
+            )
+            eventos.bus.publicar('notificacion', eventos.datos_notificacion(notificacion))
+            enviadas += 1
+        logger.info(f"✅ Lote enviado: {enviadas} exitosos, {fallidas} fallidos")
+    finally:
+        if propia:
+            connection.close()
+    
+    return enviadas, fallidas
+
+def despachar_notificaciones_pendientes(limite=50, connection=None):
+    """
+    Envía un lote del outbox. Devuelve (enviadas, fallidas).
+    """
+    return enviar_notificaciones_en_lote(reclamar_notificaciones_pendientes(limite), connection)
@@ -1,12 +1,33 @@
+import logging
+from datetime import date, time, timedelta
 from django.shortcuts import render, redirect, get_object_or_404
-from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView, View, DetailView
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView, View, DetailView, FormView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib import messages
-from django.urls import reverse_lazy
-from django.db.models import Q
+from django.urls import reverse, reverse_lazy
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from .models import *
-from .utils import enviar_notificacion_email
+from .analitica import actualizar_resumenes, reporte
+from .api import RECURSOS, ErrorApi, inscribir_esperas, leer_json, pagina, respuesta_condicional, serializar
+from .calendario import feed, regenerar_token, token_de
+from .dashboard import datos_dashboard
+from .eventos import TIPOS as TIPOS_EVENTO, bus, flujo, vigia
+from .exportacion import DATASETS, archivo_xlsx, filas_csv
+from .canchas import SinCanchasLibres, duracion_de, franjas_libres, verificar_capacidad
+from .emparejador import proponer_grupos_turno
+from .instrumentacion import resumen_por_vista
+from .paginacion import PaginacionKeysetMixin, filtro_keyset
+from .forms import CierreClubForm, SerieClaseForm
+from .plantel import MAXIMO_JUGADORES, CupoCompleto, agregar_alumnos, quitar_alumnos
+from .reservas import EsperaYaAsignada, cancelar_por_cierre, clases_en_rango, reservar_turno
+from .series import aplicar_cambios, cancelar_serie, clases_futuras, materializar
+from .utils import encolar_notificacion, encolar_notificaciones
+
+logger = logging.getLogger(__name__)
 
 # Mixin para verificar si es profesor - DEBE IR PRIMERO
 class EsProfesorMixin(UserPassesTestMixin):
@@ -16,18 +37,49 @@ class EsProfesorMixin(UserPassesTestMixin):
 # Vistas principales
 class HomeView(TemplateView):
     template_name = 'home.html'
+    presupuesto_consultas = 5
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
-            if self.request.user.rol == 'Alumno_Usuario':
-                context['en_espera'] = EnEspera.objects.filter(id_usuario=self.request.user)
-            elif self.request.user.rol == 'Profesor_Admin':
-                context['clases_pendientes'] = Clase.objects.filter(confirmado=False)
+            # Cacheado por usuario; signals.py lo invalida al cambiar clases o esperas
+            context.update(datos_dashboard(self.request.user))
         return context
 
 class PerfilView(LoginRequiredMixin, TemplateView):
     template_name = 'perfil.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        url = self.request.build_absolute_uri(
+            reverse('calendario', args=[self.request.user.id, token_de(self.request.user)])
+        )
+        context['url_calendario'] = url
+        context['url_webcal'] = 'webcal://' + url.split('://', 1)[1]
+        return context
+
+class RegenerarCalendarioView(LoginRequiredMixin, View):
+    def post(self, request):
+        regenerar_token(request.user)
+        messages.success(request, 'Se generó un nuevo enlace de calendario. El anterior dejó de funcionar.')
+        return redirect('perfil')
+
+class CalendarioView(View):
+    """
+    Feed .ics autenticado por el token de la URL (los clientes de calendario
+    no envían cookies). Con el feed en cache responde sin consultar la base.
+    """
+    def get(self, request, usuario_id, token):
+        datos = feed(usuario_id, token)
+        if datos is None:
+            raise Http404
+        response = get_conditional_response(request, etag=datos['etag'])
+        if response is None:
+            response = HttpResponse(datos['cuerpo'], content_type='text/calendar; charset=utf-8')
+            response['Content-Disposition'] = 'inline; filename="clases-padel.ics"'
+        response['ETag'] = datos['etag']
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 class EditarPerfilView(LoginRequiredMixin, UpdateView):
     model = CustomUser
@@ -49,7 +101,7 @@ class ListaEsperaListView(LoginRequiredMixin, ListView):
     context_object_name = 'en_espera'
     
     def get_queryset(self):
-        return EnEspera.objects.filter(id_usuario=self.request.user).order_by('-fecha', '-hora')
+        return EnEspera.objects.filter(id_usuario=self.request.user).select_related('id_club').order_by('-fecha', '-hora')
 
 class AgregarEsperaView(LoginRequiredMixin, CreateView):
     model = EnEspera
@@ -93,147 +145,121 @@ class EliminarEsperaView(LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 # Vistas para Emparejamiento (Profesores)
-class EmparejamientoView(EsProfesorMixin, ListView):
+class EmparejamientoView(EsProfesorMixin, PaginacionKeysetMixin, ListView):
+    """
+    Se pagina por turno (fecha, hora, club) y no por solicitud, para no
+    partir un turno entre dos páginas: sólo se cargan las esperas y se
+    calculan las propuestas de los turnos visibles.
+    """
     model = EnEspera
     template_name = 'emparejamiento.html'
-    context_object_name = 'lista_espera'
+    context_object_name = 'turnos'
+    presupuesto_consultas = 5
+    orden_keyset = ('fecha', 'hora', 'id_club')
+    tamano_pagina = 30
+    tamano_pagina_maximo = 100
     
-    def get_queryset(self):
-        # Agrupar por fecha, hora y club
+    def pendientes(self):
+        # Turnos pasados ya no se pueden emparejar
         return EnEspera.objects.filter(
             id_clase__isnull=True,
-            id_emparejamiento__isnull=True
-        ).order_by('fecha', 'hora', 'id_club')
+            id_emparejamiento__isnull=True,
+            fecha__gte=timezone.localdate()
+        )
+    
+    def get_queryset(self):
+        return self.pendientes().values(*self.orden_keyset).annotate(cantidad=Count('id'))
+    
+    def valores_cursor(self, turno):
+        return [turno[campo] for campo in self.orden_keyset]
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Agrupar por fecha, hora y club para facilitar el emparejamiento
+        turnos = context['turnos']
         espera_agrupada = {}
-        for item in context['lista_espera']:
-            key = f"{item.fecha}_{item.hora}_{item.id_club.id}"
-            if key not in espera_agrupada:
-                espera_agrupada[key] = []
-            espera_agrupada[key].append(item)
+        if turnos:
+            # Las esperas de los turnos de la página: entre el primero y el último, inclusive
+            primero, ultimo = self.valores_cursor(turnos[0]), self.valores_cursor(turnos[-1])
+            esperas = (self.pendientes()
+                       .exclude(filtro_keyset(self.orden_keyset, primero, hacia_atras=True))
+                       .exclude(filtro_keyset(self.orden_keyset, ultimo))
+                       .select_related('id_usuario', 'id_club').order_by(*self.orden_keyset, 'id'))
+            # Agrupar por fecha, hora y club para facilitar el emparejamiento
+            for item in esperas:
+                espera_agrupada.setdefault(f"{item.fecha}_{item.hora}_{item.id_club_id}", []).append(item)
         context['espera_agrupada'] = espera_agrupada
+        
+        # Grupos sugeridos por el emparejador automático
+        context['propuestas'] = [
+            {'turno': grupo, 'grupos': proponer_grupos_turno(grupo)}
+            for grupo in espera_agrupada.values()
+            if len(grupo) >= 2
+        ]
         return context
 
 class CrearEmparejamientoView(EsProfesorMixin, View):
+    presupuesto_consultas = 22
+    
     def post(self, request):
-        print("🎯🎯🎯 INICIANDO CrearEmparejamientoView POST")
-        print("=" * 60)
-        
         jugadores_ids = request.POST.getlist('jugadores')
-        fecha = request.POST.get('fecha')
-        hora = request.POST.get('hora')
+        fecha = request.POST.get('fecha', '')
+        hora = request.POST.get('hora', '')
         club_id = request.POST.get('club_id')
         descripcion = request.POST.get('descripcion', '')
         valor_ar = request.POST.get('valor_ar')
-        
-        print(f"🔍 DEBUG - DATOS RECIBIDOS:")
-        print(f"   👥 Jugadores IDs: {jugadores_ids}")
-        print(f"   📅 Fecha: {fecha}")
-        print(f"   ⏰ Hora: {hora}")
-        print(f"   🏟️ Club ID: {club_id}")
-        print(f"   📝 Descripción: {descripcion}")
-        print(f"   💰 Valor AR: {valor_ar}")
+        logger.debug(f"🔍 Emparejamiento pedido: jugadores={jugadores_ids} fecha={fecha} hora={hora} "
+                     f"club={club_id} valor={valor_ar}")
         
         if len(jugadores_ids) < 2 or len(jugadores_ids) > 4:
             messages.error(request, 'Debes seleccionar entre 2 y 4 jugadores.')
             return redirect('emparejamiento')
+        if not all(jugador_id.isdigit() for jugador_id in jugadores_ids):
+            messages.error(request, 'Alguno de los jugadores seleccionados no existe.')
+            return redirect('emparejamiento')
+        # La Clase se guarda con fecha y hora tipadas: las señales (analítica) las usan
+        try:
+            fecha = date.fromisoformat(fecha)
+            hora = time.fromisoformat(hora)
+        except ValueError:
+            messages.error(request, 'La fecha o la hora del turno no son válidas.')
+            return redirect('emparejamiento')
+        
+        # Un único SELECT para todos los jugadores seleccionados
+        jugadores = list(CustomUser.objects.filter(id__in=jugadores_ids, rol='Alumno_Usuario'))
+        if len(jugadores) != len(set(jugadores_ids)):
+            messages.error(request, 'Alguno de los jugadores seleccionados no existe.')
+            return redirect('emparejamiento')
         
         try:
-            print("🔄 CREANDO CLASE...")
-            # Crear la clase
-            clase = Clase.objects.create(
-                descripcion=descripcion,
-                id_profesor=request.user,
-                fecha=fecha,
-                hora=hora,
-                valor_ar=valor_ar,
-                confirmado=True
-            )
-            print(f"✅ Clase creada: ID {clase.id}")
-            
-            print("🔄 CREANDO EMPAREJAMIENTO...")
-            # Crear el emparejamiento
-            emparejamiento = Emparejamiento.objects.create(
-                descripcion=descripcion,
-                id_clase=clase
+            # Clase, emparejamiento, espera y notificaciones en una sola transacción
+            clase, emparejamiento = reservar_turno(
+                request.user, club_id, fecha, hora, jugadores, valor_ar, descripcion
             )
-            emparejamiento.jugadores.set(jugadores_ids)
-            print(f"✅ Emparejamiento creado: ID {emparejamiento.id}")
-            
-            print("🔄 ACTUALIZANDO LISTA DE ESPERA...")
-            # Actualizar las entradas en espera
-            EnEspera.objects.filter(
-                id_usuario__in=jugadores_ids,
-                fecha=fecha,
-                hora=hora,
-                id_club_id=club_id
-            ).update(id_clase=clase, id_emparejamiento=emparejamiento)
-            print("✅ Lista de espera actualizada")
-            
-            # Crear notificaciones CON VERIFICACIÓN
-            emails_exitosos = 0
-            emails_fallidos = 0
-
-            print("🔄 INICIANDO ENVÍO DE NOTIFICACIONES...")
-            for jugador_id in jugadores_ids:
-                print(f"🎯 PROCESANDO JUGADOR ID: {jugador_id}")
-                
-                # Obtener jugador
-                jugador = CustomUser.objects.get(id=jugador_id)
-                print(f"   👤 Jugador: {jugador.nombre}")
-                print(f"   📧 Email: {jugador.mail}")
-                
-                # Crear notificación en BD
-                notificacion = Notificacion.objects.create(
-                    id_usuario_id=jugador_id,
-                    tipo_evento='Confirmacion',
-                    id_clase=clase
-                )
-                print(f"   📋 Notificación creada: ID {notificacion.id}")
-                
-                # ENVÍO CON VERIFICACIÓN Y DEBUG
-                print("   🔄 LLAMANDO A enviar_notificacion_email...")
-                email_enviado = enviar_notificacion_email(jugador, 'Confirmacion', clase, notificacion)
-                print(f"   📊 RESULTADO EMAIL: {email_enviado}")
-                
-                if email_enviado:
-                    emails_exitosos += 1
-                    print(f"   ✅ EMAIL EXITOSO - Total exitosos: {emails_exitosos}")
-                else:
-                    emails_fallidos += 1
-                    print(f"   ❌ EMAIL FALLIDO - Total fallidos: {emails_fallidos}")
-                    messages.warning(request, f'Error enviando email a {jugador.nombre}')
-
-            # Mensaje final consolidado
-            print("📊 RESUMEN FINAL DE ENVÍOS:")
-            print(f"   📧 Emails exitosos: {emails_exitosos}")
-            print(f"   📧 Emails fallidos: {emails_fallidos}")
-            print(f"   👥 Total jugadores: {len(jugadores_ids)}")
+            logger.info(f"✅ Clase {clase.id} y emparejamiento {emparejamiento.id} creados")
             
-            if emails_fallidos == 0:
-                messages.success(request, f'✅ Emparejamiento creado exitosamente para {len(jugadores_ids)} jugadores. Todas las notificaciones enviadas.')
-            else:
-                messages.success(request, f'⚠️ Emparejamiento creado para {len(jugadores_ids)} jugadores. {emails_exitosos} notificaciones enviadas, {emails_fallidos} fallaron.')
+            messages.success(request, f'✅ Emparejamiento creado exitosamente para {len(jugadores)} jugadores. Las notificaciones se enviarán en breve.')
             
+        except EsperaYaAsignada as e:
+            messages.error(request, f'❌ {e}. Otro profesor los asignó mientras tanto.')
+        except SinCanchasLibres as e:
+            alternativas = ', '.join(h.strftime('%H:%M') for h in e.alternativas) or 'ninguno ese día'
+            messages.error(request, f'❌ {e}. Horarios con cancha libre: {alternativas}.')
         except Exception as e:
-            print(f"❌❌❌ ERROR CRÍTICO EN CrearEmparejamientoView: {str(e)}")
+            logger.exception(f"❌ Error creando el emparejamiento: {e}")
             messages.error(request, f'Error al crear el emparejamiento: {str(e)}')
         
-        print("🏁 FINALIZANDO CrearEmparejamientoView")
-        print("=" * 60)
         return redirect('emparejamiento')
 
 # NUEVAS VISTAS PARA GESTIÓN DEL PROFESOR
-class GestionAlumnosView(EsProfesorMixin, ListView):
+class GestionAlumnosView(EsProfesorMixin, PaginacionKeysetMixin, ListView):
     model = CustomUser
     template_name = 'gestion_alumnos.html'
     context_object_name = 'alumnos'
+    orden_keyset = ('nombre', 'id')
+    presupuesto_consultas = 5
     
     def get_queryset(self):
-        return CustomUser.objects.filter(rol='Alumno_Usuario').order_by('nombre')
+        return CustomUser.objects.filter(rol='Alumno_Usuario').order_by('nombre', 'id')
 
 class EditarAlumnoView(EsProfesorMixin, UpdateView):
     model = CustomUser
@@ -248,43 +274,42 @@ class EditarAlumnoView(EsProfesorMixin, UpdateView):
         messages.success(self.request, 'Alumno actualizado correctamente.')
         return super().form_valid(form)
 
-class GestionEsperaView(EsProfesorMixin, ListView):
+class GestionEsperaView(EsProfesorMixin, PaginacionKeysetMixin, ListView):
     model = EnEspera
     template_name = 'gestion_espera.html'
     context_object_name = 'lista_espera'
+    presupuesto_consultas = 5
     
     def get_queryset(self):
+        # Estado de la última notificación de la clase, calculado en la misma consulta
+        ultima_notificacion = Notificacion.objects.filter(
+            id_clase=OuterRef('id_clase')
+        ).order_by('-fecha_creacion', '-id')
         return EnEspera.objects.select_related(
             'id_usuario', 
             'id_club', 
             'id_clase',
             'id_clase__id_profesor'
-        ).prefetch_related(
-            'id_clase__notificacion_set'
-        ).all().order_by('-fecha', '-hora')
+        ).annotate(
+            notificacion_id=Subquery(ultima_notificacion.values('id')[:1]),
+            notificacion_enviada=Subquery(ultima_notificacion.values('enviada')[:1]),
+            notificacion_fecha_envio=Subquery(ultima_notificacion.values('fecha_envio')[:1]),
+            notificacion_fecha_creacion=Subquery(ultima_notificacion.values('fecha_creacion')[:1]),
+        ).order_by('-fecha', '-hora', '-id')
 
 class CancelarEsperaView(EsProfesorMixin, DeleteView):
     model = EnEspera
     template_name = 'cancelar_espera.html'
     success_url = reverse_lazy('gestion_espera')
     
-    def delete(self, request, *args, **kwargs):
-        espera = self.get_object()
-        # Crear notificación de cancelación
-        notificacion = Notificacion.objects.create(
-            id_usuario=espera.id_usuario,
-            tipo_evento='Cancelacion'
-        )
-        
-        # ENVÍO CON VERIFICACIÓN
-        email_enviado = enviar_notificacion_email(espera.id_usuario, 'Cancelacion', None, notificacion)
-        
-        if email_enviado:
-            messages.success(request, '✅ Solicitud cancelada y notificación enviada.')
-        else:
-            messages.warning(request, '⚠️ Solicitud cancelada pero error enviando email.')
-        
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # Django 4+: el POST de DeleteView pasa por form_valid, no por delete()
+        with transaction.atomic():
+            # Encolar notificación de cancelación junto con el borrado
+            encolar_notificacion(self.object.id_usuario, 'Cancelacion')
+            response = super().form_valid(form)
+        messages.success(self.request, '✅ Solicitud cancelada. La notificación se enviará en breve.')
+        return response
 
 class ConfirmarClaseView(EsProfesorMixin, View):
     def post(self, request, pk):
@@ -292,31 +317,14 @@ class ConfirmarClaseView(EsProfesorMixin, View):
         clase.confirmado = True
         clase.save()
         
-        # Notificar a todos los jugadores CON VERIFICACIÓN
+        # Encolar notificaciones para todos los jugadores
         emparejamiento = clase.emparejamiento_set.first()
-        emails_exitosos = 0
-        emails_fallidos = 0
+        encoladas = 0
         
         if emparejamiento:
-            for jugador in emparejamiento.jugadores.all():
-                notificacion = Notificacion.objects.create(
-                    id_usuario=jugador,
-                    tipo_evento='Confirmacion',
-                    id_clase=clase
-                )
-                # ENVÍO CON VERIFICACIÓN
-                email_enviado = enviar_notificacion_email(jugador, 'Confirmacion', clase, notificacion)
-                
-                if email_enviado:
-                    emails_exitosos += 1
-                else:
-                    emails_fallidos += 1
+            encoladas = len(encolar_notificaciones(emparejamiento.jugadores.all(), 'Confirmacion', clase))
         
-        # Mensaje final consolidado
-        if emails_fallidos == 0:
-            messages.success(request, f'✅ Clase confirmada. {emails_exitosos} notificaciones enviadas exitosamente.')
-        else:
-            messages.warning(request, f'⚠️ Clase confirmada. {emails_exitosos} notificaciones enviadas, {emails_fallidos} fallaron.')
+        messages.success(request, f'✅ Clase confirmada. {encoladas} notificaciones encoladas para envío.')
         
         return redirect('gestion_espera')
 
@@ -367,45 +375,133 @@ class DetalleClaseView(EsProfesorMixin, DetailView):
         return context
 
 # CRUD de Clases
-class ListaClasesView(EsProfesorMixin, ListView):
+class ListaClasesView(EsProfesorMixin, PaginacionKeysetMixin, ListView):
     model = Clase
     template_name = 'clases/lista_clases.html'
     context_object_name = 'clases'
+    presupuesto_consultas = 5
     
     def get_queryset(self):
-        return Clase.objects.select_related('id_profesor', 'entrenamiento').prefetch_related('emparejamiento_set__jugadores').all().order_by('-fecha', '-hora')
+        return Clase.objects.select_related('id_profesor', 'entrenamiento').annotate(
+            cant_jugadores=Count('emparejamiento__jugadores')
+        ).order_by('-fecha', '-hora', '-id')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['exportaciones'] = [
+            ('clases', 'Clases e ingresos'),
+            ('asistencia', 'Asistencia'),
+            ('espera', 'Lista de espera'),
+            ('notificaciones', 'Notificaciones'),
+        ]
+        return context
 
-class CrearClaseView(EsProfesorMixin, CreateView):
+class CapacidadCanchasMixin:
+    """
+    Rechaza el formulario si el club elegido no tiene canchas libres en ese
+    turno. Llamar dentro de transaction.atomic(): bloquea la fila del club.
+    """
+    def hay_capacidad(self, form):
+        club = form.cleaned_data.get('id_club')
+        if club is None:
+            return True
+        club = Club.objects.select_for_update().get(pk=club.pk)
+        try:
+            verificar_capacidad(
+                club,
+                form.cleaned_data['fecha'],
+                form.cleaned_data['hora'],
+                duracion_de(form.cleaned_data.get('entrenamiento')),
+                excluir_clase=form.instance if form.instance.pk else None
+            )
+        except SinCanchasLibres as e:
+            alternativas = ', '.join(h.strftime('%H:%M') for h in e.alternativas) or 'ninguno ese día'
+            messages.error(self.request, f'❌ {e}. Horarios con cancha libre: {alternativas}.')
+            return False
+        return True
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['entrenamientos'] = Entrenamiento.objects.all()
+        context['clubes'] = Club.objects.all()
+        return context
+
+class CrearClaseView(EsProfesorMixin, CapacidadCanchasMixin, CreateView):
     model = Clase
     template_name = 'clases/crear_clase.html'
-    fields = ['fecha', 'hora', 'valor_ar', 'entrenamiento', 'descripcion']
+    fields = ['fecha', 'hora', 'valor_ar', 'entrenamiento', 'id_club', 'descripcion']
     success_url = reverse_lazy('lista_clases')
     
     def form_valid(self, form):
         form.instance.id_profesor = self.request.user
         form.instance.confirmado = False
-        messages.success(self.request, 'Clase creada exitosamente. Ahora puedes agregar alumnos.')
-        return super().form_valid(form)
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['entrenamientos'] = Entrenamiento.objects.all()
-        return context
+        with transaction.atomic():
+            if not self.hay_capacidad(form):
+                return self.form_invalid(form)
+            messages.success(self.request, 'Clase creada exitosamente. Ahora puedes agregar alumnos.')
+            return super().form_valid(form)
 
-class EditarClaseView(EsProfesorMixin, UpdateView):
+class EditarClaseView(EsProfesorMixin, CapacidadCanchasMixin, UpdateView):
     model = Clase
     template_name = 'clases/editar_clase.html'
-    fields = ['fecha', 'hora', 'valor_ar', 'entrenamiento', 'descripcion', 'confirmado']
+    fields = ['fecha', 'hora', 'valor_ar', 'entrenamiento', 'id_club', 'descripcion', 'confirmado']
     success_url = reverse_lazy('lista_clases')
     
+    def form_valid(self, form):
+        with transaction.atomic():
+            if not self.hay_capacidad(form):
+                return self.form_invalid(form)
+            messages.success(self.request, 'Clase actualizada exitosamente.')
+            return super().form_valid(form)
+
+class DisponibilidadCanchasView(EsProfesorMixin, DetailView):
+    model = Club
+    template_name = 'clases/disponibilidad_canchas.html'
+    context_object_name = 'club'
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['entrenamientos'] = Entrenamiento.objects.all()
+        try:
+            desde = date.fromisoformat(self.request.GET.get('desde', ''))
+        except ValueError:
+            desde = timezone.localdate()
+        try:
+            dias = min(max(int(self.request.GET.get('dias', 7)), 1), 31)
+        except ValueError:
+            dias = 7
+        context['desde'] = desde
+        context['dias'] = dias
+        context['disponibilidad'] = franjas_libres(self.object, desde, desde + timedelta(days=dias - 1))
         return context
-    
-    def form_valid(self, form):
-        messages.success(self.request, 'Clase actualizada exitosamente.')
-        return super().form_valid(form)
+
+class ExportarView(EsProfesorMixin, View):
+    """
+    Descarga de clases, asistencia, espera o notificaciones entre ?desde= y
+    ?hasta= (por defecto el último año). El CSV se transmite a medida que
+    se leen las filas; el XLSX se arma en disco y se sirve por bloques.
+    """
+    def get(self, request, dataset, formato):
+        if dataset not in DATASETS or formato not in ('csv', 'xlsx'):
+            raise Http404
+        hasta = timezone.localdate()
+        try:
+            hasta = date.fromisoformat(request.GET.get('hasta', ''))
+        except ValueError:
+            pass
+        try:
+            desde = date.fromisoformat(request.GET.get('desde', ''))
+        except ValueError:
+            desde = hasta - timedelta(days=365)
+
+        nombre = f'{dataset}_{desde}_{hasta}.{formato}'
+        if formato == 'csv':
+            response = StreamingHttpResponse(filas_csv(dataset, desde, hasta), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+            return response
+        return FileResponse(
+            archivo_xlsx(dataset, desde, hasta), as_attachment=True, filename=nombre,
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
 
 class EliminarClaseView(EsProfesorMixin, DeleteView):
     model = Clase
@@ -416,6 +512,110 @@ class EliminarClaseView(EsProfesorMixin, DeleteView):
         messages.success(request, 'Clase eliminada exitosamente.')
         return super().delete(request, *args, **kwargs)
 
+# Series de clases recurrentes
+class ListaSeriesView(EsProfesorMixin, ListView):
+    model = SerieClase
+    template_name = 'series/lista_series.html'
+    context_object_name = 'series'
+    
+    def get_queryset(self):
+        return SerieClase.objects.select_related('id_profesor', 'id_club', 'entrenamiento').annotate(
+            clases_futuras=Count('clases', filter=Q(clases__fecha__gte=timezone.localdate(),
+                                                    clases__cancelada_en__isnull=True))
+        ).order_by('-activa', 'dia_semana', 'hora')
+
+class SerieFormMixin:
+    form_class = SerieClaseForm
+    template_name = 'series/serie_form.html'
+    success_url = reverse_lazy('lista_series')
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['entrenamientos'] = Entrenamiento.objects.all()
+        context['clubes'] = Club.objects.all()
+        return context
+    
+    def avisar_sin_cancha(self, sin_cancha):
+        if sin_cancha:
+            fechas = ', '.join(f.strftime('%d/%m') for f in sin_cancha)
+            messages.warning(self.request, f'⚠️ Sin canchas libres, no se crearon las clases del {fechas}.')
+
+class CrearSerieView(EsProfesorMixin, SerieFormMixin, CreateView):
+    def form_valid(self, form):
+        form.instance.id_profesor = self.request.user
+        response = super().form_valid(form)
+        clases, sin_cancha = materializar(self.object)
+        messages.success(self.request, f'Serie creada: {len(clases)} clases generadas para las próximas semanas.')
+        self.avisar_sin_cancha(sin_cancha)
+        return response
+
+class EditarSerieView(EsProfesorMixin, SerieFormMixin, UpdateView):
+    model = SerieClase
+    
+    def form_valid(self, form):
+        try:
+            with transaction.atomic():
+                response = super().form_valid(form)
+                actualizadas, canceladas = aplicar_cambios(self.object)
+        except SinCanchasLibres as e:
+            alternativas = ', '.join(h.strftime('%H:%M') for h in e.alternativas) or 'ninguno ese día'
+            messages.error(self.request, f'❌ {e}: la serie no se modificó. Horarios con cancha libre: {alternativas}.')
+            return self.form_invalid(form)
+        clases, sin_cancha = materializar(self.object)
+        mensaje = f'Serie actualizada: {actualizadas} clases futuras modificadas'
+        if canceladas:
+            mensaje += f', {canceladas} canceladas (se notificará a los alumnos)'
+        if clases:
+            mensaje += f', {len(clases)} nuevas'
+        messages.success(self.request, mensaje + '.')
+        self.avisar_sin_cancha(sin_cancha)
+        return response
+
+class CancelarSerieView(EsProfesorMixin, DetailView):
+    model = SerieClase
+    template_name = 'series/cancelar_serie.html'
+    context_object_name = 'serie'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['clases_futuras'] = clases_futuras(self.object).annotate(
+            cant_jugadores=Count('emparejamiento__jugadores')
+        ).order_by('fecha')
+        return context
+    
+    def post(self, request, pk):
+        serie = get_object_or_404(SerieClase, pk=pk)
+        clases, notificaciones = cancelar_serie(serie)
+        messages.success(request, f'✅ Serie cancelada: {clases} clases canceladas y {notificaciones} notificaciones encoladas.')
+        return redirect('lista_series')
+
+class CierreClubView(EsProfesorMixin, FormView):
+    """
+    Cancelación masiva por lluvia o cierre del club. El primer envío muestra
+    las clases afectadas; el segundo (con 'confirmar') las cancela.
+    """
+    form_class = CierreClubForm
+    template_name = 'clases/cierre_club.html'
+    
+    def form_valid(self, form):
+        datos = form.cleaned_data
+        if 'confirmar' not in self.request.POST:
+            desde = max(datos['desde'], timezone.now())
+            clases = (clases_en_rango(datos['club'], desde, datos['hasta'], datos['solo_sin_techo'])
+                      .select_related('id_profesor')
+                      .annotate(cant_jugadores=Count('emparejamiento__jugadores'))
+                      .order_by('fecha', 'hora'))
+            return self.render_to_response(self.get_context_data(form=form, clases=clases, vista_previa=True))
+        
+        clases, notificaciones = cancelar_por_cierre(datos['club'], datos['desde'], datos['hasta'],
+                                                     datos['solo_sin_techo'])
+        if clases:
+            messages.success(self.request, f'✅ Cierre de {datos["club"]}: {clases} clases canceladas y '
+                                           f'{notificaciones} notificaciones encoladas.')
+        else:
+            messages.warning(self.request, f'⚠️ No había clases por cancelar en {datos["club"]} en ese rango.')
+        return redirect('lista_clases')
+
 # Vista para gestionar alumnos en una clase
 class GestionarAlumnosClaseView(EsProfesorMixin, DetailView):
     model = Clase
@@ -444,61 +644,336 @@ class GestionarAlumnosClaseView(EsProfesorMixin, DetailView):
 
 class AgregarAlumnoClaseView(EsProfesorMixin, View):
     def post(self, request, clase_id):
-        clase = get_object_or_404(Clase, id=clase_id)
-        alumno_id = request.POST.get('alumno_id')
+        get_object_or_404(Clase, id=clase_id)
+        alumno_ids = request.POST.getlist('alumno_id')
+        if not alumno_ids:
+            messages.warning(request, 'No se seleccionó ningún alumno.')
+            return redirect('gestionar_alumnos_clase', pk=clase_id)
         
         try:
-            alumno = CustomUser.objects.get(id=alumno_id, rol='Alumno_Usuario')
-            
-            # Obtener o crear el emparejamiento
-            emparejamiento, created = Emparejamiento.objects.get_or_create(
-                id_clase=clase,
-                defaults={'descripcion': f'Emparejamiento para clase del {clase.fecha}'}
-            )
-            
-            # Agregar alumno al emparejamiento
-            if alumno not in emparejamiento.jugadores.all():
-                emparejamiento.jugadores.add(alumno)
-                
-                # Actualizar la entrada en espera del alumno
-                EnEspera.objects.filter(
-                    id_usuario=alumno,
-                    fecha=clase.fecha,
-                    hora=clase.hora
-                ).update(id_clase=clase, id_emparejamiento=emparejamiento)
-                
-                messages.success(request, f'Alumno {alumno.nombre} agregado a la clase.')
-            else:
-                messages.warning(request, f'El alumno {alumno.nombre} ya está en esta clase.')
-                
-        except CustomUser.DoesNotExist:
-            messages.error(request, 'Alumno no encontrado.')
+            agregados, ya_estaban, invalidos = agregar_alumnos(clase_id, alumno_ids)
+        except CupoCompleto as e:
+            messages.error(request, f'❌ {e}. Máximo {MAXIMO_JUGADORES} alumnos por clase.')
+            return redirect('gestionar_alumnos_clase', pk=clase_id)
+        except EsperaYaAsignada as e:
+            messages.error(request, f'❌ {e}.')
+            return redirect('gestionar_alumnos_clase', pk=clase_id)
         
+        if agregados:
+            messages.success(request, f'{len(agregados)} alumno(s) agregado(s) a la clase.')
+        if ya_estaban:
+            messages.warning(request, f'{len(ya_estaban)} alumno(s) ya estaban en esta clase.')
+        if invalidos:
+            messages.error(request, 'Alumno no encontrado.')
         return redirect('gestionar_alumnos_clase', pk=clase_id)
 
 class QuitarAlumnoClaseView(EsProfesorMixin, View):
     def post(self, request, clase_id):
-        clase = get_object_or_404(Clase, id=clase_id)
-        alumno_id = request.POST.get('alumno_id')
+        get_object_or_404(Clase, id=clase_id)
+        quitados, no_estaban = quitar_alumnos(clase_id, request.POST.getlist('alumno_id'))
+        
+        if quitados:
+            messages.success(request, f'{len(quitados)} alumno(s) removido(s) de la clase.')
+        if no_estaban or not quitados:
+            messages.warning(request, 'El alumno no está en esta clase.')
+        return redirect('gestionar_alumnos_clase', pk=clase_id)
+
+# Métricas de rendimiento (InstrumentacionMiddleware)
+class EstadisticasRendimientoView(EsProfesorMixin, TemplateView):
+    template_name = 'rendimiento.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['resumen'] = resumen_por_vista()
+        return context
+
+class ReportesView(EsProfesorMixin, TemplateView):
+    template_name = 'reportes.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        hasta = timezone.localdate()
+        try:
+            hasta = date.fromisoformat(self.request.GET.get('hasta', ''))
+        except ValueError:
+            pass
+        try:
+            desde = date.fromisoformat(self.request.GET.get('desde', ''))
+        except ValueError:
+            desde = hasta - timedelta(weeks=12)
+        # Normalmente sólo quedan pendientes las semanas tocadas desde la última visita
+        actualizar_resumenes()
+        context['desde'] = desde
+        context['hasta'] = hasta
+        context.update(reporte(desde, hasta))
+        return context
+
+class DemandaView(EsProfesorMixin, TemplateView):
+    """Mapa de calor de la lista de espera sin asignar: horas x días"""
+    template_name = 'demanda.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            desde = date.fromisoformat(self.request.GET.get('desde', ''))
+        except ValueError:
+            desde = timezone.localdate()
+        try:
+            dias = min(max(int(self.request.GET.get('dias', 30)), 1), 62)
+        except ValueError:
+            dias = 30
+        club_id = self.request.GET.get('club')
+        banda = self.request.GET.get('banda')
         
+        demanda = DemandaTurno.objects.filter(
+            fecha__gte=desde, fecha__lt=desde + timedelta(days=dias), pendientes__gt=0
+        )
+        if club_id and club_id.isdigit():
+            demanda = demanda.filter(id_club_id=club_id)
+        if banda and banda.isdigit():
+            demanda = demanda.filter(banda=banda)
+        
+        celdas = {}
+        horas = set()
+        for hora, fecha, pendientes in demanda.values_list('hora', 'fecha', 'pendientes'):
+            celdas[(hora, fecha)] = celdas.get((hora, fecha), 0) + pendientes
+            horas.add(hora)
+        fechas = [desde + timedelta(days=i) for i in range(dias)]
+        maximo = max(celdas.values(), default=0)
+        context['fechas'] = fechas
+        context['filas'] = [
+            {'hora': hora, 'celdas': [
+                {'fecha': fecha, 'pendientes': celdas.get((hora, fecha), 0),
+                 'intensidad': min(4, (celdas.get((hora, fecha), 0) * 4 + maximo - 1) // maximo) if maximo else 0}
+                for fecha in fechas
+            ]}
+            for hora in sorted(horas)
+        ]
+        context['total'] = sum(celdas.values())
+        context['desde'] = desde
+        context['dias'] = dias
+        context['clubes'] = Club.objects.order_by('nombre_club')
+        context['bandas'] = DemandaTurno.BANDA_CHOICES
+        context['club_id'] = club_id
+        context['banda'] = banda
+        return context
+
+# Feed en vivo para emparejamiento y gestión de espera (requiere servidor ASGI)
+class EventosView(View):
+    """
+    Server-Sent Events con los cambios de espera, emparejamientos y estado
+    de notificaciones. ?tipos=espera,notificacion limita lo que se recibe.
+    Vista async: el usuario se obtiene con auser() en vez de EsProfesorMixin.
+    """
+    async def get(self, request):
+        usuario = await request.auser()
+        if not usuario.is_authenticated or usuario.rol != 'Profesor_Admin':
+            return HttpResponse(status=403)
+        tipos = [t for t in request.GET.get('tipos', '').split(',') if t in TIPOS_EVENTO] or TIPOS_EVENTO
         try:
-            alumno = CustomUser.objects.get(id=alumno_id)
-            emparejamiento = clase.emparejamiento_set.first()
-            
-            if emparejamiento and alumno in emparejamiento.jugadores.all():
-                emparejamiento.jugadores.remove(alumno)
-                
-                # Liberar la entrada en espera del alumno
-                EnEspera.objects.filter(
-                    id_usuario=alumno,
-                    id_clase=clase
-                ).update(id_clase=None, id_emparejamiento=None)
-                
-                messages.success(request, f'Alumno {alumno.nombre} removido de la clase.')
-            else:
-                messages.warning(request, 'El alumno no está en esta clase.')
-                
-        except CustomUser.DoesNotExist:
-            messages.error(request, 'Alumno no encontrado.')
+            ultimo_id = int(request.headers.get('Last-Event-ID', ''))
+        except ValueError:
+            ultimo_id = None
         
-        return redirect('gestionar_alumnos_clase', pk=clase_id)
\ No newline at end of file
+        suscripcion = bus.suscribir(tipos, ultimo_id)
+        if 'notificacion' in tipos:
+            vigia.asegurar()
+        response = StreamingHttpResponse(flujo(suscripcion), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # nginx: no acumular el stream en buffer
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+# API JSON (app móvil): sesión de Django, respuestas con ETag para GET condicional
+class ApiMixin:
+    recurso = None
+    solo_profesor = False
+    campo_fecha = 'fecha'
+    campo_club = 'id_club'
+    
+    def es_profesor(self):
+        return self.request.user.rol == 'Profesor_Admin'
+    
+    def dispatch(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Autenticación requerida'}, status=401)
+        if self.solo_profesor and not self.es_profesor():
+            return JsonResponse({'error': 'Solo para profesores'}, status=403)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except ErrorApi as e:
+            return e.respuesta()
+    
+    def campos(self):
+        return RECURSOS[self.recurso].elegir_campos(self.request.GET.get('campos', ''))
+    
+    def filtrar(self, queryset):
+        for parametro, lookup in (('desde', 'gte'), ('hasta', 'lte')):
+            valor = self.request.GET.get(parametro)
+            if valor:
+                try:
+                    queryset = queryset.filter(**{f'{self.campo_fecha}__{lookup}': date.fromisoformat(valor)})
+                except ValueError:
+                    raise ErrorApi(f'"{parametro}" debe tener formato AAAA-MM-DD')
+        club_id = self.request.GET.get('club')
+        if club_id and self.campo_club:
+            if not club_id.isdigit():
+                raise ErrorApi('"club" debe ser un id')
+            queryset = queryset.filter(**{self.campo_club: club_id})
+        return queryset
+
+class ApiListaView(ApiMixin, View):
+    tamano_pagina = 50
+    tamano_pagina_maximo = 200
+    
+    def get(self, request):
+        try:
+            tamano = max(1, min(int(request.GET.get('tamano', self.tamano_pagina)), self.tamano_pagina_maximo))
+        except ValueError:
+            tamano = self.tamano_pagina
+        datos = pagina(self.recurso, self.filtrar(self.get_queryset()), self.campos(),
+                       request.GET.get('despues', ''), tamano)
+        return respuesta_condicional(request, datos)
+
+class ApiDetalleView(ApiMixin, View):
+    def get(self, request, pk):
+        filas = serializar(self.recurso, self.get_queryset().filter(pk=pk), self.campos())
+        if not filas:
+            return JsonResponse({'error': 'No encontrado'}, status=404)
+        return respuesta_condicional(request, filas[0])
+
+class ApiEsperaMixin(ApiMixin):
+    recurso = 'espera'
+    
+    def get_queryset(self):
+        if self.es_profesor():
+            return EnEspera.objects.all()
+        return EnEspera.objects.filter(id_usuario=self.request.user)
+
+class ApiEsperaListaView(ApiEsperaMixin, ApiListaView):
+    def post(self, request):
+        """Alta individual ({...}) o en lote ([{...}, ...]) del usuario autenticado"""
+        if request.user.rol != 'Alumno_Usuario':
+            return JsonResponse({'error': 'Solo los alumnos se anotan en la lista de espera'}, status=403)
+        datos = leer_json(request)
+        creadas = inscribir_esperas(request.user, datos if isinstance(datos, list) else [datos])
+        filas = serializar(self.recurso, EnEspera.objects.filter(id__in=[e.id for e in creadas]).order_by('id'),
+                           self.campos())
+        return JsonResponse({'resultados': filas}, status=201)
+
+class ApiEsperaDetalleView(ApiEsperaMixin, ApiDetalleView):
+    def delete(self, request, pk):
+        espera = EnEspera.objects.filter(pk=pk, id_usuario=request.user).first()
+        if espera is None:
+            return JsonResponse({'error': 'No encontrado'}, status=404)
+        espera.delete()
+        return HttpResponse(status=204)
+
+class ApiClasesMixin(ApiMixin):
+    recurso = 'clases'
+    
+    def get_queryset(self):
+        if self.es_profesor():
+            return Clase.objects.all()
+        # Subconsulta en vez de join: un alumno puede figurar en dos emparejamientos de la misma clase
+        return Clase.objects.filter(id__in=Emparejamiento.jugadores.through.objects
+                                    .filter(customuser_id=self.request.user.id)
+                                    .values('emparejamiento__id_clase'))
+
+class ApiClasesListaView(ApiClasesMixin, ApiListaView):
+    pass
+
+class ApiClaseDetalleView(ApiClasesMixin, ApiDetalleView):
+    pass
+
+class ApiJugadoresClaseView(ApiMixin, View):
+    """POST agrega y DELETE quita {"alumnos": [ids]} en una transacción"""
+    solo_profesor = True
+    
+    def alumnos(self, request):
+        datos = leer_json(request)
+        alumnos = datos.get('alumnos') if isinstance(datos, dict) else None
+        if not isinstance(alumnos, list) or not alumnos:
+            raise ErrorApi('Se esperaba {"alumnos": [ids]}')
+        return alumnos
+    
+    def post(self, request, pk):
+        get_object_or_404(Clase, id=pk)
+        try:
+            agregados, ya_estaban, invalidos = agregar_alumnos(pk, self.alumnos(request))
+        except CupoCompleto as e:
+            return JsonResponse({'error': str(e), 'maximo': MAXIMO_JUGADORES}, status=409)
+        except EsperaYaAsignada as e:
+            return JsonResponse({'error': str(e), 'alumnos': [a.id for a in e.alumnos]}, status=409)
+        return JsonResponse({'agregados': sorted(agregados), 'ya_estaban': sorted(ya_estaban),
+                             'invalidos': sorted(invalidos)})
+    
+    def delete(self, request, pk):
+        get_object_or_404(Clase, id=pk)
+        quitados, no_estaban = quitar_alumnos(pk, self.alumnos(request))
+        return JsonResponse({'quitados': sorted(quitados), 'no_estaban': sorted(no_estaban)})
+
+class ApiEmparejamientosMixin(ApiMixin):
+    recurso = 'emparejamientos'
+    campo_fecha = 'id_clase__fecha'
+    campo_club = 'id_clase__id_club'
+    
+    def get_queryset(self):
+        if self.es_profesor():
+            return Emparejamiento.objects.all()
+        return Emparejamiento.objects.filter(jugadores=self.request.user)
+
+class ApiEmparejamientosListaView(ApiEmparejamientosMixin, ApiListaView):
+    def post(self, request):
+        """Mismo flujo que CrearEmparejamientoView: clase + emparejamiento + esperas, todo o nada"""
+        if not self.es_profesor():
+            return JsonResponse({'error': 'Solo para profesores'}, status=403)
+        datos = leer_json(request)
+        if not isinstance(datos, dict):
+            raise ErrorApi('Se esperaba un objeto')
+        ids = datos.get('jugadores')
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            raise ErrorApi('"jugadores" debe ser una lista de ids')
+        jugadores = list(CustomUser.objects.filter(id__in=ids, rol='Alumno_Usuario'))
+        if len(jugadores) != len(set(ids)):
+            raise ErrorApi('Alguno de los jugadores no existe')
+        try:
+            club = Club.objects.get(id=int(datos.get('club')))
+            fecha = date.fromisoformat(str(datos.get('fecha')))
+            hora = time.fromisoformat(str(datos.get('hora')))
+        except (Club.DoesNotExist, TypeError, ValueError):
+            raise ErrorApi('"club", "fecha" (AAAA-MM-DD) y "hora" (HH:MM) son obligatorios')
+        
+        try:
+            clase, emparejamiento = reservar_turno(
+                request.user, club.id, fecha, hora, jugadores,
+                datos.get('valor_ar') or club.valor_hora_ar, datos.get('descripcion', '')
+            )
+        except ValueError as e:
+            raise ErrorApi(str(e))
+        except EsperaYaAsignada as e:
+            return JsonResponse({'error': str(e), 'alumnos': [a.id for a in e.alumnos]}, status=409)
+        except SinCanchasLibres as e:
+            return JsonResponse({'error': str(e), 'alternativas': [h.strftime('%H:%M') for h in e.alternativas]},
+                                status=409)
+        filas = serializar(self.recurso, Emparejamiento.objects.filter(id=emparejamiento.id), self.campos())
+        return JsonResponse(filas[0], status=201)
+
+class ApiEmparejamientoDetalleView(ApiEmparejamientosMixin, ApiDetalleView):
+    pass
+
+class ApiNotificacionesMixin(ApiMixin):
+    recurso = 'notificaciones'
+    campo_fecha = 'fecha_creacion__date'
+    campo_club = 'id_clase__id_club'
+    
+    def get_queryset(self):
+        if self.es_profesor():
+            return Notificacion.objects.all()
+        return Notificacion.objects.filter(id_usuario=self.request.user)
+
+class ApiNotificacionesListaView(ApiNotificacionesMixin, ApiListaView):
+    pass
+
+class ApiNotificacionDetalleView(ApiNotificacionesMixin, ApiDetalleView):
+    pass